@@ -1,10 +1,18 @@
+from collections import deque
 from dateutil import parser
 import logging
 import os
+import threading
+import time
 import pytz
 
 from legistar.events import LegistarAPIEventScraper, WebCalendarFallbackMixin
-from scrapelib import Scraper
+from pupa import settings
+from scrapelib import Scraper, ThrottledSession
+
+from .instrumentation import InstrumentedAdapter
+from .ratelimit import HostLimits, RateLimitedAdapter, SharedTokenBucket
+from .state import state_path
 
 try:
     from .secrets import TOKEN
@@ -15,7 +23,155 @@ except ImportError:
 LOGGER = logging.getLogger(__name__)
 
 
-class LAMetroAPIWebEventScraper(WebCalendarFallbackMixin, LegistarAPIEventScraper, Scraper):
+def parse_flag(value):
+    """
+    Scrape arguments arrive from the pupa command line as strings. Treat
+    anything but an empty value, "false", "no" or "0" as True.
+    """
+    return bool(value) and str(value).lower() not in {"false", "no", "0"}
+
+
+def ordered_prefetch(fn, iterable, executor, n):
+    """
+    Apply fn to each item of iterable on the given executor, keeping at
+    most n calls in flight. Yields (item, result) tuples in input order,
+    so callers get concurrency without giving up deterministic output.
+    """
+    pending = deque()
+
+    try:
+        for item in iterable:
+            pending.append((item, executor.submit(fn, item)))
+
+            if len(pending) >= n:
+                item, future = pending.popleft()
+                yield item, future.result()
+
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+    finally:
+        # Don't do work nobody will read if the consumer stops early or
+        # a fetch fails.
+        for _, future in pending:
+            future.cancel()
+
+
+class SharedTransport:
+    """
+    Connection pools and a rate budget shared by every scraper and helper
+    session in a run. Sessions that share a transport reuse keep-alive
+    connections to Legistar, rather than each opening their own, and start
+    requests no faster than requests_per_minute between them, rather than
+    each getting their own budget. Every request sent over the transport
+    is recorded in the request stats.
+
+    If adaptive is True, requests_per_minute is ignored. Instead, each
+    host gets a limit on requests in flight, which adapts to how quickly
+    and successfully the host responds. If shared_rate is given, requests
+    to each host also draw on a budget of shared_rate requests per second,
+    shared with other processes that use the same state directory. See
+    lametro.ratelimit.
+    """
+
+    # Connections to keep open per host. Enough for every worker thread
+    # to have one.
+    POOL_SIZE = 16
+
+    def __init__(self, adapter=None, adaptive=False, shared_rate=None):
+        if adapter is None and (adaptive or shared_rate):
+            adapter = RateLimitedAdapter(
+                limits=HostLimits(maximum=self.POOL_SIZE) if adaptive else None,
+                bucket=(
+                    SharedTokenBucket(state_path("rate_limit.sqlite3"), shared_rate)
+                    if shared_rate
+                    else None
+                ),
+                pool_maxsize=self.POOL_SIZE,
+            )
+
+        self.adapter = adapter or InstrumentedAdapter(pool_maxsize=self.POOL_SIZE)
+        self.adaptive = getattr(self.adapter, "limits", None) is not None
+
+        self._throttle_lock = threading.Lock()
+        self._last_request = 0
+
+    def mount(self, session):
+        """
+        Route a session's requests through the shared connection pools and
+        rate budget. Use this for sessions we don't create ourselves, e.g.,
+        the web scrapers the legistar scrapers create.
+        """
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+
+        session._throttle = lambda: self.throttle(session)
+
+    def throttle(self, session):
+        if self.adaptive:
+            return
+
+        # scrapelib's throttle, with the time of the last request shared
+        # by every session. Hold the lock while sleeping, so requests from
+        # different threads are spaced out, too.
+        with self._throttle_lock:
+            diff = session._request_frequency - (time.time() - self._last_request)
+            if diff > 0:
+                time.sleep(diff)
+
+            self._last_request = time.time()
+
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+def shared_transport():
+    global _shared_transport
+
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            _shared_transport = SharedTransport(
+                adaptive=getattr(settings, "LAMETRO_ADAPTIVE_RATE_LIMIT", False),
+                shared_rate=getattr(settings, "LAMETRO_SHARED_RATE_LIMIT", None),
+            )
+
+    return _shared_transport
+
+
+class SharedTransportMixin:
+    """
+    Send a scraper's requests over the shared transport. Requests may run
+    concurrently, from any number of threads and scrapers, but they are
+    started no faster than requests_per_minute allows, or, if
+    LAMETRO_ADAPTIVE_RATE_LIMIT is set, no faster than each host's
+    adaptive limit allows. If LAMETRO_SHARED_RATE_LIMIT is set, requests
+    from every scrape process also share one budget per host.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        shared_transport().mount(self)
+
+    def download(self, url, **kwargs):
+        """
+        GET a file that isn't part of the API, e.g., an attachment, over the
+        shared transport, with retries. Unlike get, don't send the API token
+        to the file's host, and don't write the file to the scrape cache,
+        so it can be streamed.
+        """
+        # Session params set to None are left out of the request
+        params = {key: None for key in self.params}
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        return ThrottledSession.request(self, "GET", url, params=params, **kwargs)
+
+
+class LAMetroAPIWebEventScraper(
+    SharedTransportMixin, WebCalendarFallbackMixin, LegistarAPIEventScraper, Scraper
+):
     BASE_URL = "https://webapi.legistar.com/v1/metro"
     WEB_URL = "https://metro.legistar.com/"
     EVENTSPAGE = "https://metro.legistar.com/Calendar.aspx"
@@ -26,7 +182,28 @@ class LAMetroAPIWebEventScraper(WebCalendarFallbackMixin, LegistarAPIEventScrape
 
         if TOKEN:
             self.params = {"token": TOKEN}
-            
+
+        self._web_calendar_lock = threading.Lock()
+
+    def _init_webscraper(self):
+        webscraper = super()._init_webscraper()
+        shared_transport().mount(webscraper)
+        return webscraper
+
+    def _get_web_event(self, api_event):
+        """
+        Events without a detail page are found by paging through the web
+        calendar, with a generator and a dictionary of the events it's
+        yielded, which every lookup shares. Neither is safe to use from
+        several threads, so when events are merged in parallel, find
+        those events one at a time.
+        """
+        if self._detail_page_not_available(api_event):
+            with self._web_calendar_lock:
+                return super()._get_web_event(api_event)
+
+        return super()._get_web_event(api_event)
+
     def _detail_page_not_available(self, api_event):
         return api_event["EventAgendaStatusName"] == "Draft"
 
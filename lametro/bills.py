@@ -1,5 +1,12 @@
+import bisect
 import datetime
+import hashlib
+import json
 import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, partial
 
 import pytz
 import scrapelib
@@ -9,6 +16,11 @@ from pupa.utils import _make_pseudo_id
 
 from sentry_sdk import capture_exception
 
+from .base import SharedTransportMixin, ordered_prefetch, parse_flag
+from .bodies import body_registry
+from .cache import KeyValueStore, RowVersionCacheMixin, response_cache
+from .instrumentation import request_stats
+from .state import Checkpoint, PendingState, Watermark
 from .events import LametroEventScraper
 
 try:
@@ -17,13 +29,31 @@ except ImportError:
     TOKEN = os.getenv("LEGISTAR_API_TOKEN", "")
 
 
+def parse_shard(value):
+    """
+    Parse a shard argument, e.g., "2/4" for the second of four shards,
+    into a (k, n) tuple.
+    """
+    try:
+        k, n = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like k/n, e.g., 2/4, not {value}")
+
+    if not 1 <= k <= n:
+        raise ValueError(f"Shard {value} is not one of 1/{n} to {n}/{n}")
+
+    return k, n
+
+
 class InvalidActionDateException(Exception):
     def __init__(self, matter_id, action_date):
         message = f"Invalid action date for {matter_id}: {action_date}"
         super().__init__(message)
 
 
-class LametroBillScraper(LegistarAPIBillScraper, Scraper):
+class LametroBillScraper(
+    SharedTransportMixin, RowVersionCacheMixin, LegistarAPIBillScraper, Scraper
+):
     BASE_URL = "https://webapi.legistar.com/v1/metro"
     BASE_WEB_URL = "https://metro.legistar.com"
     TIMEZONE = "America/Los_Angeles"
@@ -39,6 +69,26 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
 
     START_DATE_PRIVATE_SCRAPE = "2016-07-01"
 
+    # Sub-resource requests in flight at once, and matters to fetch ahead
+    # of the one being built. Requests are still throttled to
+    # requests_per_minute, however many threads are waiting to send them.
+    FETCH_WORKERS = 6
+    PREFETCH_MATTERS = 4
+    VOTE_WORKERS = 4
+
+    # Texts are kept in their own store, by version, rather than the row
+    # version response cache. See text.
+    UNCACHED_SUBRESOURCES = frozenset({"texts"})
+
+    # Bump when bill changes what it emits for the same input, so
+    # skip_unchanged scrapes emit every matter once more.
+    FINGERPRINT_VERSION = 1
+
+    # Save full scrapes' progress every so many matters, and resume from
+    # checkpoints of full scrapes that started no more than this long ago
+    CHECKPOINT_EVERY = 100
+    CHECKPOINT_MAX_AGE = 3 * 24 * 60 * 60
+
     def __init__(self, *args, **kwargs):
         """
         Metro scrapes private (or restricted) bills.
@@ -61,6 +111,50 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
             self.params = {"Token": TOKEN}
         self.scrape_restricted = True
 
+        self._vote_pool = None
+        self._vote_pool_lock = threading.Lock()
+
+        # The (session filter, shard) matter_slice is listing, if any
+        self._matter_slice = None
+
+        # Compressed matter texts, keyed on matter ID and version
+        self._texts = KeyValueStore("matter_texts")
+
+    @property
+    def vote_pool(self):
+        # Start the vote threads the first time we need them, and again if
+        # the scraper is used after a scrape has stopped them.
+        with self._vote_pool_lock:
+            if self._vote_pool is None:
+                self._vote_pool = ThreadPoolExecutor(self.VOTE_WORKERS)
+
+        return self._vote_pool
+
+    @cached_property
+    def event_scraper(self):
+        """
+        The event scraper we read agendas with, shared by every windowed
+        scrape this scraper runs.
+        """
+        return LametroEventScraper(self.jurisdiction, self.datadir)
+
+    def close(self):
+        """
+        Stop the vote threads, and close the matter text store and the
+        event scraper, if we used it. They start again if the scraper is
+        used again.
+        """
+        with self._vote_pool_lock:
+            vote_pool, self._vote_pool = self._vote_pool, None
+
+        if vote_pool is not None:
+            vote_pool.shutdown()
+
+        self._texts.close()
+
+        if "event_scraper" in self.__dict__:
+            self.event_scraper.close()
+
     def _is_restricted(self, matter):
         is_board_correspondence = matter["MatterTypeName"] in {
             "Board Box",
@@ -82,18 +176,40 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
     def _show_attachment(self, attachment):
         return attachment["MatterAttachmentShowOnInternetPage"]
 
-    def session(self, matter_id, action_date):
+    @cached_property
+    def _session_index(self):
+        """
+        Sorted, localized (start, end, identifier) intervals for each
+        legislative session, built once per scraper.
+        """
         from . import Lametro
 
         localize = pytz.timezone(self.TIMEZONE).localize
         fmt = "%Y-%m-%d"
 
-        for session in Lametro().legislative_sessions:
-            start_datetime = datetime.datetime.strptime(session["start_date"], fmt)
-            end_datetime = datetime.datetime.strptime(session["end_date"], fmt)
+        sessions = sorted(
+            (
+                localize(datetime.datetime.strptime(session["start_date"], fmt)),
+                localize(datetime.datetime.strptime(session["end_date"], fmt)),
+                session["identifier"],
+            )
+            for session in Lametro().legislative_sessions
+        )
+
+        return [start for start, _, _ in sessions], sessions
+
+    def session(self, matter_id, action_date):
+        starts, sessions = self._session_index
+
+        # Sessions don't overlap, so the only candidate is the last one
+        # starting on or before the action date.
+        i = bisect.bisect_right(starts, action_date) - 1
 
-            if localize(start_datetime) <= action_date <= localize(end_datetime):
-                return session["identifier"]
+        if i >= 0:
+            _, end_datetime, identifier = sessions[i]
+
+            if action_date <= end_datetime:
+                return identifier
 
         raise InvalidActionDateException(matter_id, action_date)
 
@@ -107,17 +223,37 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
                 sponsorship["primary"] = False
                 sponsorship["classification"] = "Regular"
 
-            sponsor_name = sponsor["MatterSponsorName"].strip()
-
-            if sponsor_name == "Board of Directors - Regular Board Meeting":
-                sponsor_name = "Board of Directors"
-
-            sponsorship["name"] = sponsor_name
+            sponsorship["name"] = body_registry().canonical_name(
+                self, sponsor["MatterSponsorName"]
+            )
             sponsorship["entity_type"] = "organization"
 
             yield sponsorship
 
+    def _has_roll_call(self, action):
+        # Do we want to capture vote events for voice votes?
+        # Right now we are not?
+        return (
+            action["MatterHistoryEventId"] is not None
+            and action["MatterHistoryRollCallFlag"] is not None
+            and action["MatterHistoryPassedFlag"] is not None
+        )
+
+    def roll_call_votes(self, history_ids):
+        """
+        Fetch the votes for several roll calls at once, keyed by
+        MatterHistoryId. The Legistar API only exposes votes per event item,
+        so they can't be folded into a single OData query. Issue the
+        requests concurrently instead.
+        """
+        if len(history_ids) < 2:
+            return {history_id: self.votes(history_id) for history_id in history_ids}
+
+        return dict(zip(history_ids, self.vote_pool.map(self.votes, history_ids)))
+
     def actions(self, matter_id):
+        bill_actions = []
+
         old_action = None
         for action in self.history(matter_id):
             # Metro admin added an action with a classifcation of 'DISCUSSED (do not use).'
@@ -147,22 +283,26 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
                 else:
                     continue
 
-                if (
-                    action["MatterHistoryEventId"] is not None
-                    and action["MatterHistoryRollCallFlag"] is not None
-                    and action["MatterHistoryPassedFlag"] is not None
-                ):
+                bill_actions.append((bill_action, action))
 
-                    # Do we want to capture vote events for voice votes?
-                    # Right now we are not?
-                    bool_result = action["MatterHistoryPassedFlag"]
-                    result = "pass" if bool_result else "fail"
+        # Gather every roll call on the matter, so we can fetch their votes
+        # together rather than one at a time as we walk the history.
+        votes = self.roll_call_votes(
+            [
+                action["MatterHistoryId"]
+                for _, action in bill_actions
+                if self._has_roll_call(action)
+            ]
+        )
 
-                    votes = (result, self.votes(action["MatterHistoryId"]))
-                else:
-                    votes = (None, [])
+        for bill_action, action in bill_actions:
+            if self._has_roll_call(action):
+                bool_result = action["MatterHistoryPassedFlag"]
+                result = "pass" if bool_result else "fail"
 
-                yield bill_action, votes
+                yield bill_action, (result, votes[action["MatterHistoryId"]])
+            else:
+                yield bill_action, (None, [])
 
     def matters(self, since_datetime=None):
         """
@@ -170,55 +310,210 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
         window, as well as matters on agendas of events updated within the
         window or scheduled to happen in the future, as they are likely to
         change.
+
+        Scrape the matters the public is most likely looking at first, so
+        they land even if the scrape is cut short: matters on the agendas
+        of upcoming meetings, soonest meeting first, then matters updated
+        within the window, then matters on the agendas of past meetings
+        that changed within the window.
         """
-        if since_datetime:
-            seen = set()
+        if not since_datetime:
+            yield from super().matters()
+            return
+
+        seen = set()
+
+        def unseen_matters(matter_ids):
+            for matter_id in matter_ids:
+                if matter_id not in seen:
+                    seen.add(matter_id)
+
+                    # Skip matters that are not yet in Legistar
+                    if matter := self.matter(matter_id):
+                        yield matter
+
+        event_scraper = self.event_scraper
+        event_scraper.requests_per_minute = self.requests_per_minute
+        event_scraper.cache_write_only = self.cache_write_only
 
-            for matter in super().matters(since_datetime=since_datetime):
+        # Agendas of upcoming meetings come first
+        agendas = event_scraper.agendas(since_datetime)
+        past_agenda = []
+
+        for event, matter_ids in agendas:
+            if not event_scraper.is_upcoming(event):
+                past_agenda = matter_ids
+                break
+
+            yield from unseen_matters(matter_ids)
+
+        for matter in super().matters(since_datetime=since_datetime):
+            if matter["MatterId"] not in seen:
                 seen.add(matter["MatterId"])
                 yield matter
 
-            event_scraper = LametroEventScraper(self.jurisdiction, self.datadir)
-            event_scraper.requests_per_minute = self.requests_per_minute
-            event_scraper.cache_write_only = self.cache_write_only
+        yield from unseen_matters(past_agenda)
+
+        for _, matter_ids in agendas:
+            yield from unseen_matters(matter_ids)
+
+    def matter_slice(self, sessions=(), shard=None):
+        """
+        Every matter introduced in the given legislative sessions, if any,
+        and in the given (k, n) shard, if any, i.e., whose MatterId modulo
+        n is k - 1. Matters are listed as they are for a full scrape, but
+        sessions are filtered in the query, and shards as pages of matters
+        come in, before we look up their detail pages. See pages.
+        """
+        from . import Lametro
 
-            for api_event, _ in event_scraper.events(since_datetime=since_datetime):
-                for agenda_item in event_scraper.agenda(api_event):
-                    matter_id = agenda_item["EventItemMatterId"]  # Can be null
+        session_filter = None
 
-                    if matter_id and matter_id not in seen:
-                        yield self.matter(matter_id)
-                        seen.add(matter_id)
+        if sessions:
+            known_sessions = {
+                legislative_session["identifier"]: legislative_session
+                for legislative_session in Lametro().legislative_sessions
+            }
 
-        else:
+            clauses = []
+            for identifier in sessions:
+                try:
+                    legislative_session = known_sessions[identifier]
+                except KeyError:
+                    raise ValueError(f"Unknown legislative session {identifier}")
+
+                clauses.append(
+                    "(MatterIntroDate ge datetime'{start_date}T00:00:00' and "
+                    "MatterIntroDate le datetime'{end_date}T00:00:00')".format(
+                        **legislative_session
+                    )
+                )
+
+            session_filter = " or ".join(clauses)
+
+        self._matter_slice = (session_filter, shard)
+
+        try:
             yield from super().matters()
+        finally:
+            self._matter_slice = None
 
-    def scrape(self, window=28, matter_ids=None):
-        """By default, scrape board reports updated in the last 28 days.
-        Optionally specify a larger or smaller window of time from which to
-        scrape updates, or specific matters to scrape.
-        Note that passing a value for :matter_ids supercedes the value of
-        :window, such that the given matters will be scraped regardless of
-        when they were updated.
+    def pages(self, url, params=None, item_key=None):
+        """
+        While matter_slice lists matters, add its session filter to the
+        query, and leave out matters in other shards.
+        """
+        if self._matter_slice is None or url != self.BASE_URL + "/matters":
+            yield from super().pages(url, params=params, item_key=item_key)
+            return
 
-        Optional parameters
-        :window (numeric) - Amount of time for which to scrape updates, e.g.
-        a window of 7 will scrape legislation updated in the last week. Pass
-        a window of 0 to scrape all legislation.
-        :matter_ids (str) - Comma-separated list of matter IDs to scrape
+        session_filter, shard = self._matter_slice
+
+        params = dict(params or {})
+        if session_filter:
+            params["$filter"] = session_filter
+
+        for matter in super().pages(url, params=params, item_key=item_key):
+            if shard:
+                k, n = shard
+                if matter["MatterId"] % n != k - 1:
+                    continue
+
+            yield matter
+
+    def related_bills(self, matter_id):
+        for relation in self.relations(matter_id):
+            try:
+                # Get data (i.e., json) for the related bill. Then, we can find
+                # the 'MatterFile' (i.e., identifier) and the 'MatterIntroDate'
+                # (i.e., to determine its legislative session). Sometimes, the
+                # related bill does not yet exist: in this case, throw an error,
+                # and continue.
+                related_bill = self.endpoint(
+                    "/matters/{0}", relation["MatterRelationMatterId"]
+                )
+            except scrapelib.HTTPError:
+                continue
+            else:
+                date = related_bill["MatterIntroDate"]
+                identifier = related_bill["MatterFile"]
+                related_bill_session = self.session(identifier, self.toTime(date))
+                yield {
+                    "identifier": identifier,
+                    "legislative_session": related_bill_session,
+                    "relation_type": "companion",
+                }
+
+    def matter_resources(self, fetch_pool, matter):
+        """
+        Fetch the sub-resources of a public matter. Each resource is its own
+        round trip to the Legistar API, so issue them at the same time on
+        the given pool, then wait for all of them. Returns None for
+        restricted matters, which we don't scrape beyond the matter itself.
         """
+        if self._is_restricted(matter):
+            return None
+
+        matter_id = matter["MatterId"]
+
+        futures = {
+            "actions": fetch_pool.submit(lambda: list(self.actions(matter_id))),
+            "sponsorships": fetch_pool.submit(
+                lambda: list(self.sponsorships(matter_id))
+            ),
+            "topics": fetch_pool.submit(self.topics, matter_id),
+            "related_bills": fetch_pool.submit(
+                lambda: list(self.related_bills(matter_id))
+            ),
+            "attachments": fetch_pool.submit(self.attachments, matter_id),
+            "text": fetch_pool.submit(self.text, matter_id, matter["MatterVersion"]),
+        }
 
-        if matter_ids:
-            matters = [self.matter(matter_id) for matter_id in matter_ids.split(",")]
-            matters = filter(None, matters)  # Skip matters that are not yet in Legistar
-        elif float(window):  # Support for partial days, i.e., window=0.15
-            n_days_ago = datetime.datetime.utcnow() - datetime.timedelta(float(window))
-            matters = self.matters(n_days_ago)
-        else:
-            # Scrape all matters, including those without a last-modified date
-            matters = self.matters()
+        return {name: future.result() for name, future in futures.items()}
 
-        n_days_ago = datetime.datetime.utcnow() - datetime.timedelta(float(window))
+    def text(self, matter_id, latest_version_value=None):
+        """
+        The text of the given version of a matter. Texts are the largest
+        responses we fetch, and a matter's text only changes with its
+        version, so keep each version's text, compressed, and only fetch
+        the text of versions we haven't seen.
+        """
+        if latest_version_value is None:
+            return super().text(matter_id)
+
+        key = json.dumps([matter_id, latest_version_value])
+
+        stored = self._texts.get(key)
+        if stored is not None:
+            request_stats().record_cache_hit(
+                self.BASE_URL + "/matters/{0}/texts".format(matter_id)
+            )
+            return json.loads(zlib.decompress(stored))
+
+        text = super().text(matter_id, latest_version_value)
+
+        # Texts too large to fetch come back as None. Don't keep those, so
+        # we try again next time.
+        if text is not None:
+            self._texts.set(key, zlib.compress(json.dumps(text).encode("utf-8")))
+
+        return text
+
+    def fingerprint(self, matter, resources):
+        """
+        Hash of everything a bill is built from: the matter, including its
+        row version, and its sub-resources.
+        """
+        content = json.dumps(
+            [self.FINGERPRINT_VERSION, matter, resources], sort_keys=True, default=str
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def scrapeable_matters(self, matters):
+        """
+        Skip matters we don't want to scrape, yielding the rest annotated
+        with their legislative session.
+        """
         for matter in matters:
             # Skip problematic board reports
             if matter["MatterFile"] in ("2017-0447", "TMP22-0135"):
@@ -235,6 +530,7 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
             }
             if is_board_correspondence and not title:
                 title = f"Board Correspondence {identifier}"
+                matter["MatterTitle"] = title
 
             if not all((date, title, identifier)):
                 continue
@@ -253,155 +549,292 @@ class LametroBillScraper(LegistarAPIBillScraper, Scraper):
                 capture_exception(exc)
                 continue
 
-            # Metro uses different classifications than OCD's controlled
-            # vocabulary. We store that under extras -> local_classification.
-            bill_type = None
-
-            if identifier.startswith("S"):
-                alternate_identifiers = [identifier]
-                identifier = identifier[1:]
-            else:
-                alternate_identifiers = []
-
-            bill = Bill(
-                identifier=identifier,
-                legislative_session=bill_session,
-                title=title,
-                classification=bill_type,
-                from_organization={"name": "Board of Directors"},
-            )
-
-            # The Metro scraper scrapes private bills.
-            # However, we do not want to capture significant data about private bills,
-            # other than the value of the helper function `_is_restricted` and a last
-            # modified timestamp.
-            # We yield private bills early, wipe data from previously imported once-public
-            # bills, and include only data *required* by the pupa schema.
-            # https://github.com/opencivicdata/pupa/blob/master/pupa/scrape/schemas/bill.py
-            bill.extras = {"restrict_view": self._is_restricted(matter)}
-
-            # Add API source early.
-            # Private bills should have this url for debugging.
-            legistar_api = self.BASE_URL + "/matters/{0}".format(matter_id)
-            bill.add_source(legistar_api, note="api")
-
-            if self._is_restricted(matter):
-                # required fields
-                bill.title = "Restricted View"
-
-                # wipe old data
-                bill.extras["plain_text"] = ""
-                bill.extras["rtf_text"] = ""
-                bill.sponsorships = []
-                bill.related_bills = []
-                bill.versions = []
-                bill.documents = []
-                bill.actions = []
-
-                yield bill
-                continue
+            matter["bill_session"] = bill_session
 
-            legistar_web = matter["legistar_url"]
-            bill.add_source(legistar_web, note="web")
+            # Reuse cached sub-resources if the matter hasn't changed
+            self.remember_row_version("matters", matter)
 
-            for identifier in alternate_identifiers:
-                bill.add_identifier(identifier)
+            yield matter
 
-            for action, vote in self.actions(matter_id):
-                act = bill.add_action(**action)
-
-                if action["description"] == "Referred":
-                    body_name = matter["MatterBodyName"]
-                    act.add_related_entity(
-                        body_name,
-                        "organization",
-                        entity_id=_make_pseudo_id(name=body_name),
-                    )
+    def scrape(
+        self,
+        window=28,
+        matter_ids=None,
+        incremental=False,
+        skip_unchanged=False,
+        resume=False,
+        session=None,
+        shard=None,
+    ):
+        """By default, scrape board reports updated in the last 28 days.
+        Optionally specify a larger or smaller window of time from which to
+        scrape updates, or specific matters to scrape.
+        Note that passing a value for :matter_ids supercedes the value of
+        :window, such that the given matters will be scraped regardless of
+        when they were updated.
 
-                result, votes = vote
-                if result:
-                    vote_event = VoteEvent(
-                        legislative_session=bill.legislative_session,
-                        motion_text=action["description"],
-                        organization=action["organization"],
-                        classification=None,
-                        start_date=action["date"],
-                        result=result,
-                        bill=bill,
-                    )
+        Optional parameters
+        :window (numeric) - Amount of time for which to scrape updates, e.g.
+        a window of 7 will scrape legislation updated in the last week. Pass
+        a window of 0 to scrape all legislation.
+        :matter_ids (str) - Comma-separated list of matter IDs to scrape
+        :incremental (bool) - Scrape legislation updated since the last
+        matter we saw in an imported scrape, rather than a fixed window.
+        Falls back to :window on the first incremental scrape.
+        :skip_unchanged (bool) - Don't emit bills for matters whose content
+        hasn't changed since the last scrape that was imported.
+        :resume (bool) - If the last full scrape (window=0) failed partway,
+        skip the matters it finished. Import what it scraped first. Scrapes
+        everything if there's nothing to resume.
+        :session (str) - Comma-separated list of legislative sessions, e.g.,
+        2019. Scrape every matter introduced in those sessions, regardless
+        of :window.
+        :shard (str) - Scrape one of n disjoint slices of every matter, by
+        MatterId, regardless of :window, e.g., 2/4 for the second of four.
+        Combines with :session. Run one scrape per slice, in parallel, to
+        spread a full scrape across processes.
+        """
+        watermark = Watermark("matters")
+        fingerprints = KeyValueStore("fingerprints")
+        skip_unchanged = parse_flag(skip_unchanged)
+        seen_fingerprints = {}
+        n_unchanged = 0
+        since_watermark = watermark.since() if parse_flag(incremental) else None
 
-                    vote_event.add_source(legistar_web)
-                    vote_event.add_source(legistar_api + "/histories")
+        sessions = session.split(",") if session else []
+        shard = parse_shard(shard) if shard else None
+        sliced = bool(sessions or shard) and not matter_ids
 
-                    for vote in votes:
-                        try:
-                            raw_option = vote["VoteValueName"].lower()
-                        except AttributeError:
-                            raw_option = None
-                        clean_option = self.VOTE_OPTIONS.get(raw_option, raw_option)
-                        vote_event.vote(clean_option, vote["VotePersonName"].strip())
+        if matter_ids:
+            matters = [self.matter(matter_id) for matter_id in matter_ids.split(",")]
+            matters = filter(None, matters)  # Skip matters that are not yet in Legistar
+        elif sliced:
+            matters = self.matter_slice(sessions, shard)
+        elif since_watermark:
+            self.info(f"Scraping matters updated since {since_watermark.isoformat()}")
+            matters = self.matters(since_watermark)
+        elif float(window):  # Support for partial days, i.e., window=0.15
+            n_days_ago = datetime.datetime.utcnow() - datetime.timedelta(float(window))
+            matters = self.matters(n_days_ago)
+        else:
+            # Scrape all matters, including those without a last-modified date
+            matters = self.matters()
 
-                    yield vote_event
+        matters = watermark.track(matters, "MatterLastModifiedUtc")
 
-            for sponsorship in self.sponsorships(matter_id):
-                bill.add_sponsorship(**sponsorship)
+        # Save progress through full scrapes, which take hours, so a scrape
+        # that fails partway can resume.
+        full_scrape = sliced or not (matter_ids or since_watermark or float(window))
 
-            for topic in self.topics(matter_id):
-                bill.add_subject(topic["MatterIndexName"].strip())
+        # Slices keep their own checkpoints, so each can resume separately.
+        checkpoint_name = "-".join(["matters", *sessions])
+        if shard:
+            checkpoint_name += "-{}of{}".format(*shard)
 
-            for relation in self.relations(matter_id):
-                try:
-                    # Get data (i.e., json) for the related bill. Then, we can find
-                    # the 'MatterFile' (i.e., identifier) and the 'MatterIntroDate'
-                    # (i.e., to determine its legislative session). Sometimes, the
-                    # related bill does not yet exist: in this case, throw an error,
-                    # and continue.
-                    related_bill = self.endpoint(
-                        "/matters/{0}", relation["MatterRelationMatterId"]
-                    )
-                except scrapelib.HTTPError:
-                    continue
-                else:
-                    date = related_bill["MatterIntroDate"]
-                    identifier = related_bill["MatterFile"]
-                    related_bill_session = self.session(identifier, self.toTime(date))
-                    bill.add_related_bill(
-                        identifier=identifier,
-                        legislative_session=related_bill_session,
-                        relation_type="companion",
-                    )
+        checkpoint = Checkpoint(checkpoint_name, max_age=self.CHECKPOINT_MAX_AGE)
 
-            bill.add_version_link(
-                "Board Report",
-                f"https://metro.legistar.com/ViewReport.ashx?M=R&N=TextL5&GID=557&ID={matter_id}&GUID=LATEST&Title=Board+Report",  # noqa
-                media_type="application/pdf",
+        if full_scrape and parse_flag(resume) and checkpoint.load():
+            self.info(
+                f"Resuming after matter {checkpoint.last}, skipping "
+                f"{len(checkpoint.done)} matters already scraped"
+            )
+            matters = (
+                matter
+                for matter in matters
+                if matter["MatterId"] not in checkpoint.done
             )
 
-            for attachment in self.attachments(matter_id):
-                if attachment["MatterAttachmentName"] and self._show_attachment(
-                    attachment
+        # Fetch the sub-resources of the next few matters while we build
+        # the bill for the current one. ordered_prefetch hands matters back
+        # in the order we received them, so output order is deterministic.
+        with ThreadPoolExecutor(self.FETCH_WORKERS) as fetch_pool, ThreadPoolExecutor(
+            self.PREFETCH_MATTERS
+        ) as matter_pool:
+            try:
+                for matter, resources in ordered_prefetch(
+                    partial(self.matter_resources, fetch_pool),
+                    checkpoint.track(self.scrapeable_matters(matters), "MatterId"),
+                    matter_pool,
+                    self.PREFETCH_MATTERS,
                 ):
-                    bill.add_document_link(
-                        attachment["MatterAttachmentName"],
-                        attachment["MatterAttachmentHyperlink"].strip(),
-                        media_type="application/pdf",
-                    )
-
-            bill.extras["local_classification"] = matter["MatterTypeName"]
-
-            matter_version_value = matter["MatterVersion"]
-            text = self.text(matter_id, matter_version_value)
-
-            if text:
-                if text["MatterTextPlain"]:
-                    bill.extras["plain_text"] = text["MatterTextPlain"]
-
-                if text["MatterTextRtf"]:
-                    bill.extras["rtf_text"] = text["MatterTextRtf"].replace(
-                        "\u0000", ""
-                    )
+                    key = str(matter["MatterId"])
+                    fingerprint = self.fingerprint(matter, resources)
+                    seen_fingerprints[key] = fingerprint
+
+                    if skip_unchanged and fingerprints.get(key) == fingerprint:
+                        n_unchanged += 1
+                    else:
+                        yield from self.bill(matter, resources)
+
+                    checkpoint.finish(matter["MatterId"])
+
+                    if (
+                        full_scrape
+                        and len(checkpoint.done) % self.CHECKPOINT_EVERY == 0
+                    ):
+                        checkpoint.save()
+
+            except BaseException:
+                if full_scrape:
+                    checkpoint.save()
+                raise
+
+            finally:
+                # Stop the vote threads and close the stores, even if the
+                # scrape fails
+                fingerprints.close()
+                self.close()
+
+        if full_scrape:
+            checkpoint.clear()
+
+        self.info(f"Response cache: {response_cache().stats}")
+
+        if skip_unchanged:
+            self.info(f"Skipped {n_unchanged} unchanged matters")
+
+        # Only record what we emitted once it's been imported, so a failed
+        # import doesn't leave the next scrape skipping it.
+        pending = PendingState(self.datadir, "bills")
+        pending.stores["fingerprints"] = seen_fingerprints
+
+        # Only advance the watermark for scrapes of everything that changed,
+        # not for scrapes of particular matters or slices of them.
+        if not (matter_ids or sliced):
+            watermark.stage(pending)
+
+        pending.save()
+
+    def bill(self, matter, resources):
+        matter_id = matter["MatterId"]
+        title = matter["MatterTitle"]
+        identifier = matter["MatterFile"]
+
+        # Metro uses different classifications than OCD's controlled
+        # vocabulary. We store that under extras -> local_classification.
+        bill_type = None
+
+        if identifier.startswith("S"):
+            alternate_identifiers = [identifier]
+            identifier = identifier[1:]
+        else:
+            alternate_identifiers = []
+
+        bill = Bill(
+            identifier=identifier,
+            legislative_session=matter["bill_session"],
+            title=title,
+            classification=bill_type,
+            from_organization={"name": "Board of Directors"},
+        )
+
+        # The Metro scraper scrapes private bills.
+        # However, we do not want to capture significant data about private bills,
+        # other than the value of the helper function `_is_restricted` and a last
+        # modified timestamp.
+        # We yield private bills early, wipe data from previously imported once-public
+        # bills, and include only data *required* by the pupa schema.
+        # https://github.com/opencivicdata/pupa/blob/master/pupa/scrape/schemas/bill.py
+        bill.extras = {"restrict_view": self._is_restricted(matter)}
+
+        # Add API source early.
+        # Private bills should have this url for debugging.
+        legistar_api = self.BASE_URL + "/matters/{0}".format(matter_id)
+        bill.add_source(legistar_api, note="api")
+
+        if resources is None:
+            # required fields
+            bill.title = "Restricted View"
+
+            # wipe old data
+            bill.extras["plain_text"] = ""
+            bill.extras["rtf_text"] = ""
+            bill.sponsorships = []
+            bill.related_bills = []
+            bill.versions = []
+            bill.documents = []
+            bill.actions = []
 
             yield bill
+            return
+
+        legistar_web = matter["legistar_url"]
+        bill.add_source(legistar_web, note="web")
+
+        for identifier in alternate_identifiers:
+            bill.add_identifier(identifier)
+
+        for action, vote in resources["actions"]:
+            act = bill.add_action(**action)
+
+            if action["description"] == "Referred":
+                body_name = matter["MatterBodyName"]
+                act.add_related_entity(
+                    body_name,
+                    "organization",
+                    entity_id=_make_pseudo_id(name=body_name),
+                )
+
+            result, votes = vote
+            if result:
+                vote_event = VoteEvent(
+                    legislative_session=bill.legislative_session,
+                    motion_text=action["description"],
+                    organization=action["organization"],
+                    classification=None,
+                    start_date=action["date"],
+                    result=result,
+                    bill=bill,
+                )
+
+                vote_event.add_source(legistar_web)
+                vote_event.add_source(legistar_api + "/histories")
+
+                for vote in votes:
+                    try:
+                        raw_option = vote["VoteValueName"].lower()
+                    except AttributeError:
+                        raw_option = None
+                    clean_option = self.VOTE_OPTIONS.get(raw_option, raw_option)
+                    vote_event.vote(clean_option, vote["VotePersonName"].strip())
+
+                yield vote_event
+
+        for sponsorship in resources["sponsorships"]:
+            bill.add_sponsorship(**sponsorship)
+
+        for topic in resources["topics"]:
+            bill.add_subject(topic["MatterIndexName"].strip())
+
+        for related_bill in resources["related_bills"]:
+            bill.add_related_bill(**related_bill)
+
+        bill.add_version_link(
+            "Board Report",
+            f"https://metro.legistar.com/ViewReport.ashx?M=R&N=TextL5&GID=557&ID={matter_id}&GUID=LATEST&Title=Board+Report",  # noqa
+            media_type="application/pdf",
+        )
+
+        for attachment in resources["attachments"]:
+            if attachment["MatterAttachmentName"] and self._show_attachment(attachment):
+                bill.add_document_link(
+                    attachment["MatterAttachmentName"],
+                    attachment["MatterAttachmentHyperlink"].strip(),
+                    media_type="application/pdf",
+                )
+
+        bill.extras["local_classification"] = matter["MatterTypeName"]
+
+        text = resources["text"]
+
+        if text:
+            if text["MatterTextPlain"]:
+                bill.extras["plain_text"] = text["MatterTextPlain"]
+
+            if text["MatterTextRtf"]:
+                bill.extras["rtf_text"] = text["MatterTextRtf"].replace("\u0000", "")
+
+        yield bill
 
 
 # Defined according to OCD standard here:
@@ -0,0 +1,133 @@
+import copy
+import json
+import threading
+import time
+
+from pupa import settings
+
+from .state import state_path, write_json
+
+# BodyTypeIds of Metro's service councils, whose meetings we don't scrape
+SERVICE_COUNCIL_BODY_TYPES = {70, 75}
+
+# The board meets as several Legistar bodies, e.g., "Board of Directors -
+# Regular Board Meeting", which are all one organization.
+BOARD_OF_DIRECTORS = "Board of Directors"
+
+
+def _name_key(name):
+    return " ".join(name.split()).casefold()
+
+
+def _organization_name(body_name):
+    body_name = body_name.strip()
+
+    if _name_key(body_name).startswith(_name_key(BOARD_OF_DIRECTORS + " -")):
+        return BOARD_OF_DIRECTORS
+
+    return body_name
+
+
+class BodyRegistry:
+    """
+    Legistar bodies and body types, shared by every scraper in a run and
+    persisted between runs. Bodies almost never change, so they're only
+    fetched from the API when the copy on disk is older than ttl seconds.
+
+    Callers get copies, so they're free to change what they're given.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+
+        self._data = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    def _load(self, scraper):
+        with self._lock:
+            if self._data is None:
+                try:
+                    with open(self.path) as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError):
+                    pass
+
+            if self._data is None or time.time() - self._data["fetched_at"] > self.ttl:
+                self._data = self._fetch(scraper)
+                self._names = None
+                write_json(self.path, self._data)
+
+        return self._data
+
+    def _fetch(self, scraper):
+        body_types = scraper.get(scraper.BASE_URL + "/bodytypes/").json()
+        bodies = scraper.pages(scraper.BASE_URL + "/bodies/", item_key="BodyId")
+
+        return {
+            "fetched_at": time.time(),
+            "body_types": {
+                body_type["BodyTypeName"]: body_type["BodyTypeId"]
+                for body_type in body_types
+            },
+            "bodies": list(bodies),
+        }
+
+    def body_types(self, scraper):
+        """
+        Body type IDs, keyed on body type name.
+        """
+        return dict(self._load(scraper)["body_types"])
+
+    def bodies(self, scraper):
+        return copy.deepcopy(self._load(scraper)["bodies"])
+
+    def service_council_ids(self, scraper):
+        return {
+            body["BodyId"]
+            for body in self._load(scraper)["bodies"]
+            if body["BodyTypeId"] in SERVICE_COUNCIL_BODY_TYPES
+        }
+
+    def canonical_name(self, scraper, name):
+        """
+        The name of the organization a body name refers to, e.g., the name
+        of a bill sponsor or of the body an event belongs to. Names match
+        bodies regardless of case and spacing, and come back as the body's
+        own name, stripped, which is what we name committees. The bodies
+        the board meets as are all the Board of Directors. Names of bodies
+        we don't know are only stripped.
+        """
+        data = self._load(scraper)
+
+        with self._lock:
+            if self._names is None:
+                self._names = {
+                    _name_key(body["BodyName"]): _organization_name(body["BodyName"])
+                    for body in data["bodies"]
+                }
+
+            names = self._names
+
+        return names.get(_name_key(name)) or _organization_name(name)
+
+
+_body_registry = None
+_body_registry_lock = threading.Lock()
+
+
+def body_registry():
+    """
+    The process-wide body registry.
+    """
+    global _body_registry
+
+    with _body_registry_lock:
+        if _body_registry is None:
+            _body_registry = BodyRegistry(
+                state_path("bodies.json"),
+                ttl=getattr(settings, "LAMETRO_BODY_REGISTRY_TTL", 24 * 60 * 60),
+            )
+
+    return _body_registry
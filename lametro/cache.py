@@ -0,0 +1,308 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from pupa import settings
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from .instrumentation import request_stats
+from .state import state_path
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of HTTP responses. Entries older than max_age seconds
+    are treated as misses. When the cache grows past max_bytes, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, directory, max_bytes, max_age=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries if entry.name.endswith(".response")]
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.response")
+
+    def get(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.max_age and time.time() - meta["cached_at"] > self.max_age:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Bump the access time, so eviction drops the least recently used
+        # entries first.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        response = Response()
+        response.status_code = meta["status_code"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = meta["encoding"]
+        response.url = meta["url"]
+        response._content = content
+
+        with self._lock:
+            self.hits += 1
+
+        return response
+
+    def set(self, key, response):
+        path = self._path(key)
+
+        meta = {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "url": response.url,
+            "cached_at": time.time(),
+        }
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(response.content)
+
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except OSError:
+                pass
+
+            os.replace(tmp_path, path)
+            self._size += size
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Evict down to 90% of the limit, so we don't evict on every write
+        # once the cache is full.
+        target = self.max_bytes * 0.9
+
+        for entry in sorted(self._entries(), key=lambda entry: entry.stat().st_mtime):
+            if self._size <= target:
+                break
+
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+
+            self._size -= size
+
+    @property
+    def stats(self):
+        requests = self.hits + self.misses
+        hit_rate = self.hits / requests if requests else 0
+
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate)"
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def response_cache():
+    """
+    The process-wide response cache, so every scraper in a run shares one
+    cache (and one set of hit/miss counters).
+    """
+    global _response_cache
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                state_path("responses"),
+                max_bytes=getattr(
+                    settings, "LAMETRO_RESPONSE_CACHE_MAX_BYTES", 512 * 1024 * 1024
+                ),
+                max_age=getattr(
+                    settings, "LAMETRO_RESPONSE_CACHE_MAX_AGE", 7 * 24 * 60 * 60
+                ),
+            )
+
+    return _response_cache
+
+
+class KeyValueStore:
+    """
+    Persistent key-value store in a SQLite database under the state
+    directory, for small records that should outlive a run, e.g.,
+    fingerprints of scraped matters. Safe to share between threads.
+
+    The database is opened the first time the store is used, and opened
+    again if the store is used after it's closed, so scrapers can close
+    their stores when a scrape ends and still scrape again.
+    """
+
+    def __init__(self, name):
+        self.path = state_path(f"{name}.sqlite3")
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        # Call with the lock held
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS store (key TEXT PRIMARY KEY, value BLOB)"
+            )
+
+        return self._connection
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT value FROM store WHERE key = ?", (key,))
+                .fetchone()
+            )
+
+        return row[0] if row else default
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        with self._lock:
+            connection = self._connect()
+
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO store (key, value) VALUES (?, ?)",
+                    items.items(),
+                )
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RowVersionCacheMixin:
+    """
+    Cache sub-resources of Legistar matters and events, e.g., histories,
+    sponsors, attachments and event items, keyed on the row version
+    of the matter or event they belong to. If the parent hasn't changed
+    since we last saw it, reuse the cached response instead of making a
+    request.
+
+    Call remember_row_version with each matter or event before fetching its
+    sub-resources. Requests for sub-resources of unknown parents go through
+    to the API as usual, as do requests for UNCACHED_SUBRESOURCES, e.g.,
+    those a scraper stores some other way.
+    """
+
+    SUBRESOURCE_URL = re.compile(
+        r"/(?P<parent>matters|events)/(?P<id>\d+)/(?P<subresource>\w+)"
+    )
+
+    UNCACHED_SUBRESOURCES = frozenset()
+
+    # Fields that, taken together, change whenever the parent record does.
+    # The Legistar timestamps are not always updated when related records
+    # change, so consider every change marker we have.
+    ROW_VERSION_FIELDS = {
+        "matters": (
+            "MatterRowVersion",
+            "MatterLastModifiedUtc",
+            "MatterVersion",
+            "MatterAgendaDate",
+            "MatterPassedDate",
+        ),
+        "events": (
+            "EventRowVersion",
+            "EventLastModifiedUtc",
+            "EventAgendaLastPublishedUTC",
+            "EventMinutesLastPublishedUTC",
+        ),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._row_versions = {}
+
+    def remember_row_version(self, parent, record):
+        fields = self.ROW_VERSION_FIELDS[parent]
+        row_version = tuple(record.get(field) for field in fields)
+
+        # The first two fields are the row version and last modified
+        # timestamp. Without either, we can't tell whether the record
+        # changed, so don't cache its sub-resources.
+        if any(row_version[:2]):
+            record_id = record["MatterId" if parent == "matters" else "EventId"]
+            self._row_versions[(parent, record_id)] = row_version
+
+    def _row_version_key(self, method, url, params):
+        if method.lower() != "get":
+            return None
+
+        match = self.SUBRESOURCE_URL.search(url)
+        if not match or match.group("subresource") in self.UNCACHED_SUBRESOURCES:
+            return None
+
+        row_version = self._row_versions.get(
+            (match.group("parent"), int(match.group("id")))
+        )
+        if not row_version:
+            return None
+
+        request_key = self.key_for_request("get", url, params)
+        return json.dumps([request_key, row_version])
+
+    def request(self, method, url, params=None, **kwargs):
+        key = self._row_version_key(method, url, params)
+
+        if key:
+            response = response_cache().get(key)
+            if response is not None:
+                response.fromcache = True
+                request_stats().record_cache_hit(url)
+                return response
+
+        response = super().request(method, url, params=params, **kwargs)
+
+        if key and response.status_code == 200:
+            response_cache().set(key, response)
+
+        return response
@@ -1,20 +1,26 @@
 import datetime
-import io
+import json
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Generator
 import os
 
-import pdfplumber
-import pytesseract
-import requests
+import pytz
 from Levenshtein import distance
-from pdfminer.pdfparser import PDFSyntaxError
-from PIL import Image
+from pdfminer.psparser import PSException
 from pupa.scrape import Event, Scraper
 from sentry_sdk import capture_exception, capture_message
 
-from .base import LAMetroAPIWebEventScraper
-from .paired_event_stream import PairedEventStream
+from . import minutes
+from .base import LAMetroAPIWebEventScraper, ordered_prefetch, parse_flag
+from .bodies import body_registry
+from .cache import KeyValueStore, RowVersionCacheMixin, response_cache
+from .instrumentation import request_stats
+from .state import PendingState, Watermark
+from .paired_event_stream import LAMetroAPIEvent, PairedEventStream
 
 try:
     from .secrets import TOKEN
@@ -48,244 +54,470 @@ class MissingAttachmentsException(Exception):
         super().__init__(message)
 
 
-class LametroEventScraper(LAMetroAPIWebEventScraper, Scraper):
-    def events(self, since_datetime, event_ids=None):
+class LametroEventScraper(RowVersionCacheMixin, LAMetroAPIWebEventScraper, Scraper):
+    # Number of events to pair, merge and enrich at once. Requests are
+    # still throttled to requests_per_minute.
+    ENRICH_WORKERS = 4
+
+    # Minutes attachments to download and read the cover pages of at once,
+    # and audio links to resolve at once. Cover pages are read in separate
+    # processes, since OCR is CPU-bound.
+    MINUTES_WORKERS = 2
+
+    # How much of a minutes attachment to download before trying to read
+    # its cover page. Minutes packets can be tens of megabytes of scanned
+    # pages, but the cover page is usually near the start of the file.
+    COVER_PAGE_BYTES = 2 * 1024 * 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Threads that wait on cover page downloads and OCR get their own
+        # pool, so slow OCR doesn't hold up resolving audio links. Pools
+        # start the first time we need them, and stop when a scrape ends.
+        self._cover_page_pool = None
+        self._audio_pool = None
+        self._minutes_pool = None
+        self._pools_lock = threading.Lock()
+
+        # Cover page text, keyed on attachment URL and last modified time,
+        # so we read each version of an attachment at most once.
+        self._cover_pages = KeyValueStore("cover_pages")
+
+        # Where audio links redirect to, keyed on the audio URL
+        self._audio_redirects = KeyValueStore("audio_redirects")
+
+    @property
+    def cover_page_pool(self):
+        with self._pools_lock:
+            if self._cover_page_pool is None:
+                self._cover_page_pool = ThreadPoolExecutor(self.MINUTES_WORKERS)
+
+        return self._cover_page_pool
+
+    @property
+    def audio_pool(self):
+        with self._pools_lock:
+            if self._audio_pool is None:
+                self._audio_pool = ThreadPoolExecutor(self.MINUTES_WORKERS)
+
+        return self._audio_pool
+
+    @property
+    def minutes_pool(self):
+        # Most scrapes don't read any cover pages, so this saves starting
+        # worker processes, too. Spawn, rather than fork, since we have
+        # threads running.
+        with self._pools_lock:
+            if self._minutes_pool is None:
+                self._minutes_pool = ProcessPoolExecutor(
+                    self.MINUTES_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+        return self._minutes_pool
+
+    def close(self):
+        """
+        Stop the worker threads and OCR processes, and close the stores.
+        They start again if the scraper is used again.
+        """
+        with self._pools_lock:
+            pools = [self._cover_page_pool, self._audio_pool, self._minutes_pool]
+            self._cover_page_pool = self._audio_pool = self._minutes_pool = None
+
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown()
+
+        self._cover_pages.close()
+        self._audio_redirects.close()
+
+    def events(self, since_datetime, event_ids=None, watermark=None):
+        # Pair the events of full scrapes a date at a time, as they come in,
+        # rather than reading every event since 2014 first.
+        streaming = not (event_ids or since_datetime)
+
         if event_ids:
             events = (
                 self.get(f"{self.BASE_URL}/events/{id}").json() for id in event_ids
             )
 
+        elif streaming:
+            events = self.api_events_by_date()
+
         else:
             events = self.api_events(since_datetime=since_datetime)
 
+        if watermark:
+            events = watermark.track(events, "EventLastModifiedUtc")
+
         yield from PairedEventStream(
-            self.filter(events), find_missing_partner=since_datetime is not None
+            self.filter(events),
+            find_missing_partner=since_datetime is not None,
+            workers=self.ENRICH_WORKERS,
+            scraper=self,
+            streaming=streaming,
+        )
+
+    def api_events_by_date(self):
+        """
+        Every event in the API, ordered by date.
+        """
+        yield from self.pages(
+            self.BASE_URL + "/events/",
+            params={"$orderby": "EventDate,EventId"},
+            item_key="EventId",
         )
 
+    def agendas(self, since_datetime):
+        """
+        Yield each event updated since the given time or scheduled in the
+        future, with the IDs of the matters on its agenda. Upcoming events
+        come first, soonest first, then the rest in API order. Agendas are
+        read straight from the API event list, skipping the web scraping
+        and pairing a full event scrape does.
+
+        Spanish events share their English partner's agenda, so skip them.
+        Event items are cached on the event's row version, so an event
+        scrape in the same run reuses them.
+        """
+        api_events = [
+            event
+            for event in self.filter(self.api_events(since_datetime=since_datetime))
+            if not LAMetroAPIEvent(event).is_spanish
+        ]
+
+        upcoming = sorted(
+            filter(self.is_upcoming, api_events),
+            key=lambda event: (event["EventDate"], event["EventId"]),
+        )
+        past = [event for event in api_events if not self.is_upcoming(event)]
+
+        for event in upcoming + past:
+            self.remember_row_version("events", event)
+
+            # EventItemMatterId can be null
+            matter_ids = [
+                agenda_item["EventItemMatterId"]
+                for agenda_item in self.agenda(event)
+                if agenda_item["EventItemMatterId"]
+            ]
+
+            yield event, matter_ids
+
+    def is_upcoming(self, event):
+        """
+        Whether an API event is scheduled for today or later, local time.
+        """
+        today = datetime.datetime.now(pytz.timezone(self.TIMEZONE)).date()
+
+        # EventDate is a local date at midnight, e.g., 2019-02-28T00:00:00
+        return (event["EventDate"] or "") >= today.isoformat()
+
     def filter(
         self, events: Generator[dict, None, None]
     ) -> Generator[dict, None, None]:
-        service_councils = set(
-            sc["BodyId"]
-            for sc in self.search(
-                "/bodies/", "BodyId", "BodyTypeId eq 70 or BodyTypeId eq 75"
-            )
-        )
+        service_councils = body_registry().service_council_ids(self)
 
         is_not_service_council = lambda e: e["EventBodyId"] not in service_councils
 
         yield from filter(lambda e: is_not_service_council(e), events)
 
-    def scrape(self, window=None, event_ids=None):
+    def scrape(self, window=None, event_ids=None, incremental=False):
+        """
+        Optional parameters
+        :window (numeric) - Amount of time for which to scrape updates, in
+        days. Scrapes all events if None or 0.
+        :event_ids (str) - Comma-separated list of event IDs to scrape
+        :incremental (bool) - Scrape events updated since the last event we
+        saw in an imported scrape, rather than a fixed window. Falls back
+        to :window on the first incremental scrape.
+        """
         if window and event_ids:
             raise ValueError("Can't specify both window and event_ids")
 
         n_days_ago = None
 
-        if window and float(window) != 0:
+        watermark = Watermark("events") if not event_ids else None
+        since_watermark = (
+            watermark.since() if watermark and parse_flag(incremental) else None
+        )
+
+        if since_watermark:
+            self.info(f"Scraping events updated since {since_watermark.isoformat()}")
+            n_days_ago = since_watermark
+        elif window and float(window) != 0:
             n_days_ago = datetime.datetime.utcnow() - datetime.timedelta(float(window))
 
         event_ids = event_ids.split(",") if event_ids else None
 
-        for event, web_event in self.events(
-            since_datetime=n_days_ago, event_ids=event_ids
-        ):
-            body_name = event["EventBodyName"]
+        events = self.events(
+            since_datetime=n_days_ago, event_ids=event_ids, watermark=watermark
+        )
 
-            if "Board of Directors -" in body_name:
-                body_name, event_name = [part.strip() for part in body_name.split("-")]
-            else:
-                event_name = body_name
-
-            # Events can have an EventAgendaStatusName of "Final", "Final Revised",
-            # and "Final 2nd Revised."
-            # We classify these events as "passed."
-            status_name = event["EventAgendaStatusName"]
-            if status_name.startswith("Final"):
-                status = "passed"
-            elif status_name == "Draft":
-                status = "confirmed"
-            elif status_name == "Canceled":
-                status = "cancelled"
-            else:
-                status = "tentative"
-
-            location = event["EventLocation"]
-
-            if not location:
-                # We expect some events to have no location. LA Metro would
-                # like these displayed in the Councilmatic interface. However,
-                # OCD requires a value for this field. Add a sane default.
-                location = "Not available"
-
-            e = Event(
-                event_name,
-                start_date=event["start"],
-                description="",
-                location_name=location,
-                status=status,
+        try:
+            with ThreadPoolExecutor(self.ENRICH_WORKERS) as pool:
+                for (event, web_event), enrichment in ordered_prefetch(
+                    self.enrich, events, pool, self.ENRICH_WORKERS
+                ):
+                    yield self.event_from_api(event, web_event, enrichment)
+
+        finally:
+            # Stop the worker threads and OCR processes, even if the scrape
+            # fails
+            self.close()
+
+        self.info(f"Response cache: {response_cache().stats}")
+
+        if watermark:
+            # Advance the watermark once what we emitted has been imported
+            pending = PendingState(self.datadir, "events")
+            watermark.stage(pending)
+            pending.save()
+
+    def enrich(self, paired_event):
+        """
+        Fetch everything else we need to build an Event: its agenda, its
+        approved minutes, if they aren't attached to the event, and the
+        redirect URLs of its audio. Runs on a worker thread, so it only
+        fetches. Building the Event happens in order on the main thread.
+        """
+        event, web_event = paired_event
+
+        enrichment = {"agenda": [], "approved_minutes": [], "audio": []}
+
+        # Reuse cached event items if the event hasn't changed
+        self.remember_row_version("events", event)
+
+        if "event_details" in event:
+            enrichment["agenda"] = list(self.agenda(event))
+
+        if not event["EventMinutesFile"]:
+            enrichment["approved_minutes"] = list(
+                self.find_approved_minutes(event) or []
             )
 
-            e.pupa_id = str(event["EventId"])
+        audio_urls = [audio["url"] for audio in event["audio"]]
+        redirect_urls = self.audio_pool.map(self.audio_redirect, audio_urls)
 
-            # Metro requires the EventGuid to build out MediaPlayer links.
-            # Add both the English event GUID, and the Spanish event GUID if
-            # it exists, to the extras dict.
-            e.extras = {"guid": event["EventGuid"]}
+        for audio, redirect_url in zip(event["audio"], redirect_urls):
+            if not redirect_url:
+                # In some cases, the redirect URL does not yet
+                # contain the location of the audio file. Skip
+                # these events, and retry on next scrape.
+                continue
 
-            legistar_api_url = self.BASE_URL + "/events/{0}".format(event["EventId"])
-            e.add_source(legistar_api_url, note="api")
+            enrichment["audio"].append((audio, redirect_url))
 
-            if event.get("SAPEventGuid"):
-                LOGGER.info(
-                    f"Found SAP event for {event['EventBodyName']} on {event['EventDate']}"
-                )
-                e.extras["sap_guid"] = event["SAPEventGuid"]
+        return enrichment
 
-            if web_event.has_ecomment:
-                self.info(
-                    "Adding eComment link {0} from {1}".format(
-                        web_event["eComment"], web_event["Meeting Details"]["url"]
-                    )
-                )
-                e.extras["ecomment"] = web_event["eComment"]
-
-            if "event_details" in event:
-                # if there is not a meeting detail page on legistar
-                # don't capture the agenda data from the API
-                for item in self.agenda(event):
-                    agenda_item = e.add_agenda_item(item["EventItemTitle"])
-                    if item["EventItemMatterFile"]:
-                        identifier = item["EventItemMatterFile"]
-                        agenda_item.add_bill(identifier)
-
-                    if item["EventItemAgendaNumber"]:
-                        # To the notes field, add the item number as given in the agenda minutes
-                        agenda_number = item["EventItemAgendaNumber"]
-                        note = "Agenda number, {}".format(agenda_number)
-                        agenda_item["notes"].append(note)
-
-                        agenda_item["extras"]["agenda_number"] = agenda_number
-
-                    # The EventItemAgendaSequence provides
-                    # the line number of the Legistar agenda grid.
-                    agenda_item["extras"]["item_agenda_sequence"] = item[
-                        "EventItemAgendaSequence"
-                    ]
-
-                # Historically, the Legistar system has duplicated the EventItemAgendaSequence,
-                # resulting in data inaccuracies. In such cases, we'll log the event
-                # and notify Metro that their data needs to be cleaned (rather than failing).
-                try:
-                    item_agenda_sequences = [
-                        item["extras"]["item_agenda_sequence"] for item in e.agenda
-                    ]
-                    if len(item_agenda_sequences) != len(set(item_agenda_sequences)):
-                        raise DuplicateAgendaItemException(e, legistar_api_url)
-                except DuplicateAgendaItemException as exc:
-                    capture_exception(exc)
-
-            e.add_participant(name=body_name, type="organization")
-
-            if event.get("SAPEventId"):
-                e.add_source(
-                    self.BASE_URL + "/events/{0}".format(event["SAPEventId"]),
-                    note="api (sap)",
-                )
+    def audio_redirect(self, url):
+        """
+        The location an audio link redirects to, or None if it doesn't
+        redirect anywhere yet. Once an audio link redirects somewhere, it
+        keeps redirecting there, so remember it rather than asking again.
+        """
+        if redirect_url := self._audio_redirects.get(url):
+            request_stats().record_cache_hit(url)
+            return redirect_url
 
-            if event["EventAgendaFile"]:
-                e.add_document(
-                    note="Agenda",
-                    url=event["EventAgendaFile"],
-                    media_type="application/pdf",
-                    date=self.to_utc_timestamp(
-                        event["EventAgendaLastPublishedUTC"]
-                    ).date(),
+        redirect_url = self.head(url).headers.get("Location")
+
+        if redirect_url:
+            self._audio_redirects.set(url, redirect_url)
+
+        return redirect_url
+
+    def event_from_api(self, event, web_event, enrichment):
+        body_name = event["EventBodyName"]
+
+        if "Board of Directors -" in body_name:
+            _, event_name = [part.strip() for part in body_name.split("-")]
+        else:
+            event_name = body_name
+
+        # Events can have an EventAgendaStatusName of "Final", "Final Revised",
+        # and "Final 2nd Revised."
+        # We classify these events as "passed."
+        status_name = event["EventAgendaStatusName"]
+        if status_name.startswith("Final"):
+            status = "passed"
+        elif status_name == "Draft":
+            status = "confirmed"
+        elif status_name == "Canceled":
+            status = "cancelled"
+        else:
+            status = "tentative"
+
+        location = event["EventLocation"]
+
+        if not location:
+            # We expect some events to have no location. LA Metro would
+            # like these displayed in the Councilmatic interface. However,
+            # OCD requires a value for this field. Add a sane default.
+            location = "Not available"
+
+        e = Event(
+            event_name,
+            start_date=event["start"],
+            description="",
+            location_name=location,
+            status=status,
+        )
+
+        e.pupa_id = str(event["EventId"])
+
+        # Metro requires the EventGuid to build out MediaPlayer links.
+        # Add both the English event GUID, and the Spanish event GUID if
+        # it exists, to the extras dict.
+        e.extras = {"guid": event["EventGuid"]}
+
+        legistar_api_url = self.BASE_URL + "/events/{0}".format(event["EventId"])
+        e.add_source(legistar_api_url, note="api")
+
+        if event.get("SAPEventGuid"):
+            LOGGER.info(
+                f"Found SAP event for {event['EventBodyName']} on {event['EventDate']}"
+            )
+            e.extras["sap_guid"] = event["SAPEventGuid"]
+
+        if web_event.has_ecomment:
+            self.info(
+                "Adding eComment link {0} from {1}".format(
+                    web_event["eComment"], web_event["Meeting Details"]["url"]
                 )
+            )
+            e.extras["ecomment"] = web_event["eComment"]
+
+        if "event_details" in event:
+            # if there is not a meeting detail page on legistar
+            # don't capture the agenda data from the API
+            for item in enrichment["agenda"]:
+                agenda_item = e.add_agenda_item(item["EventItemTitle"])
+                if item["EventItemMatterFile"]:
+                    identifier = item["EventItemMatterFile"]
+                    agenda_item.add_bill(identifier)
+
+                if item["EventItemAgendaNumber"]:
+                    # To the notes field, add the item number as given in the agenda minutes
+                    agenda_number = item["EventItemAgendaNumber"]
+                    note = "Agenda number, {}".format(agenda_number)
+                    agenda_item["notes"].append(note)
+
+                    agenda_item["extras"]["agenda_number"] = agenda_number
+
+                # The EventItemAgendaSequence provides
+                # the line number of the Legistar agenda grid.
+                agenda_item["extras"]["item_agenda_sequence"] = item[
+                    "EventItemAgendaSequence"
+                ]
+
+            # Historically, the Legistar system has duplicated the EventItemAgendaSequence,
+            # resulting in data inaccuracies. In such cases, we'll log the event
+            # and notify Metro that their data needs to be cleaned (rather than failing).
+            try:
+                item_agenda_sequences = [
+                    item["extras"]["item_agenda_sequence"] for item in e.agenda
+                ]
+                if len(item_agenda_sequences) != len(set(item_agenda_sequences)):
+                    raise DuplicateAgendaItemException(e, legistar_api_url)
+            except DuplicateAgendaItemException as exc:
+                capture_exception(exc)
+
+        e.add_participant(
+            name=body_registry().canonical_name(self, body_name), type="organization"
+        )
+
+        if event.get("SAPEventId"):
+            e.add_source(
+                self.BASE_URL + "/events/{0}".format(event["SAPEventId"]),
+                note="api (sap)",
+            )
+
+        if event["EventAgendaFile"]:
+            e.add_document(
+                note="Agenda",
+                url=event["EventAgendaFile"],
+                media_type="application/pdf",
+                date=self.to_utc_timestamp(
+                    event["EventAgendaLastPublishedUTC"]
+                ).date(),
+            )
 
-            # in case this event's minutes haven't been approved yet
-            e.extras["approved_minutes"] = False
+        # in case this event's minutes haven't been approved yet
+        e.extras["approved_minutes"] = False
+
+        found_minutes = False
+        if event["EventMinutesFile"]:
+            e.add_document(
+                note="Minutes",
+                url=event["EventMinutesFile"],
+                media_type="application/pdf",
+                date=self.to_utc_timestamp(
+                    event["EventMinutesLastPublishedUTC"]
+                ).date(),
+            )
+            found_minutes = True
 
-            found_minutes = False
-            if event["EventMinutesFile"]:
+        else:
+            # Try to find an approved minutes file
+            for approved in enrichment["approved_minutes"]:
+                self.info(
+                    f"Found approved minutes file for event {event['EventId']}: {approved['MatterAttachmentHyperlink']}..."
+                )
                 e.add_document(
-                    note="Minutes",
-                    url=event["EventMinutesFile"],
+                    note=approved["MatterAttachmentName"],
+                    url=approved["MatterAttachmentHyperlink"],
                     media_type="application/pdf",
                     date=self.to_utc_timestamp(
-                        event["EventMinutesLastPublishedUTC"]
+                        approved["MatterAttachmentLastModifiedUtc"]
                     ).date(),
                 )
+                e.extras["approved_minutes"] = True
                 found_minutes = True
 
-            else:
-                # Try to find an approved minutes file
-                approved_minutes = self.find_approved_minutes(event)
-                for minutes in approved_minutes:
-                    self.info(
-                        f"Found approved minutes file for event {event['EventId']}: {minutes['MatterAttachmentHyperlink']}..."
-                    )
-                    e.add_document(
-                        note=minutes["MatterAttachmentName"],
-                        url=minutes["MatterAttachmentHyperlink"],
-                        media_type="application/pdf",
-                        date=self.to_utc_timestamp(
-                            minutes["MatterAttachmentLastModifiedUtc"]
-                        ).date(),
-                    )
-                    e.extras["approved_minutes"] = True
-                    found_minutes = True
-
-                # If we can't find an approved minutes file, check if the
-                # web event has a 'Published minutes' file. Note that this file
-                # could be a PDF of scanned physical pages.
-                web_event_has_published_minutes = (
-                    "Published minutes" in web_event
-                    and web_event["Published minutes"] != "Not\xa0available"
+            # If we can't find an approved minutes file, check if the
+            # web event has a 'Published minutes' file. Note that this file
+            # could be a PDF of scanned physical pages.
+            web_event_has_published_minutes = (
+                "Published minutes" in web_event
+                and web_event["Published minutes"] != "Not\xa0available"
+            )
+            if not found_minutes and web_event_has_published_minutes:
+                self.warning(f"Using web event's 'Published minutes' file for event {event['EventId']}...")
+                e.add_document(
+                    note=web_event["Published minutes"]["label"],
+                    url=web_event["Published minutes"]["url"],
+                    media_type="application/pdf",
                 )
-                if not found_minutes and web_event_has_published_minutes:
-                    self.warning(f"Using web event's 'Published minutes' file for event {event['EventId']}...")
-                    e.add_document(
-                        note=web_event["Published minutes"]["label"],
-                        url=web_event["Published minutes"]["url"],
-                        media_type="application/pdf",
-                    )
 
-            for audio in event["audio"]:
-                try:
-                    redirect_url = self.head(audio["url"]).headers["Location"]
-
-                except KeyError:
-                    # In some cases, the redirect URL does not yet
-                    # contain the location of the audio file. Skip
-                    # these events, and retry on next scrape.
-                    continue
-
-                # Sometimes if there is an issue getting the Spanish
-                # audio created, Metro has the Spanish Audio link
-                # go to the English Audio.
-                #
-                # Pupa does not allow the for duplicate media links,
-                # so we'll ignore the the second media link if it's
-                # the same as the first media link.
-                #
-                # Because of the way that the event['audio'] is created
-                # the first audio link is always English and the
-                # second is always Spanish
-                e.add_media_link(
-                    note=audio["label"],
-                    url=redirect_url,
-                    media_type="text/html",
-                    on_duplicate="ignore",
-                )
+        for audio, redirect_url in enrichment["audio"]:
+            # Sometimes if there is an issue getting the Spanish
+            # audio created, Metro has the Spanish Audio link
+            # go to the English Audio.
+            #
+            # Pupa does not allow the for duplicate media links,
+            # so we'll ignore the the second media link if it's
+            # the same as the first media link.
+            #
+            # Because of the way that the event['audio'] is created
+            # the first audio link is always English and the
+            # second is always Spanish
+            e.add_media_link(
+                note=audio["label"],
+                url=redirect_url,
+                media_type="text/html",
+                on_duplicate="ignore",
+            )
 
-            if event["event_details"]:
-                for link in event["event_details"]:
-                    e.add_source(**link)
-            else:
-                e.add_source("https://metro.legistar.com/Calendar.aspx", note="web")
+        if event["event_details"]:
+            for link in event["event_details"]:
+                e.add_source(**link)
+        else:
+            e.add_source("https://metro.legistar.com/Calendar.aspx", note="web")
 
-            yield e
+        return e
 
     def _suppress_item_matter(self, item, agenda_url):
         """
@@ -311,6 +543,104 @@ class LametroEventScraper(LAMetroAPIWebEventScraper, Scraper):
             if suppress:
                 item["EventItemMatterFile"] = None
 
+    def download_prefix(self, url, max_bytes):
+        """
+        Download up to max_bytes of a file, or all of it if max_bytes is
+        None. Ask for just that range, but stop reading at max_bytes in
+        case the server ignores us and sends the whole file.
+
+        Returns the content and whether it's the complete file.
+        """
+        headers = {"Range": f"bytes=0-{max_bytes - 1}"} if max_bytes else {}
+
+        with self.download(url, headers=headers, stream=True) as response:
+            chunks = []
+            n_bytes = 0
+
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                n_bytes += len(chunk)
+
+                if max_bytes and n_bytes >= max_bytes:
+                    break
+
+            content = b"".join(chunks)[:max_bytes]
+
+            if response.status_code == 206:
+                # Content-Range looks like "bytes 0-1023/146515"
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                complete = total.isdigit() and int(total) <= len(content)
+            else:
+                complete = not max_bytes or n_bytes < max_bytes
+
+        return content, complete
+
+    def cover_page_text(self, attachment):
+        """
+        Text of the cover page of a minutes attachment, or None if the
+        attachment isn't a readable PDF.
+        """
+        url = attachment["MatterAttachmentHyperlink"]
+        key = json.dumps([url, attachment.get("MatterAttachmentLastModifiedUtc")])
+
+        # Attachments we couldn't read are stored as empty text, so we
+        # don't download them again either.
+        text = self._cover_pages.get(key)
+        if text is not None:
+            request_stats().record_cache_hit(url)
+            return text or None
+
+        content, complete = self.download_prefix(url, self.COVER_PAGE_BYTES)
+
+        if not complete:
+            # Try to read the cover page from the start of the file. If we
+            # can't, e.g., because the page tree is at the end of the file,
+            # fall back to downloading all of it.
+            try:
+                text = self.read_cover_page(content)
+            except PSException:
+                text = None
+
+            if not text:
+                self.debug(f"Couldn't read cover page from partial download of {url}")
+                content, complete = self.download_prefix(url, None)
+
+        if complete:
+            try:
+                text = self.read_cover_page(content)
+            except PSException as e:
+                capture_message(
+                    f"PDFPlumber encountered an error opening a file: {e}",
+                    "warning",
+                )
+                text = None
+
+        self._cover_pages.set(key, text or "")
+
+        return text
+
+    def read_cover_page(self, content):
+        """
+        Read the cover page of a PDF in a minutes worker process. If a
+        worker dies, e.g., because OCR ran out of memory, the pool is
+        broken, and fails every job sent to it. Replace it, and try again.
+        """
+        pool = self.minutes_pool
+
+        try:
+            return pool.submit(minutes.cover_page_text, content).result()
+        except BrokenProcessPool:
+            self.warning("A minutes worker process died. Restarting the pool.")
+
+        with self._pools_lock:
+            # Another thread may have replaced the pool already
+            if self._minutes_pool is pool:
+                self._minutes_pool = None
+
+        pool.shutdown(wait=False)
+
+        return self.minutes_pool.submit(minutes.cover_page_text, content).result()
+
     def find_approved_minutes(self, event):
         """
         The minutes of some meetings are available as a legislative item
@@ -390,65 +720,46 @@ class LametroEventScraper(LAMetroAPIWebEventScraper, Scraper):
                 Multiple attachments have been found.
                 Return only those that look like minutes files.
                 """
-                for attach in attachments:
-                    url = attach["MatterAttachmentHyperlink"]
-                    response = requests.get(url)
-
-                    with io.BytesIO(response.content) as filestream:
-                        try:
-                            pdf = pdfplumber.open(filestream)
-                        except PDFSyntaxError as e:
-                            capture_message(
-                                f"PDFPlumber encountered an error opening a file: {e}",
-                                "warning",
-                            )
-                            continue
-                        cover_page = pdf.pages[0]
-
-                        cover_page_text = cover_page.extract_text()
-                        if not cover_page_text:
-                            # No extractable text found.
-                            # Turn the page into an image and use OCR to get text.
-                            cover_page_image = cover_page.to_image(resolution=300)
-
-                            with io.BytesIO() as in_mem_image:
-                                cover_page_image.save(in_mem_image)
-                                in_mem_image.seek(0)
-                                cover_page_text = pytesseract.image_to_string(
-                                    Image.open(in_mem_image)
-                                )
-
-                        def edit_distance_lte_n(target, corpus, n):
-                            for line in corpus.splitlines():
-                                _distance = distance(target, line, score_cutoff=n)
-                                self.debug(f"{target}, {line}, {_distance}")
-                                if _distance <= n:
-                                    return True
-                            else:
-                                return False
-
-                        contains_minutes = "minutes" in cover_page_text.lower()
-                        if contains_minutes:
-                            contains_exact_body = (
-                                name.lower() in cover_page_text.lower()
+                cover_pages = ordered_prefetch(
+                    self.cover_page_text,
+                    attachments,
+                    self.cover_page_pool,
+                    self.MINUTES_WORKERS,
+                )
+
+                for attach, cover_page_text in cover_pages:
+                    if cover_page_text is None:
+                        continue
+
+                    def edit_distance_lte_n(target, corpus, n):
+                        for line in corpus.splitlines():
+                            _distance = distance(target, line, score_cutoff=n)
+                            self.debug(f"{target}, {line}, {_distance}")
+                            if _distance <= n:
+                                return True
+                        else:
+                            return False
+
+                    contains_minutes = "minutes" in cover_page_text.lower()
+                    if contains_minutes:
+                        contains_exact_body = name.lower() in cover_page_text.lower()
+                        is_minutes_file = True if contains_exact_body else False
+
+                        if not is_minutes_file:
+                            # Try a fuzzy body search
+                            contains_fuzzy_body = edit_distance_lte_n(
+                                name.lower(), cover_page_text.lower(), 2
                             )
-                            is_minutes_file = True if contains_exact_body else False
-
-                            if not is_minutes_file:
-                                # Try a fuzzy body search
-                                contains_fuzzy_body = edit_distance_lte_n(
-                                    name.lower(), cover_page_text.lower(), 2
-                                )
-                                if contains_fuzzy_body:
-                                    self.info(
-                                        f"Found minutes for the {name} meeting of {date} by fuzzy match: {attach}"
-                                        )
-                                    is_minutes_file = True
-
-                            if is_minutes_file:
-                                yield attach
-                                n_minutes += 1
-                                break
+                            if contains_fuzzy_body:
+                                self.info(
+                                    f"Found minutes for the {name} meeting of {date} by fuzzy match: {attach}"
+                                    )
+                                is_minutes_file = True
+
+                        if is_minutes_file:
+                            yield attach
+                            n_minutes += 1
+                            break
 
         if n_minutes == 0:
             self.warning(f"Couldn't find minutes for the {name} meeting of {date}.")
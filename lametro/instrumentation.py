@@ -0,0 +1,231 @@
+"""
+Count the requests a scrape makes, and how long they take, by endpoint
+family, e.g., /matters/{id}/histories or the web calendar.
+
+Every request made over the shared transport is recorded, along with
+responses served from our caches. The totals are written to a JSON file
+when the process exits. To render them as Markdown, e.g., for a GitHub
+Actions step summary, run:
+
+    python -m lametro.instrumentation /path/to/request_stats.json
+"""
+
+import atexit
+import json
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from pupa import settings
+from requests.adapters import HTTPAdapter
+
+from .state import state_path, write_json
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+
+API_PATH = re.compile(r"^/v1/[^/]+(?P<path>/.*)?$")
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_family(url):
+    """
+    Group a URL with others that hit the same endpoint, e.g.,
+    https://webapi.legistar.com/v1/metro/matters/4450/histories becomes
+    "api /matters/{id}/histories".
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+
+    # Match on paths, as well as hosts, so requests to a stand-in for
+    # Legistar, e.g., in load tests, are grouped the same way.
+    match = API_PATH.match(parts.path)
+    if host == "webapi.legistar.com" or match:
+        path = (match and match.group("path")) or "/"
+        return "api " + (ID_SEGMENT.sub("/{id}", path).rstrip("/") or "/")
+
+    if host == "metro.legistar.com" or parts.path.lower().endswith((".aspx", ".ashx")):
+        return "web " + parts.path
+
+    if parts.path.lower().endswith(".pdf") or host.endswith("legistar1.com"):
+        return "attachments"
+
+    return host
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def record(self, seconds, n_bytes, error):
+        self.requests += 1
+        self.errors += int(error)
+        self.bytes += n_bytes
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.histogram[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "histogram": dict(
+                zip((str(bound) for bound in LATENCY_BUCKETS), self.histogram)
+            ),
+        }
+
+
+class RequestStats:
+    def __init__(self):
+        self.started_at = time.time()
+        self.endpoints = {}
+
+        self._lock = threading.Lock()
+
+    def _endpoint(self, url):
+        family = endpoint_family(url)
+
+        if family not in self.endpoints:
+            self.endpoints[family] = EndpointStats()
+
+        return self.endpoints[family]
+
+    def record(self, url, seconds, n_bytes=0, error=False):
+        with self._lock:
+            self._endpoint(url).record(seconds, n_bytes, error)
+
+    def record_cache_hit(self, url):
+        with self._lock:
+            self._endpoint(url).cache_hits += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": round(time.time() - self.started_at, 3),
+                "endpoints": {
+                    family: stats.as_dict()
+                    for family, stats in sorted(self.endpoints.items())
+                },
+            }
+
+    def write(self, path):
+        if self.endpoints:
+            write_json(path, self.summary())
+
+
+_request_stats = None
+_request_stats_lock = threading.Lock()
+
+
+def request_stats():
+    """
+    The process-wide request stats. They're written to
+    LAMETRO_REQUEST_STATS_FILE when the process exits.
+    """
+    global _request_stats
+
+    with _request_stats_lock:
+        if _request_stats is None:
+            _request_stats = RequestStats()
+
+            path = getattr(
+                settings,
+                "LAMETRO_REQUEST_STATS_FILE",
+                state_path("request_stats.json"),
+            )
+            atexit.register(_request_stats.write, path)
+
+    return _request_stats
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that records each request it sends in the request stats.
+    Latency includes reading the body, unless the response is streamed.
+    """
+
+    def send(self, request, stream=False, **kwargs):
+        start = time.perf_counter()
+
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+
+            if stream:
+                n_bytes = int(response.headers.get("Content-Length") or 0)
+            else:
+                n_bytes = len(response.content)
+
+        except Exception:
+            request_stats().record(request.url, time.perf_counter() - start, error=True)
+            raise
+
+        request_stats().record(
+            request.url,
+            time.perf_counter() - start,
+            n_bytes,
+            error=response.status_code >= 400,
+        )
+
+        return response
+
+
+def to_markdown(summary):
+    def percentile(stats, p):
+        # Upper bound of the bucket the pth percentile falls in
+        target = stats["requests"] * p
+        seen = 0
+
+        for bound, count in stats["histogram"].items():
+            seen += count
+            if count and seen >= target:
+                return "≤ " + (f"{float(bound):g}s" if bound != "inf" else "∞")
+
+        return "-"
+
+    lines = [
+        f"### Requests ({summary['wall_seconds']:.0f}s wall clock)",
+        "",
+        "| Endpoint | Requests | Errors | Cache hits | MB | Total s | Mean s | p95 | Max s |",
+        "| --- | ---: | ---: | ---: | ---: | ---: | ---: | --- | ---: |",
+    ]
+
+    endpoints = sorted(
+        summary["endpoints"].items(), key=lambda item: -item[1]["seconds"]
+    )
+
+    for family, stats in endpoints:
+        requests = stats["requests"]
+        lookups = requests + stats["cache_hits"]
+        hit_rate = stats["cache_hits"] / lookups if lookups else 0
+        mean = stats["seconds"] / requests if requests else 0
+
+        lines.append(
+            f"| `{family}` | {requests} | {stats['errors']} "
+            f"| {stats['cache_hits']} ({hit_rate:.0%}) "
+            f"| {stats['bytes'] / 1024 / 1024:.1f} | {stats['seconds']:.1f} "
+            f"| {mean:.2f} | {percentile(stats, 0.95)} | {stats['max_seconds']:.1f} |"
+        )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        print(to_markdown(json.load(f)))
@@ -0,0 +1,35 @@
+"""
+Read the cover page of a minutes PDF. Cover pages are read in worker
+processes, so OCR doesn't hold up the event scrape. Keep this module's
+imports light, since each worker process imports it.
+"""
+
+import io
+
+import pdfplumber
+import pytesseract
+from PIL import Image
+
+
+def cover_page_text(content):
+    """
+    Extract the text of the first page of a PDF, given its content. If the
+    page has no extractable text, e.g., because it's a scan, turn it into
+    an image and use OCR to get text.
+
+    Raises a PSException, e.g., PDFSyntaxError, if the PDF can't be parsed,
+    e.g., because it's truncated.
+    """
+    with io.BytesIO(content) as filestream, pdfplumber.open(filestream) as pdf:
+        cover_page = pdf.pages[0]
+
+        text = cover_page.extract_text()
+        if not text:
+            cover_page_image = cover_page.to_image(resolution=300)
+
+            with io.BytesIO() as in_mem_image:
+                cover_page_image.save(in_mem_image)
+                in_mem_image.seek(0)
+                text = pytesseract.image_to_string(Image.open(in_mem_image))
+
+    return text
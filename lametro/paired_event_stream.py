@@ -1,9 +1,11 @@
 import datetime
+import itertools
 import logging
 import re
-from typing import Generator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, Iterable, Optional
 
-from .base import LAMetroAPIWebEventScraper
+from .base import LAMetroAPIWebEventScraper, ordered_prefetch
 
 LOGGER = logging.getLogger(__name__)
 
@@ -98,11 +100,45 @@ class PairedEventStream:
             - From API (partner search)
         - Merge events
     - Output: Stream of events that have been merged
+
+    Merging scrapes the web calendar and detail page of both events in a
+    pair. Pass workers > 1 to merge that many pairs at once. Merged events
+    are still yielded in pairing order.
+
+    Pass the event scraper that's running as scraper to make requests with
+    it, and its rate limit. Otherwise, the stream creates an unthrottled
+    scraper of its own.
+
+    By default, the stream reads every event before pairing any of them.
+    Partners share an EventDate, so if the events are ordered by date, pass
+    streaming=True to pair them one date at a time instead. Events come out
+    as soon as their date is paired, and only one date's events are held in
+    memory at once.
     """
 
-    def __init__(self, events: list[dict], find_missing_partner: bool = True) -> None:
-        self.events = [LAMetroAPIEvent(event) for event in events]
+    # Partner searches to OR together in one request. Keep the query
+    # string well under the URL length limits of the Legistar API.
+    PARTNER_BATCH_SIZE = 15
+
+    def __init__(
+        self,
+        events: list[dict],
+        find_missing_partner: bool = True,
+        workers: int = 1,
+        scraper: Optional[LAMetroAPIWebEventScraper] = None,
+        streaming: bool = False,
+    ) -> None:
+        if streaming:
+            self.events = (LAMetroAPIEvent(event) for event in events)
+        else:
+            self.events = [LAMetroAPIEvent(event) for event in events]
+
+        self.streaming = streaming
         self.find_missing_partner = find_missing_partner
+        self.workers = workers
+
+        if scraper is not None:
+            self._scraper = scraper
 
     def __iter__(
         self,
@@ -125,9 +161,14 @@ class PairedEventStream:
 
     @property
     def unique_events(self) -> Generator[LAMetroAPIEvent, None, None]:
+        yield from self._unique_events(self.events)
+
+    def _unique_events(
+        self, events: Iterable[LAMetroAPIEvent]
+    ) -> Generator[LAMetroAPIEvent, None, None]:
         last_key = None
 
-        for event in sorted(self.events, key=lambda e: e.own_key):
+        for event in sorted(events, key=lambda e: e.own_key):
             if event.own_key == last_key:
                 LOGGER.warning(
                     f"Found duplicate event key '{event.own_key}'. Skipping the following event...\n{event}."
@@ -136,13 +177,40 @@ class PairedEventStream:
             yield event
             last_key = event.own_key
 
+    @property
+    def events_by_date(
+        self,
+    ) -> Generator[tuple[str, Iterable[LAMetroAPIEvent]], None, None]:
+        last_date = None
+
+        for date, events in itertools.groupby(
+            self.events, key=lambda e: e["EventDate"]
+        ):
+            if last_date and date < last_date:
+                raise ValueError(
+                    "Streaming events must be ordered by EventDate, but "
+                    f"{date} came after {last_date}"
+                )
+
+            yield date, events
+            last_date = date
+
     @property
     def paired_events(
         self,
+    ) -> Generator[tuple[LAMetroAPIEvent, Optional[LAMetroAPIEvent]], None, None]:
+        if self.streaming:
+            for _, events in self.events_by_date:
+                yield from self._paired_events(list(events))
+        else:
+            yield from self._paired_events(self.events)
+
+    def _paired_events(
+        self, events: list[LAMetroAPIEvent]
     ) -> Generator[tuple[LAMetroAPIEvent, Optional[LAMetroAPIEvent]], None, None]:
         unpaired_events: dict[tuple[str, str], LAMetroAPIEvent] = {}
 
-        for event in self.unique_events:
+        for event in self._unique_events(events):
             try:
                 partner_event: LAMetroAPIEvent = unpaired_events[event.partner_key]
             except KeyError:
@@ -154,9 +222,15 @@ class PairedEventStream:
                 )
                 yield english_event, spanish_event
 
+        found_partners: dict[tuple[str, str], LAMetroAPIEvent] = (
+            self.find_partners(list(unpaired_events.values()))
+            if self.find_missing_partner
+            else {}
+        )
+
         for event in unpaired_events.values():
-            found_partner: Optional[LAMetroAPIEvent] = (
-                self.find_partner(event) if self.find_missing_partner else None
+            found_partner: Optional[LAMetroAPIEvent] = found_partners.get(
+                event.partner_key
             )
 
             if found_partner:
@@ -179,81 +253,117 @@ class PairedEventStream:
 
     @property
     def merged_events(self) -> Generator[tuple[dict, dict], None, None]:
-        for english_event, spanish_event in self.paired_events:
-            event_details = []
-            event_audio = []
-            try:
-                event, web_event = self.scraper.event(english_event)
-            except (ValueError, TypeError, IndexError) as e:
-                LOGGER.warning(
-                    f"English event discarded by base scraper due to the following error: {e}"
-                )
-                continue
+        if self.workers > 1:
+            # Create the scraper before handing it to the worker threads
+            self.scraper
 
-            en_web_event = LAMetroWebEvent(web_event)
+            with ThreadPoolExecutor(self.workers) as pool:
+                for _, merged_event in ordered_prefetch(
+                    self.merge, self.paired_events, pool, self.workers
+                ):
+                    if merged_event:
+                        yield merged_event
 
-            if en_web_event.has_web_link:
-                event_details.append(
-                    {
-                        "url": web_event["Meeting Details"]["url"],
-                        "note": "web",
-                    }
-                )
+        else:
+            for pair in self.paired_events:
+                if merged_event := self.merge(pair):
+                    yield merged_event
+
+    def merge(
+        self, pair: tuple[LAMetroAPIEvent, Optional[LAMetroAPIEvent]]
+    ) -> Optional[tuple[dict, dict]]:
+        english_event, spanish_event = pair
+
+        event_details = []
+        event_audio = []
+        try:
+            event, web_event = self.scraper.event(english_event)
+        except (ValueError, TypeError, IndexError) as e:
+            LOGGER.warning(
+                f"English event discarded by base scraper due to the following error: {e}"
+            )
+            return None
 
-            if en_web_event.has_audio:
-                event_audio.append(web_event[en_web_event.AUDIO_KEY])
+        en_web_event = LAMetroWebEvent(web_event)
 
-            if spanish_event:
-                try:
-                    partner, partner_web_event = self.scraper.event(spanish_event)
-                except (ValueError, TypeError, IndexError):
-                    LOGGER.warning(
-                        "Spanish event discarded by base scraper. Skipping merge..."
-                    )
-                else:
-                    event["SAPEventId"] = partner["EventId"]
-                    event["SAPEventGuid"] = partner["EventGuid"]
-
-                    sap_web_event = LAMetroWebEvent(partner_web_event)
-
-                    if sap_web_event.has_web_link:
-                        event_details.append(
-                            {
-                                "url": partner_web_event["Meeting Details"]["url"],
-                                "note": "web (sap)",
-                            }
-                        )
-
-                    if sap_web_event.has_audio:
-                        partner_web_event[sap_web_event.AUDIO_KEY][
-                            "label"
-                        ] = "Audio (SAP)"
-                        event_audio.append(partner_web_event[sap_web_event.AUDIO_KEY])
-
-            event.update(
+        if en_web_event.has_web_link:
+            event_details.append(
                 {
-                    "event_details": event_details,
-                    "audio": event_audio,
+                    "url": web_event["Meeting Details"]["url"],
+                    "note": "web",
                 }
             )
 
-            yield event, web_event
+        if en_web_event.has_audio:
+            event_audio.append(web_event[en_web_event.AUDIO_KEY])
+
+        if spanish_event:
+            try:
+                partner, partner_web_event = self.scraper.event(spanish_event)
+            except (ValueError, TypeError, IndexError):
+                LOGGER.warning(
+                    "Spanish event discarded by base scraper. Skipping merge..."
+                )
+            else:
+                event["SAPEventId"] = partner["EventId"]
+                event["SAPEventGuid"] = partner["EventGuid"]
+
+                sap_web_event = LAMetroWebEvent(partner_web_event)
+
+                if sap_web_event.has_web_link:
+                    event_details.append(
+                        {
+                            "url": partner_web_event["Meeting Details"]["url"],
+                            "note": "web (sap)",
+                        }
+                    )
 
-    def find_partner(self, event: LAMetroAPIEvent) -> Optional[LAMetroAPIEvent]:
+                if sap_web_event.has_audio:
+                    partner_web_event[sap_web_event.AUDIO_KEY]["label"] = "Audio (SAP)"
+                    event_audio.append(partner_web_event[sap_web_event.AUDIO_KEY])
+
+        event.update(
+            {
+                "event_details": event_details,
+                "audio": event_audio,
+            }
+        )
+
+        return event, web_event
+
+    def find_partners(
+        self, events: list[LAMetroAPIEvent]
+    ) -> dict[tuple[str, str], LAMetroAPIEvent]:
         """
-        Attempt to find other-language partner of an
-        event. Sometimes English events won't have Spanish
-        partners, but every Spanish event should have an
-        English partner.
+        Attempt to find the other-language partners of many events at
+        once. Rather than searching for each partner, OR together the
+        partner searches of a batch of events, then match the results
+        up with the events locally.
+
+        Returns a dictionary of partners, keyed on the partner keys of
+        the given events.
         """
-        results = list(
-            self.scraper.search("/events/", "EventId", event.partner_search_string)
-        )
+        partner_keys = {event.partner_key for event in events}
+        candidates: dict[tuple[str, str], list[LAMetroAPIEvent]] = {}
+
+        for i in range(0, len(events), self.PARTNER_BATCH_SIZE):
+            batch = events[i : i + self.PARTNER_BATCH_SIZE]
+            search_string = " or ".join(
+                f"({event.partner_search_string})" for event in batch
+            )
+
+            for result in self.scraper.search("/events/", "EventId", search_string):
+                result = LAMetroAPIEvent(result)
+
+                if result.own_key in partner_keys:
+                    candidates.setdefault(result.own_key, []).append(result)
+
+        partners = {}
 
-        if results:
-            (partner,) = results
-            partner = LAMetroAPIEvent(partner)
-            assert event.is_partner(partner)
-            return partner
+        for event in events:
+            if results := candidates.get(event.partner_key):
+                (partner,) = results
+                assert event.is_partner(partner)
+                partners[event.partner_key] = partner
 
-        return None
+        return partners
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 import collections
 
@@ -6,6 +7,9 @@ from legistar.people import LegistarAPIPersonScraper, LegistarPersonScraper
 from pupa.scrape import Scraper
 from pupa.scrape import Person, Organization
 
+from .base import SharedTransportMixin, shared_transport
+from .bodies import body_registry
+
 
 ACTING_MEMBERS_WITH_END_DATE = {"Shirley Choate": date(2018, 10, 24)}
 
@@ -20,20 +24,33 @@ BOARD_OFFICE_ROLES = (
 PENDING_COMMITTEE_MEMBERS = ()
 
 
-class LametroPersonScraper(LegistarAPIPersonScraper, Scraper):
+class LametroPersonScraper(SharedTransportMixin, LegistarAPIPersonScraper, Scraper):
     BASE_URL = "http://webapi.legistar.com/v1/metro"
     WEB_URL = "https://metro.legistar.com"
     TIMEZONE = "America/Los_Angeles"
 
-    def scrape(self):
+    # Requests in flight at once while fetching office records and people.
+    # Requests are still throttled to requests_per_minute, however many
+    # threads are waiting to send them.
+    FETCH_WORKERS = 6
+
+    def body_types(self):
+        return body_registry().body_types(self)
+
+    def bodies(self):
+        yield from body_registry().bodies(self)
+
+    def web_members(self):
         """
         Scrape the web to create a dict with all active organizations.
         Then, we can access the correct URL for the organization detail page.
+        Also returns the post of each board member, keyed on their name.
         """
         web_scraper = LegistarPersonScraper(
             requests_per_minute=self.requests_per_minute
         )
-        web_scraper.MEMBERLIST = "https://metro.legistar.com/People.aspx"
+        web_scraper.MEMBERLIST = self.WEB_URL + "/People.aspx"
+        shared_transport().mount(web_scraper)
         web_info = {}
         member_posts = {}
 
@@ -46,17 +63,70 @@ class LametroPersonScraper(LegistarAPIPersonScraper, Scraper):
 
                 web_info[organization_name] = organization_info
 
+        return web_info, member_posts
+
+    def _is_scraped_body(self, body, body_types):
+        body_types_list = [
+            body_types["Committee"],
+            body_types["Independent Taxpayer Oversight Committee"],
+        ]
+
+        is_committee = body["BodyTypeId"] in body_types_list
+        is_test_body = "test" in body["BodyName"].lower()
+        is_board_workshop = body["BodyName"] == "Special Board Member Workshop"
+
+        return is_committee or is_test_body or is_board_workshop
+
+    def scrape(self):
+        """
+        Fetch everything we need up front, at the same time: the web member
+        list, the office records of the board and each committee, and the
+        API record of each person who holds an office. Then, build people
+        and organizations from what we fetched.
+        """
         body_types = self.body_types()
+        bodies = list(self.bodies())
 
         (board_of_directors,) = [
             body
-            for body in self.bodies()
+            for body in bodies
             if body["BodyName"] == "Board of Directors - Regular Board Meeting"
         ]
-        board_of_directors["BodyName"] = "Board of Directors"
+
+        committees = [
+            body for body in bodies if self._is_scraped_body(body, body_types)
+        ]
+
+        with ThreadPoolExecutor(self.FETCH_WORKERS) as pool:
+            # Walking the member pages is sequential, so start it first and
+            # fetch office records alongside it.
+            web_members = pool.submit(self.web_members)
+
+            office_bodies = [board_of_directors] + committees
+            body_offices = dict(
+                zip(
+                    [body["BodyId"] for body in office_bodies],
+                    pool.map(lambda body: list(self.body_offices(body)), office_bodies),
+                )
+            )
+
+            # The first office each person holds, to look up their sources
+            person_offices = {}
+            for offices in body_offices.values():
+                for office in offices:
+                    person_offices.setdefault(office["OfficeRecordPersonId"], office)
+
+            person_sources = dict(
+                zip(
+                    person_offices,
+                    pool.map(self.person_sources_from_office, person_offices.values()),
+                )
+            )
+
+            web_info, member_posts = web_members.result()
 
         terms = collections.defaultdict(list)
-        for office in self.body_offices(board_of_directors):
+        for office in body_offices[board_of_directors["BodyId"]]:
             terms[office["OfficeRecordFullName"]].append(office)
 
         members = {}
@@ -113,7 +183,7 @@ class LametroPersonScraper(LegistarAPIPersonScraper, Scraper):
             else:
                 assert member == " ".join([p.given_name, p.family_name])
 
-            source_urls = self.person_sources_from_office(term)
+            source_urls = person_sources[term["OfficeRecordPersonId"]]
             person_api_url, person_web_url = source_urls
 
             p.add_source(person_api_url, note="api")
@@ -121,83 +191,73 @@ class LametroPersonScraper(LegistarAPIPersonScraper, Scraper):
 
             members[member] = p
 
-        for body in self.bodies():
-            body_types_list = [
-                body_types["Committee"],
-                body_types["Independent Taxpayer Oversight Committee"],
-            ]
+        for body in committees:
+            organization_name = body["BodyName"].strip()
 
-            is_committee = body["BodyTypeId"] in body_types_list
-            is_test_body = "test" in body["BodyName"].lower()
-            is_board_workshop = body["BodyName"] == "Special Board Member Workshop"
+            o = Organization(
+                organization_name,
+                classification="committee",
+                parent_id={"name": "Board of Directors"},
+            )
 
-            if is_committee or is_test_body or is_board_workshop:
-                organization_name = body["BodyName"].strip()
+            organization_info = web_info.get(organization_name, {})
+            organization_url = organization_info.get(
+                "url", self.WEB_URL + "https://metro.legistar.com/Departments.aspx"
+            )
 
-                o = Organization(
-                    organization_name,
-                    classification="committee",
-                    parent_id={"name": "Board of Directors"},
-                )
+            o.add_source(
+                self.BASE_URL + "/bodies/{BodyId}".format(**body), note="api"
+            )
+            o.add_source(organization_url, note="web")
 
-                organization_info = web_info.get(organization_name, {})
-                organization_url = organization_info.get(
-                    "url", self.WEB_URL + "https://metro.legistar.com/Departments.aspx"
-                )
+            for office in body_offices[body["BodyId"]]:
+                role = office["OfficeRecordTitle"]
 
-                o.add_source(
-                    self.BASE_URL + "/bodies/{BodyId}".format(**body), note="api"
-                )
-                o.add_source(organization_url, note="web")
-
-                for office in self.body_offices(body):
-                    role = office["OfficeRecordTitle"]
-
-                    if role not in BOARD_OFFICE_ROLES:
-                        if role == "non-voting member":
-                            role = "Nonvoting Member"
-                        else:
-                            role = "Member"
-
-                    person = office["OfficeRecordFullName"]
-
-                    # Temporarily skip committee memberships, e.g., for
-                    # new board members. The content of this array is provided
-                    # by Metro.
-                    if person in PENDING_COMMITTEE_MEMBERS:
-                        self.warning(
-                            "Skipping {0} membership for {1}".format(
-                                organization_name, person
-                            )
+                if role not in BOARD_OFFICE_ROLES:
+                    if role == "non-voting member":
+                        role = "Nonvoting Member"
+                    else:
+                        role = "Member"
+
+                person = office["OfficeRecordFullName"]
+
+                # Temporarily skip committee memberships, e.g., for
+                # new board members. The content of this array is provided
+                # by Metro.
+                if person in PENDING_COMMITTEE_MEMBERS:
+                    self.warning(
+                        "Skipping {0} membership for {1}".format(
+                            organization_name, person
                         )
-                        continue
+                    )
+                    continue
 
-                    if person in members:
-                        p = members[person]
-                    else:
-                        p = Person(person)
+                if person in members:
+                    p = members[person]
+                else:
+                    p = Person(person)
 
-                        source_urls = self.person_sources_from_office(office)
-                        person_api_url, person_web_url = source_urls
-                        p.add_source(person_api_url, note="api")
-                        p.add_source(person_web_url, note="web")
+                    source_urls = person_sources[office["OfficeRecordPersonId"]]
+                    person_api_url, person_web_url = source_urls
+                    p.add_source(person_api_url, note="api")
+                    p.add_source(person_web_url, note="web")
 
-                        members[person] = p
+                    members[person] = p
 
-                    start_date = self.toDate(office["OfficeRecordStartDate"])
-                    end_date = self.toDate(office["OfficeRecordEndDate"])
-                    membership = p.add_membership(
-                        organization_name,
-                        role=role,
-                        start_date=start_date,
-                        end_date=end_date,
-                    )
+                start_date = self.toDate(office["OfficeRecordStartDate"])
+                end_date = self.toDate(office["OfficeRecordEndDate"])
+                membership = p.add_membership(
+                    organization_name,
+                    role=role,
+                    start_date=start_date,
+                    end_date=end_date,
+                )
 
-                    acting_member_end_date = ACTING_MEMBERS_WITH_END_DATE.get(p.name)
-                    if acting_member_end_date and acting_member_end_date <= end_date:
-                        membership.extras = {"acting": "true"}
+                acting_member_end_date = ACTING_MEMBERS_WITH_END_DATE.get(p.name)
+                if acting_member_end_date and acting_member_end_date <= end_date:
+                    membership.extras = {"acting": "true"}
 
-                yield o
+            yield o
 
         for p in members.values():
             yield p
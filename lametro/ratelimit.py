@@ -0,0 +1,280 @@
+"""
+Adaptive limits on the requests in flight to each host, in place of a
+fixed requests_per_minute.
+
+Each host, e.g., webapi.legistar.com, metro.legistar.com, or a host that
+serves attachments or audio, gets its own limit. Limits grow while the
+host responds quickly and successfully, and shrink when it responds with
+429 Too Many Requests or a 5xx, fails to respond, or slows down. This is
+additive increase, multiplicative decrease, as in TCP congestion control.
+
+Limits on requests in flight are per process. To keep scrapes running at
+once in different processes under one ceiling, they can also share a
+token bucket.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .instrumentation import InstrumentedAdapter
+
+LOGGER = logging.getLogger(__name__)
+
+
+class HostLimit:
+    """
+    The number of requests that may be in flight to one host at once.
+
+    - Each success raises the limit by 1/limit, so it grows by about one
+      per limit's worth of successes.
+    - Errors halve it.
+    - Responses slower than latency_tolerance times the host's usual
+      latency cut it by a fifth.
+    - Retry-After pauses the host.
+
+    The limit is cut at most once per round trip, since requests already
+    in flight were sent under the old limit.
+    """
+
+    # Weight of each response in the moving average of latency
+    LATENCY_WEIGHT = 0.2
+
+    def __init__(self, host="", initial=2, minimum=1, maximum=16, latency_tolerance=2):
+        self.host = host
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.latency = None
+        self.baseline = None
+        self.paused_until = 0
+
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    break
+
+            self.in_flight += 1
+
+    def release(self, seconds, status=None, retry_after=None):
+        """
+        Record the outcome of a request. Pass a status of None if the
+        request failed without a response, e.g., it timed out.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            overloaded = status is None or status == 429 or status >= 500
+
+            if overloaded:
+                if self._decrease(now, 0.5):
+                    LOGGER.info(
+                        f"{self.host} responded {status or 'with an error'}, "
+                        f"limiting to {int(self.limit)} requests in flight"
+                    )
+
+            else:
+                self._observe(seconds)
+
+                if self.latency > self.baseline * self.latency_tolerance:
+                    self._decrease(now, 0.8)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+            self._condition.notify_all()
+
+    def _observe(self, seconds):
+        if self.latency is None:
+            self.latency = self.baseline = seconds
+            return
+
+        self.latency += self.LATENCY_WEIGHT * (seconds - self.latency)
+
+        # Let the baseline creep up, so a host that gets slower for good
+        # isn't held to its old latency forever.
+        self.baseline = min(self.latency, self.baseline * 1.01)
+
+    def _decrease(self, now, factor):
+        if now - self._last_decrease > (self.latency or 0):
+            self.limit = max(self.minimum, self.limit * factor)
+            self._last_decrease = now
+            return True
+
+        return False
+
+
+def host(url):
+    return urlsplit(url).netloc.lower()
+
+
+class HostLimits:
+    """
+    A HostLimit for each host, created as they're first requested.
+    """
+
+    def __init__(self, **limit_kwargs):
+        self.limit_kwargs = limit_kwargs
+        self.hosts = {}
+
+        self._lock = threading.Lock()
+
+    def __getitem__(self, url):
+        name = host(url)
+
+        with self._lock:
+            if name not in self.hosts:
+                self.hosts[name] = HostLimit(name, **self.limit_kwargs)
+
+            return self.hosts[name]
+
+    def summary(self):
+        with self._lock:
+            return {host: round(limit.limit, 1) for host, limit in self.hosts.items()}
+
+
+class SharedTokenBucket:
+    """
+    Token bucket in a SQLite database, allowing rate requests per second
+    to each host, in bursts of up to burst requests. Every process that
+    opens the same database shares the budget, e.g., bill and event scrapes
+    running at once with the same state volume, so their combined traffic
+    stays under the ceiling. Safe to share between threads.
+
+    Each request takes a token as soon as it asks for one, running the
+    bucket into debt if need be, then sleeps until the token would have
+    been available. Requests from every process are served in the order
+    they asked.
+    """
+
+    def __init__(self, path, rate, burst=None):
+        self.path = path
+        self.rate = rate
+        self.burst = burst or rate
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(host TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+        )
+
+    def acquire(self, url):
+        wait = self._take(host(url))
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def _take(self, name):
+        """
+        Take a token for the host, and return how long to wait before
+        using it.
+        """
+        with self._lock:
+            # Lock the database for writing before reading the bucket, so
+            # no other process can take the same tokens.
+            self._connection.execute("BEGIN IMMEDIATE")
+
+            try:
+                row = self._connection.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE host = ?", (name,)
+                ).fetchone()
+
+                # Wall clock time, since it's shared between processes
+                now = time.time()
+                tokens, updated_at = row or (self.burst, now)
+
+                tokens = min(self.burst, tokens + max(now - updated_at, 0) * self.rate)
+                tokens -= 1
+
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO buckets (host, tokens, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (name, tokens, now),
+                )
+                self._connection.execute("COMMIT")
+
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        return -tokens / self.rate
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        # Missing, or an HTTP date, which Legistar doesn't send
+        return None
+
+
+class RateLimitedAdapter(InstrumentedAdapter):
+    """
+    InstrumentedAdapter that, before sending each request, waits for room
+    under the host's adaptive limit, if given limits, and for a token from
+    the shared bucket, if given one. Adjusts the host's limit by how the
+    request went.
+    """
+
+    def __init__(self, limits=None, bucket=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limits = limits
+        self.bucket = bucket
+
+    def send(self, request, **kwargs):
+        if self.limits is None:
+            if self.bucket:
+                self.bucket.acquire(request.url)
+
+            return super().send(request, **kwargs)
+
+        limit = self.limits[request.url]
+        limit.acquire()
+
+        start = time.perf_counter()
+
+        try:
+            # Take a token once there's room to send, so tokens aren't
+            # spent on requests that are still waiting.
+            if self.bucket:
+                self.bucket.acquire(request.url)
+
+            # Don't count waiting for a token as the host's latency
+            start = time.perf_counter()
+
+            response = super().send(request, **kwargs)
+
+        except Exception:
+            limit.release(time.perf_counter() - start)
+            raise
+
+        limit.release(
+            time.perf_counter() - start, response.status_code, retry_after(response)
+        )
+
+        return response
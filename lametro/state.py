@@ -0,0 +1,266 @@
+import datetime
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from dateutil import parser
+from django.db.models.signals import post_save
+from pupa import settings
+
+
+def state_path(*parts):
+    """
+    Path to persistent scraper state, i.e., caches and bookkeeping that
+    should outlive a single run. Defaults to a directory next to the
+    scraped data, so it lives on the same volume.
+    """
+    state_dir = getattr(
+        settings,
+        "LAMETRO_STATE_DIR",
+        os.path.join(
+            os.path.dirname(os.path.abspath(settings.SCRAPED_DATA_DIR)), "_lametro"
+        ),
+    )
+
+    path = os.path.join(state_dir, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    return path
+
+
+def write_json(path, data):
+    """
+    Write JSON to a file atomically, so a run that dies mid-write doesn't
+    leave a corrupt file behind for the next one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+
+    os.replace(tmp_path, path)
+
+
+class Watermark:
+    """
+    The latest change timestamp seen for a kind of record, e.g., the
+    largest MatterLastModifiedUtc, persisted between runs. Windowed scrapes
+    can query for changes since the watermark, rather than a fixed window.
+
+    Timestamps are observed as records are scraped, but the watermark is
+    only advanced when save is called. Scrapes stage the watermark they
+    reached, and it's saved once their output has been imported, so a
+    scrape that fails partway, or whose import fails, starts from the old
+    watermark next time.
+
+    Query for changes since since(), rather than the watermark itself, so
+    records modified in the same instant as the latest one we saw, or
+    committed to Legistar a little out of order, aren't missed.
+    """
+
+    # How far before the watermark to query for changes
+    OVERLAP = datetime.timedelta(minutes=5)
+
+    def __init__(self, name):
+        self.name = name
+        self.path = state_path("watermarks", f"{name}.json")
+        self.latest = None
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                value = json.load(f)["latest"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return parser.isoparse(value)
+
+    def since(self):
+        """
+        When to query for changes from, or None if there's no watermark yet.
+        """
+        latest = self.load()
+
+        return latest - self.OVERLAP if latest else None
+
+    def observe(self, timestamp):
+        # Legistar timestamps are naive UTC, with a varying number of
+        # fractional digits, so parse them before comparing.
+        if not timestamp:
+            return
+
+        timestamp = parser.isoparse(timestamp)
+
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+
+    def track(self, records, field):
+        """
+        Observe the given field of each record, as it's yielded.
+        """
+        for record in records:
+            self.observe(record.get(field))
+            yield record
+
+    def save(self):
+        if self.latest is None:
+            return
+
+        previous = self.load()
+        if previous and previous >= self.latest:
+            return
+
+        write_json(self.path, {"latest": self.latest.isoformat()})
+
+    def stage(self, pending):
+        """
+        Save the watermark once the scrape's output has been imported.
+        """
+        if self.latest is not None:
+            pending.watermarks[self.name] = self.latest.isoformat()
+
+
+class PendingState:
+    """
+    State to record once a scrape's output has been imported, e.g., the
+    watermark it reached and the fingerprints of the matters it emitted.
+    Recording it when the scrape finishes is too soon: if the import then
+    failed, the next scrape would skip changes that never reached the
+    database.
+
+    Scrapes stage pending state as a file next to their output, in the
+    data directory, and commit_pending_state records it once that
+    directory has been imported. pupa clears the data directory before
+    each scrape, so state staged by a scrape that was never imported is
+    dropped with its output.
+    """
+
+    # pupa only imports files named after the types of objects it imports
+    PREFIX = "pending-state_"
+
+    def __init__(self, datadir, name):
+        self.path = os.path.join(
+            datadir, f"{self.PREFIX}{name}_{uuid.uuid4().hex}.json"
+        )
+        self.watermarks = {}
+        self.stores = {}
+
+    def save(self):
+        write_json(self.path, {"watermarks": self.watermarks, "stores": self.stores})
+
+
+def commit_pending_state(datadir):
+    """
+    Record the state staged by the scrapes whose output is in datadir.
+    """
+    # lametro.cache imports this module
+    from .cache import KeyValueStore
+
+    pattern = os.path.join(datadir, f"{PendingState.PREFIX}*.json")
+
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            pending = json.load(f)
+
+        for name, items in pending["stores"].items():
+            store = KeyValueStore(name)
+            store.set_many(items)
+            store.close()
+
+        for name, latest in pending["watermarks"].items():
+            watermark = Watermark(name)
+            watermark.observe(latest)
+            watermark.save()
+
+        os.remove(path)
+
+
+def commit_after_import(sender, instance, created, **kwargs):
+    """
+    pupa saves a RunPlan to report each run that imports, once the import
+    has finished. Commit the state staged by the scrapes it imported, if
+    it succeeded. Covers both pupa update, and pupa update --import of the
+    output of earlier scrapes.
+    """
+    if created and instance.success:
+        commit_pending_state(os.path.join(settings.SCRAPED_DATA_DIR, __package__))
+
+
+post_save.connect(commit_after_import, sender="pupa.RunPlan")
+
+
+class Checkpoint:
+    """
+    Progress through a long scrape, e.g., a full bill scrape, so a scrape
+    that fails partway can resume rather than start over. Records the IDs
+    of the records the scrape has finished with, the last one finished,
+    and the IDs it had started on, but not finished, when it stopped.
+
+    The scrape saves the checkpoint as it goes, and clears it once it
+    finishes. Checkpoints of scrapes that started more than max_age
+    seconds ago are ignored, so a resumed scrape doesn't skip records
+    that were scraped too long ago.
+    """
+
+    def __init__(self, name, max_age=None):
+        self.name = name
+        self.path = state_path("checkpoints", f"{name}.json")
+        self.max_age = max_age
+
+        self.started_at = time.time()
+        self.done = set()
+        self.pending = set()
+        self.last = None
+
+    def load(self):
+        """
+        Pick up where the last scrape left off, if it saved a checkpoint.
+        Returns whether there was one.
+        """
+        try:
+            with open(self.path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if self.max_age and time.time() - checkpoint["started_at"] > self.max_age:
+            return False
+
+        self.started_at = checkpoint["started_at"]
+        self.done = set(checkpoint["done"])
+        self.last = checkpoint["last"]
+
+        return True
+
+    def track(self, records, field):
+        """
+        Mark each record pending, by the given ID field, as it's yielded.
+        """
+        for record in records:
+            self.pending.add(record[field])
+            yield record
+
+    def finish(self, record_id):
+        self.pending.discard(record_id)
+        self.done.add(record_id)
+        self.last = record_id
+
+    def save(self):
+        write_json(
+            self.path,
+            {
+                "started_at": self.started_at,
+                "last": self.last,
+                "done": sorted(self.done),
+                "pending": sorted(self.pending),
+            },
+        )
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
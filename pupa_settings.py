@@ -17,6 +17,26 @@ if SENTRY_DSN := os.getenv("SENTRY_DSN", "https://78df3855dad0415e99c3c327ea9f81
 
 CACHE_DIR = "/tmp/cache/_cache"
 SCRAPED_DATA_DIR = "/tmp/cache/_data"
+
+# Persistent scraper state, e.g., the row version response cache
+LAMETRO_STATE_DIR = "/tmp/cache/_lametro"
+LAMETRO_RESPONSE_CACHE_MAX_BYTES = int(
+    os.getenv("LAMETRO_RESPONSE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+
+# Request counts and latency by endpoint, written when a scrape exits
+LAMETRO_REQUEST_STATS_FILE = "/tmp/cache/request_stats.json"
+
+# Set LAMETRO_ADAPTIVE_RATE_LIMIT=true to limit requests in flight to each
+# host by how it responds, in place of the fixed --rpm.
+LAMETRO_ADAPTIVE_RATE_LIMIT = os.getenv(
+    "LAMETRO_ADAPTIVE_RATE_LIMIT", "false"
+).lower() not in {"false", "no", "0", ""}
+
+# Requests per second to each host, shared by every scrape that uses the
+# same state directory, e.g., bill and event scrapes running at once on
+# the scrapers-cache volume. Set it to 0 for no shared ceiling.
+LAMETRO_SHARED_RATE_LIMIT = float(os.getenv("LAMETRO_SHARED_RATE_LIMIT", 10)) or None
 STATIC_ROOT = "/tmp"
 
 DATABASE_URL = os.environ.get(
@@ -0,0 +1,195 @@
+"""
+Run a scraper against a recorded corpus and measure it.
+
+To record a corpus, run a scrape against the stand-in for Legistar in
+tests/fake_legistar, as the corpora in tests/benchmarks/corpus were. Those
+corpora, and the baselines measured from them, are synthetic:
+
+    python -m tests.benchmarks.harness record --fake bills matter_ids=5001,5002,5003
+    python -m tests.benchmarks.harness record --fake events event_ids=2003,2004
+    python -m tests.benchmarks.harness record --fake people
+
+Or leave out --fake to record against the live API, e.g., in the scrapers
+container with a LEGISTAR_API_TOKEN. Use fixed matter or event IDs,
+rather than a window, so replays make the same requests as the recording.
+Then, to replay it and print metrics:
+
+    python -m tests.benchmarks.harness replay bills
+"""
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from pupa import settings
+
+from lametro import (
+    Lametro,
+    LametroBillScraper,
+    LametroEventScraper,
+    LametroPersonScraper,
+)
+from lametro import base, bodies, cache
+
+from ..fake_legistar.server import FakeLegistar, patch_scrapers
+from .replay import RecordingAdapter, ReplayAdapter
+
+SCRAPERS = {
+    "bills": LametroBillScraper,
+    "events": LametroEventScraper,
+    "people": LametroPersonScraper,
+}
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def corpus_path(scraper_name):
+    return os.path.join(CORPUS_DIR, scraper_name)
+
+
+@contextlib.contextmanager
+def isolated_transport(adapter):
+    """
+    Send every request over the given adapter, with empty caches, so each
+    run makes every request it needs.
+    """
+    transport = base.SharedTransport(adapter)
+
+    # Don't throttle requests, including those of the web scrapers the
+    # legistar scrapers create, which don't share the scraper's
+    # requests_per_minute.
+    transport.throttle = lambda session: None
+
+    with tempfile.TemporaryDirectory() as state_dir, mock.patch.object(
+        settings, "LAMETRO_STATE_DIR", state_dir, create=True
+    ), mock.patch.object(base, "_shared_transport", transport), mock.patch.object(
+        cache, "_response_cache", None
+    ), mock.patch.object(
+        bodies, "_body_registry", None
+    ):
+        yield
+
+
+def run(scraper_name, kwargs):
+    """
+    Run a scrape to completion, without saving what it scrapes, and
+    measure it. Peak RSS is the peak of the whole process, so run one
+    scrape per process for a true figure.
+    """
+    with tempfile.TemporaryDirectory() as datadir:
+        scraper = SCRAPERS[scraper_name](Lametro(), datadir)
+        scraper.requests_per_minute = 0
+
+        cpu_start = time.process_time()
+        children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        wall_start = time.perf_counter()
+
+        n_objects = sum(1 for _ in scraper.scrape(**kwargs))
+
+        wall_seconds = time.perf_counter() - wall_start
+        children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_seconds = time.process_time() - cpu_start
+
+    # Include the CPU time of worker processes, e.g., for OCR
+    cpu_seconds += (children_end.ru_utime - children_start.ru_utime) + (
+        children_end.ru_stime - children_start.ru_stime
+    )
+
+    return {
+        "objects": n_objects,
+        "wall_seconds": wall_seconds,
+        "cpu_seconds": cpu_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def record(scraper_name, kwargs, fake=False):
+    """
+    Record a scrape against the live API, or, if fake is True, against a
+    FakeLegistar.
+    """
+    corpus_dir = corpus_path(scraper_name)
+
+    if os.path.exists(corpus_dir):
+        raise FileExistsError(f"Remove {corpus_dir} before recording it again")
+
+    adapter = RecordingAdapter(corpus_dir, pool_maxsize=base.SharedTransport.POOL_SIZE)
+    manifest = {"kwargs": kwargs}
+
+    with contextlib.ExitStack() as stack:
+        if fake:
+            legistar = stack.enter_context(FakeLegistar(years=1))
+            stack.enter_context(patch_scrapers(legistar))
+
+            # Replays send requests to the same URLs, without a server
+            manifest["fake_legistar"] = {
+                "api_url": legistar.api_url,
+                "web_url": legistar.web_url,
+            }
+
+        stack.enter_context(isolated_transport(adapter))
+        metrics = run(scraper_name, kwargs)
+
+    adapter.close()
+
+    with open(os.path.join(corpus_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+    return metrics
+
+
+def replay(scraper_name):
+    """
+    Replay a recorded scrape, returning its metrics and the adapter that
+    served it, or None if the corpus hasn't been recorded.
+    """
+    corpus_dir = corpus_path(scraper_name)
+
+    if not os.path.exists(os.path.join(corpus_dir, "manifest.json")):
+        return None, None
+
+    with open(os.path.join(corpus_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    adapter = ReplayAdapter(corpus_dir)
+
+    with contextlib.ExitStack() as stack:
+        if "fake_legistar" in manifest:
+            legistar = SimpleNamespace(**manifest["fake_legistar"])
+            stack.enter_context(patch_scrapers(legistar))
+
+        stack.enter_context(isolated_transport(adapter))
+        metrics = run(scraper_name, manifest["kwargs"])
+
+    metrics["requests"] = adapter.requests
+    metrics["unrecorded_requests"] = len(adapter.misses)
+    metrics["objects_per_second"] = metrics["objects"] / metrics["wall_seconds"]
+    metrics["requests_per_object"] = adapter.requests / max(metrics["objects"], 1)
+    metrics["cpu_seconds_per_object"] = metrics["cpu_seconds"] / max(
+        metrics["objects"], 1
+    )
+
+    return metrics, adapter
+
+
+if __name__ == "__main__":
+    command, *args = sys.argv[1:]
+
+    fake = "--fake" in args
+    scraper_name, *args = [arg for arg in args if arg != "--fake"]
+
+    if command == "record":
+        kwargs = dict(arg.split("=", 1) for arg in args)
+        metrics = record(scraper_name, kwargs, fake=fake)
+    else:
+        metrics, _ = replay(scraper_name)
+
+    print(json.dumps(metrics, indent=2))
@@ -0,0 +1,141 @@
+"""
+Record the responses a scrape gets, and replay them later without a
+network connection.
+
+A corpus is a directory with a manifest.json, holding the arguments the
+scrape was recorded with, and a responses.jsonl, holding one response per
+line. Responses are keyed on the request's method, URL, Range header and
+body, so the same scrape makes the same requests on replay.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+def strip_token(url):
+    """
+    Drop the Legistar API token from a URL, so it isn't written to the
+    corpus, and replays match whatever token they run with.
+    """
+    parts = urlsplit(url)
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() != "token"
+    ]
+
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def request_key(request):
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    key = json.dumps(
+        [
+            request.method,
+            strip_token(request.url),
+            request.headers.get("Range"),
+            hashlib.sha256(body).hexdigest(),
+        ]
+    )
+
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Send requests as usual, and write each response to the corpus.
+    """
+
+    def __init__(self, corpus_dir, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        os.makedirs(corpus_dir, exist_ok=True)
+        self._file = open(os.path.join(corpus_dir, "responses.jsonl"), "a")
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+
+        record = {
+            "key": request_key(request),
+            "url": strip_token(request.url),
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+        return response
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answer requests from a recorded corpus. Requests that weren't recorded
+    get an empty 404, and are counted as misses.
+    """
+
+    def __init__(self, corpus_dir):
+        super().__init__()
+
+        self.responses = {}
+        with open(os.path.join(corpus_dir, "responses.jsonl")) as f:
+            for line in f:
+                record = json.loads(line)
+                self.responses[record["key"]] = record
+
+        self.requests = 0
+        self.misses = []
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        record = self.responses.get(request_key(request))
+
+        with self._lock:
+            self.requests += 1
+            if record is None:
+                self.misses.append(request.url)
+
+        response = Response()
+        response.request = request
+        response.url = request.url
+        response.connection = self
+
+        if record is None:
+            response.status_code = 404
+            response.reason = "Not Recorded"
+            response.headers = CaseInsensitiveDict()
+            response._content = b""
+        else:
+            response.status_code = record["status_code"]
+            response.reason = record["reason"]
+            response.headers = CaseInsensitiveDict(record["headers"])
+            response._content = base64.b64decode(record["body"])
+
+        # The body is already in memory, so streaming reads from it
+        response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,72 @@
+'''
+Replay recorded scrapes, and compare their request fan-out and CPU cost
+against saved baselines. Skipped for scrapers without a recorded corpus.
+See harness.py for how to record one. The committed corpora and baselines
+are synthetic, recorded against tests/fake_legistar, not Metro's Legistar.
+
+To save the current figures as the new baselines, run:
+
+    LAMETRO_UPDATE_BASELINES=1 pytest tests/benchmarks
+
+To compare only some figures, e.g., on CI, where CPU time isn't
+comparable to the machine that recorded the baselines, name them:
+
+    LAMETRO_BENCHMARK_METRICS=requests_per_object pytest tests/benchmarks
+'''
+import json
+import os
+
+import pytest
+
+from .harness import replay
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# How much worse than the baseline a figure can get before we fail. CPU
+# time is noisier than request counts, so allow it more slack.
+TOLERANCE = {
+    'requests_per_object': 1.05,
+    'cpu_seconds_per_object': 1.5,
+}
+
+# Replays per benchmark. CPU time is the least of them, since noise only
+# ever adds to it.
+REPEAT = 5
+
+
+@pytest.mark.parametrize('scraper_name', ['bills', 'events', 'people'])
+def test_benchmark(scraper_name):
+    metrics, adapter = replay(scraper_name)
+
+    if metrics is None:
+        pytest.skip(f'No corpus recorded for {scraper_name}')
+
+    for _ in range(REPEAT - 1):
+        metrics['cpu_seconds_per_object'] = min(
+            metrics['cpu_seconds_per_object'],
+            replay(scraper_name)[0]['cpu_seconds_per_object'],
+        )
+
+    print(f'\n{scraper_name}: {json.dumps(metrics, indent=2)}')
+
+    assert not adapter.misses, f'Requests missing from the corpus: {adapter.misses[:10]}'
+
+    with open(BASELINES) as f:
+        baselines = json.load(f)
+
+    if os.getenv('LAMETRO_UPDATE_BASELINES'):
+        baselines[scraper_name] = {metric: metrics[metric] for metric in TOLERANCE}
+
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    elif scraper_name in baselines:
+        compared = os.getenv('LAMETRO_BENCHMARK_METRICS', ','.join(TOLERANCE)).split(',')
+
+        for metric in compared:
+            tolerance = TOLERANCE[metric]
+            baseline = baselines[scraper_name][metric]
+            assert metrics[metric] <= baseline * tolerance, (
+                f'{metric} regressed from {baseline:.3f} to {metrics[metric]:.3f}'
+            )
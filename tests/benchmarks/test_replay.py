@@ -0,0 +1,41 @@
+import requests
+
+from .replay import RecordingAdapter, ReplayAdapter
+
+
+def test_record_and_replay(tmp_path, mocker):
+    '''
+    Test that recorded responses replay without the API token, and that
+    requests that weren't recorded are counted as misses.
+    '''
+    def send(request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'application/json'
+        response._content = b'[{"MatterId": 4450}]'
+        return response
+
+    mocker.patch('requests.adapters.HTTPAdapter.send', side_effect=send)
+
+    url = 'https://webapi.legistar.com/v1/metro/matters/'
+
+    session = requests.Session()
+    session.mount('https://', RecordingAdapter(str(tmp_path)))
+    session.get(url, params={'token': 'recording-token'})
+
+    assert 'recording-token' not in (tmp_path / 'responses.jsonl').read_text()
+
+    mocker.stopall()
+
+    adapter = ReplayAdapter(str(tmp_path))
+    session = requests.Session()
+    session.mount('https://', adapter)
+
+    response = session.get(url, params={'token': 'replay-token'})
+    assert response.json() == [{'MatterId': 4450}]
+
+    response = session.get(url + '4450/histories')
+    assert response.status_code == 404
+    assert adapter.requests == 2
+    assert adapter.misses == [url + '4450/histories']
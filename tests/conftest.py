@@ -1,17 +1,46 @@
 import pytest
 import datetime
 
-from lametro import LametroBillScraper, LametroEventScraper
+from lametro import LametroBillScraper, LametroEventScraper, LametroPersonScraper
 
 
+@pytest.fixture(scope='session', autouse=True)
+def state_dir(tmp_path_factory):
+    '''
+    Keep persistent scraper state, e.g., caches, out of the real state
+    directory, so tests neither read nor leave behind state.
+    '''
+    from pupa import settings
+
+    settings.LAMETRO_STATE_DIR = str(tmp_path_factory.mktemp('lametro'))
+    return settings.LAMETRO_STATE_DIR
+
+@pytest.fixture(scope='session', autouse=True)
+def unthrottled_transport(state_dir):
+    '''
+    Don't space out requests sent over the shared transport. Tests mock
+    them, or send them to a local server.
+    '''
+    from lametro import base
+
+    base.shared_transport().throttle = lambda session: None
+
+@pytest.fixture(scope='module')
+def bill_scraper(tmp_path_factory):
+    datadir = str(tmp_path_factory.mktemp('data'))
+    scraper = LametroBillScraper(datadir=datadir, jurisdiction='ocd-division/test')
+    return scraper
+
 @pytest.fixture(scope='module')
-def bill_scraper():
-    scraper = LametroBillScraper(datadir='', jurisdiction='ocd-division/test')
+def event_scraper(tmp_path_factory):
+    datadir = str(tmp_path_factory.mktemp('data'))
+    scraper = LametroEventScraper(datadir=datadir, jurisdiction='ocd-division/test')
     return scraper
 
 @pytest.fixture(scope='module')
-def event_scraper():
-    scraper = LametroEventScraper(datadir='', jurisdiction='ocd-division/test')
+def person_scraper(tmp_path_factory):
+    datadir = str(tmp_path_factory.mktemp('data'))
+    scraper = LametroPersonScraper(datadir=datadir, jurisdiction='ocd-division/test')
     return scraper
 
 @pytest.fixture
@@ -0,0 +1,822 @@
+"""
+Deterministic, synthetic Legistar data, shaped like Metro's: bodies,
+board and committee members, English meetings and their Spanish (SAP)
+partners, agendas, and the matters on them, with histories, votes,
+sponsors, attachments, topics, relations and texts.
+
+The same seed and scale always produce the same data. Scale multiplies
+the number of meetings each body holds a month, and so the number of
+matters.
+"""
+
+import base64
+import datetime
+import random
+import uuid
+
+BOARD = "Board of Directors - Regular Board Meeting"
+
+# (BodyTypeId, BodyTypeName)
+BODY_TYPES = [
+    (41, "Primary Legislative Body"),
+    (42, "Committee"),
+    (43, "Independent Taxpayer Oversight Committee"),
+    (44, "Spanish Language Meeting"),
+    (70, "Service Council"),
+    (75, "Service Council (SAP)"),
+]
+
+# (BodyName, BodyTypeId, meets every n months)
+BODIES = [
+    (BOARD, 41, 1),
+    ("Board of Directors - Special Board Meeting", 41, 6),
+    ("Finance, Budget and Audit Committee", 42, 1),
+    ("Planning and Programming Committee", 42, 1),
+    ("Executive Management Committee", 42, 1),
+    ("Operations, Safety, and Customer Experience Committee", 42, 1),
+    ("Construction Committee", 42, 1),
+    ("Independent Taxpayer Oversight Committee", 43, 3),
+    ("LA SAFE", 42, 3),
+    ("San Fernando Valley Service Council", 70, 1),
+    ("Westside Central Service Council", 70, 1),
+    ("Gateway Cities Service Council", 75, 1),
+]
+
+BOARD_POSTS = [
+    "Mayor of the City of Los Angeles",
+    "Appointee of the Mayor of the City of Los Angeles",
+    "Appointee of the Mayor of the City of Los Angeles",
+    "Appointee of the Mayor of the City of Los Angeles",
+    "Los Angeles County Board Supervisor, District 1",
+    "Los Angeles County Board Supervisor, District 2",
+    "Los Angeles County Board Supervisor, District 3",
+    "Los Angeles County Board Supervisor, District 4",
+    "Los Angeles County Board Supervisor, District 5",
+    "Appointee of the Los Angeles County City Selection Committee, North County/San Fernando Valley sector",
+    "Appointee of Los Angeles County City Selection Committee, Southwest Corridor sector",
+    "Appointee of Los Angeles County City Selection Committee, San Gabriel Valley sector",
+    "Appointee of Los Angeles County City Selection Committee, South East Long Beach sector",
+]
+
+FIRST_NAMES = [
+    "Ana", "Ben", "Carla", "David", "Elena", "Felix", "Grace", "Hector",
+    "Irene", "James", "Karen", "Luis", "Maria", "Nathan", "Olivia", "Pablo",
+    "Quinn", "Rosa", "Samuel", "Teresa",
+]
+
+LAST_NAMES = [
+    "Alvarez", "Brooks", "Castillo", "Dunn", "Estrada", "Fischer", "Garcia",
+    "Huang", "Ibarra", "Jensen", "Kim", "Lopez", "Morales", "Nguyen",
+    "Ortiz", "Park", "Quintero", "Reyes", "Sato", "Torres",
+]
+
+MATTER_TYPES = [
+    "Contract",
+    "Informational Report",
+    "Motion / Motion Response",
+    "Policy",
+    "Resolution",
+    "Project",
+    "Oral Report / Presentation",
+]
+
+TOPICS = [
+    "Budget", "Bus Rapid Transit", "Construction", "Fare", "Measure M",
+    "Metro Rail", "Procurement", "Safety", "Sustainability", "Union Station",
+]
+
+SUBJECTS = [
+    "the Expo Line", "Union Station", "the G Line", "bus stop amenities",
+    "the Fiscal Year budget", "rail car procurement", "station security",
+    "the Crenshaw/LAX Transit Project", "fare capping", "bike share",
+]
+
+# Actions taken by committees and by the board, with whether they pass
+COMMITTEE_ACTIONS = [
+    ("RECOMMENDED FOR APPROVAL", True),
+    ("RECOMMENDED FOR APPROVAL AS AMENDED", True),
+    ("FORWARDED WITHOUT RECOMMENDATION", None),
+    ("RECEIVED AND FILED", None),
+]
+
+BOARD_ACTIONS = [
+    ("APPROVED", True),
+    ("APPROVED ON CONSENT CALENDAR", True),
+    ("ADOPTED", True),
+    ("RECEIVED AND FILED", None),
+    ("CARRIED OVER", None),
+]
+
+# Earliest date with a legislative session
+FIRST_SESSION_START = datetime.date(2014, 7, 1)
+
+
+def row_version(n):
+    return base64.b64encode(n.to_bytes(8, "big")).decode("ascii")
+
+
+def timestamp(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    return value.strftime("%Y-%m-%dT00:00:00")
+
+
+class Dataset:
+    """
+    A synthetic Legistar client. web_url is the root of the fake web
+    interface, where links in the data point.
+    """
+
+    def __init__(self, web_url, scale=1, seed=0, years=2, today=None):
+        self.web_url = web_url
+        self.scale = scale
+        self.today = today or datetime.date.today()
+        self.now = datetime.datetime.combine(self.today, datetime.time(12))
+
+        self._random = random.Random(seed)
+        self._ids = {}
+
+        self.body_types = [
+            {"BodyTypeId": id, "BodyTypeName": name} for id, name in BODY_TYPES
+        ]
+        self.bodies = []
+        self.persons = {}
+        self.office_records = {}
+        self.events = []
+        self.event_items = {}
+        self.matters = []
+        self.histories = {}
+        self.votes = {}
+        self.sponsors = {}
+        self.attachments = {}
+        self.indexes = {}
+        self.relations = {}
+        self.versions = {}
+        self.texts = {}
+
+        # Text of the first page of each PDF, keyed on path
+        self.documents = {}
+
+        # Web-only fields of each event's detail page, keyed on EventId
+        self.web_events = {}
+
+        start = max(
+            self.today - datetime.timedelta(days=365 * years), FIRST_SESSION_START
+        )
+        end = self.today + datetime.timedelta(days=30)
+
+        self._make_bodies()
+        self._make_people(start)
+        self._make_meetings(start, end)
+
+        self.events.sort(key=lambda event: event["EventId"])
+        self.matters.sort(key=lambda matter: matter["MatterId"])
+
+        self.events_by_id = {event["EventId"]: event for event in self.events}
+        self.matters_by_id = {matter["MatterId"]: matter for matter in self.matters}
+        self.bodies_by_id = {body["BodyId"]: body for body in self.bodies}
+
+    def next_id(self, kind, start=1000):
+        self._ids[kind] = self._ids.get(kind, start) + 1
+        return self._ids[kind]
+
+    def guid(self):
+        return str(uuid.UUID(int=self._random.getrandbits(128), version=4)).upper()
+
+    def _modified(self, date):
+        """
+        A last modified time a few days after the given date, but not in
+        the future.
+        """
+        modified = datetime.datetime.combine(date, datetime.time(9)) + datetime.timedelta(
+            days=self._random.randint(0, 5), minutes=self._random.randint(0, 600)
+        )
+        return min(modified, self.now - datetime.timedelta(minutes=self._random.randint(1, 600)))
+
+    def _make_bodies(self):
+        self.sap_bodies = {}
+
+        for name, body_type_id, _ in BODIES:
+            self.bodies.append(self._body(name, body_type_id))
+
+            if body_type_id not in {70, 75}:
+                self.sap_bodies[name] = self._body(f"{name} (SAP)", 44)
+                self.bodies.append(self.sap_bodies[name])
+
+        self.body_ids = {body["BodyName"]: body["BodyId"] for body in self.bodies}
+
+    def _body(self, name, body_type_id):
+        body_id = self.next_id("body", 100)
+        body_type_name = dict(BODY_TYPES)[body_type_id]
+
+        return {
+            "BodyId": body_id,
+            "BodyGuid": self.guid(),
+            "BodyLastModifiedUtc": timestamp(self.now - datetime.timedelta(days=400)),
+            "BodyRowVersion": row_version(body_id),
+            "BodyName": name,
+            "BodyTypeId": body_type_id,
+            "BodyTypeName": body_type_name,
+            "BodyMeetFlag": 1,
+            "BodyActiveFlag": 1,
+            "BodySort": 0,
+            "BodyDescription": None,
+            "BodyContactNameId": None,
+            "BodyContactFullName": None,
+            "BodyContactPhone": None,
+            "BodyContactEmail": None,
+            "BodyUsedControlFlag": 0,
+            "BodyNumberOfMembers": 0,
+            "BodyUsedActingFlag": 0,
+            "BodyUsedTargetFlag": 0,
+            "BodyUsedSponsorFlag": 1,
+        }
+
+    def _make_people(self, start):
+        names = [
+            (first, last) for first in FIRST_NAMES for last in LAST_NAMES
+        ]
+        self._random.shuffle(names)
+
+        term_start = datetime.date(start.year, 1, 1)
+        term_end = datetime.date(self.today.year + 2, 12, 31)
+
+        board_id = self.body_ids[BOARD]
+        self.board_members = []
+        self.posts = {}
+
+        for i, post in enumerate(BOARD_POSTS + ["Appointee of Governor of California", None]):
+            first, last = names.pop()
+            person = self._person(first, last)
+
+            if post is None:
+                title = "Chief Executive Officer"
+            elif post.startswith("Appointee of Governor"):
+                title = "non-voting member"
+            elif i == 0:
+                title = "Chair"
+            elif i == 1:
+                title = "1st Vice Chair"
+            else:
+                title = "Board Member"
+
+            self._office_record(person, board_id, title, term_start, term_end)
+
+            if title not in {"Chief Executive Officer", "non-voting member"}:
+                self.board_members.append(person)
+
+            self.posts[person["PersonId"]] = post
+
+        # Each committee has five board members
+        for name, body_type_id, _ in BODIES:
+            if body_type_id in {42, 43}:
+                members = self._random.sample(self.board_members, 5)
+                for i, person in enumerate(members):
+                    title = "Chair" if i == 0 else "Member"
+                    self._office_record(
+                        person, self.body_ids[name], title, term_start, term_end
+                    )
+
+        # Service council members aren't board members
+        for name, body_type_id, _ in BODIES:
+            if body_type_id in {70, 75}:
+                for _ in range(3):
+                    first, last = names.pop()
+                    self._office_record(
+                        self._person(first, last),
+                        self.body_ids[name],
+                        "Member",
+                        term_start,
+                        term_end,
+                    )
+
+    def _person(self, first, last):
+        person_id = self.next_id("person", 200)
+
+        person = {
+            "PersonId": person_id,
+            "PersonGuid": self.guid(),
+            "PersonLastModifiedUtc": timestamp(self.now - datetime.timedelta(days=300)),
+            "PersonRowVersion": row_version(person_id),
+            "PersonFirstName": first,
+            "PersonLastName": last,
+            "PersonFullName": f"{first} {last}",
+            "PersonActiveFlag": 1,
+            "PersonCanViewFlag": 0,
+            "PersonUsedSponsorFlag": 0,
+            "PersonEmail": None,
+            "PersonWWW": None,
+        }
+
+        self.persons[person_id] = person
+        return person
+
+    def _office_record(self, person, body_id, title, start, end):
+        record_id = self.next_id("office_record", 300)
+        body = next(body for body in self.bodies if body["BodyId"] == body_id)
+
+        self.office_records.setdefault(body_id, []).append(
+            {
+                "OfficeRecordId": record_id,
+                "OfficeRecordGuid": self.guid(),
+                "OfficeRecordLastModifiedUtc": timestamp(
+                    self.now - datetime.timedelta(days=300)
+                ),
+                "OfficeRecordRowVersion": row_version(record_id),
+                "OfficeRecordFirstName": person["PersonFirstName"],
+                "OfficeRecordLastName": person["PersonLastName"],
+                "OfficeRecordEmail": None,
+                "OfficeRecordFullName": person["PersonFullName"],
+                "OfficeRecordStartDate": timestamp(start),
+                "OfficeRecordEndDate": timestamp(end),
+                "OfficeRecordSort": 0,
+                "OfficeRecordPersonId": person["PersonId"],
+                "OfficeRecordBodyId": body_id,
+                "OfficeRecordBodyName": body["BodyName"],
+                "OfficeRecordTitle": title,
+                "OfficeRecordVoteDivider": 1.0,
+                "OfficeRecordExtendFlag": 0,
+                "OfficeRecordMemberTypeId": 1,
+                "OfficeRecordMemberType": "Voting Member",
+                "OfficeRecordSupportNameId": None,
+                "OfficeRecordSupportFullName": None,
+            }
+        )
+
+    def _meeting_dates(self, start, end, every_n_months):
+        """
+        Dates in the given range a body meets on: scale meetings every
+        n months, on weekdays.
+        """
+        month = datetime.date(start.year, start.month, 1)
+        i = 0
+
+        while month <= end:
+            if i % every_n_months == 0:
+                n_meetings = int(self.scale) + (
+                    self._random.random() < self.scale - int(self.scale)
+                )
+                days = self._random.sample(range(1, 29), n_meetings)
+
+                for day in sorted(days):
+                    date = month.replace(day=day)
+                    while date.weekday() >= 5:
+                        date -= datetime.timedelta(days=1)
+
+                    if start <= date <= end:
+                        yield date
+
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+            i += 1
+
+    def _make_meetings(self, start, end):
+        meetings = []
+
+        for name, body_type_id, every_n_months in BODIES:
+            for date in self._meeting_dates(start, end, every_n_months):
+                hour = 10 if name.startswith("Board") else self._random.choice([9, 11, 13])
+                meetings.append((date, hour, name))
+
+        # Matters that went through committee, and are waiting for the board
+        self._pending_board_matters = []
+        # The last board meeting, whose minutes the next one approves
+        self._last_board_event = None
+
+        # Meetings happen in date order, so matters move from committees to
+        # the board as they would.
+        for date, hour, name in sorted(meetings):
+            event = self._event(date, hour, name)
+            self.events.append(event)
+
+            if name in self.sap_bodies and self._random.random() < 0.9:
+                partner = self._event(date, hour, self.sap_bodies[name]["BodyName"])
+                self.events.append(partner)
+                self.event_items[partner["EventId"]] = []
+
+            self._make_agenda(event)
+
+            if name == BOARD:
+                self._last_board_event = event
+
+    def _event(self, date, hour, body_name):
+        event_id = self.next_id("event", 2000)
+        guid = self.guid()
+        is_past = date < self.today
+        is_board = body_name.startswith(BOARD)
+
+        if self._random.random() < 0.02:
+            agenda_status = "Canceled"
+        elif is_past or date < self.today + datetime.timedelta(days=7):
+            agenda_status = self._random.choice(["Final", "Final", "Final Revised"])
+        else:
+            agenda_status = "Draft"
+
+        has_minutes = is_past and not is_board and self._random.random() < 0.5
+        modified = self._modified(date if is_past else self.today - datetime.timedelta(days=7))
+
+        agenda_file = f"{self.web_url}/meetings/{event_id}_A_Agenda.pdf"
+        minutes_file = (
+            f"{self.web_url}/meetings/{event_id}_M_Minutes.pdf" if has_minutes else None
+        )
+
+        self.documents[f"/meetings/{event_id}_A_Agenda.pdf"] = [
+            body_name,
+            "Agenda",
+            date.strftime("%B %-d, %Y"),
+        ]
+        if has_minutes:
+            self.documents[f"/meetings/{event_id}_M_Minutes.pdf"] = [
+                body_name,
+                "Minutes",
+                date.strftime("%B %-d, %Y"),
+            ]
+
+        event = {
+            "EventId": event_id,
+            "EventGuid": guid,
+            "EventLastModifiedUtc": timestamp(modified),
+            "EventRowVersion": row_version(event_id * 10),
+            "EventBodyId": self.body_ids[body_name],
+            "EventBodyName": body_name,
+            "EventDate": timestamp(date),
+            "EventTime": datetime.time(hour).strftime("%-I:%M %p"),
+            "EventVideoStatus": "Public",
+            "EventAgendaStatusId": 2,
+            "EventAgendaStatusName": agenda_status,
+            "EventMinutesStatusId": 2 if has_minutes else 1,
+            "EventMinutesStatusName": "Final" if has_minutes else "Draft",
+            "EventLocation": "One Gateway Plaza, Los Angeles, CA 90012",
+            "EventAgendaFile": agenda_file,
+            "EventMinutesFile": minutes_file,
+            "EventAgendaLastPublishedUTC": timestamp(modified),
+            "EventMinutesLastPublishedUTC": timestamp(modified) if has_minutes else None,
+            "EventComment": None,
+            "EventVideoPath": None,
+            "EventMedia": None,
+            "EventInSiteURL": (
+                f"{self.web_url}/MeetingDetail.aspx?LEGID={event_id}&GID=557&G={guid}"
+            ),
+            "EventItems": [],
+        }
+
+        has_video = is_past and agenda_status != "Canceled" and self._random.random() < 0.8
+        self.web_events[event_id] = {
+            "video": (
+                f"{self.web_url}/Video.aspx?Mode=Granicus&ID1={event_id}&Mode2=Video"
+                if has_video
+                else None
+            ),
+            "ecomment": (
+                f"{self.web_url}/eComment.aspx?ID={event_id}"
+                if not is_past and agenda_status != "Draft"
+                else None
+            ),
+        }
+
+        return event
+
+    def _make_agenda(self, event):
+        date = datetime.date.fromisoformat(event["EventDate"][:10])
+        body_name = event["EventBodyName"]
+        is_board = body_name.startswith("Board of Directors")
+        is_past = date < self.today
+
+        items = [self._event_item(event, 1, "CALL TO ORDER", None)]
+
+        matters = []
+
+        if body_name == BOARD and self._last_board_event:
+            matters.append(self._minutes_matter(self._last_board_event, date))
+
+        if is_board:
+            matters.extend(self._pending_board_matters)
+            self._pending_board_matters = []
+
+        n_new = self._random.randint(4, 9)
+        matters.extend(self._matter(event, date) for _ in range(n_new))
+
+        for matter in matters:
+            sequence = len(items) + 1
+            item = self._event_item(event, sequence, matter["MatterTitle"], matter)
+            items.append(item)
+
+            if is_past:
+                self._history(matter, event, item, is_board)
+
+            if not is_board and self._random.random() < 0.5:
+                self._pending_board_matters.append(matter)
+
+        items.append(self._event_item(event, len(items) + 1, "ADJOURNMENT", None))
+
+        self.event_items[event["EventId"]] = items
+
+    def _event_item(self, event, sequence, title, matter):
+        item_id = self.next_id("event_item", 10000)
+
+        return {
+            "EventItemId": item_id,
+            "EventItemGuid": self.guid(),
+            "EventItemLastModifiedUtc": event["EventLastModifiedUtc"],
+            "EventItemRowVersion": row_version(item_id),
+            "EventItemEventId": event["EventId"],
+            "EventItemAgendaSequence": sequence,
+            "EventItemMinutesSequence": sequence,
+            "EventItemAgendaNumber": str(sequence) if matter else None,
+            "EventItemVideo": None,
+            "EventItemVideoIndex": None,
+            "EventItemVersion": "1",
+            "EventItemAgendaNote": None,
+            "EventItemMinutesNote": None,
+            "EventItemActionId": None,
+            "EventItemActionName": None,
+            "EventItemActionText": None,
+            "EventItemPassedFlag": None,
+            "EventItemPassedFlagName": None,
+            "EventItemRollCallFlag": 0,
+            "EventItemFlagExtra": 0,
+            "EventItemTitle": title,
+            "EventItemTally": None,
+            "EventItemAccelaRecordId": None,
+            "EventItemConsent": 0,
+            "EventItemMoverId": None,
+            "EventItemMover": None,
+            "EventItemSeconderId": None,
+            "EventItemSeconder": None,
+            "EventItemMatterId": matter["MatterId"] if matter else None,
+            "EventItemMatterGuid": matter["MatterGuid"] if matter else None,
+            "EventItemMatterFile": matter["MatterFile"] if matter else None,
+            "EventItemMatterName": matter["MatterName"] if matter else None,
+            "EventItemMatterType": matter["MatterTypeName"] if matter else None,
+            "EventItemMatterStatus": matter["MatterStatusName"] if matter else None,
+            "EventItemMatterAttachments": [],
+        }
+
+    def _matter(self, event, date, matter_type=None, title=None):
+        matter_id = self.next_id("matter", 5000)
+        intro_date = max(
+            date - datetime.timedelta(days=self._random.randint(7, 30)),
+            FIRST_SESSION_START,
+        )
+        matter_type = matter_type or self._random.choice(MATTER_TYPES)
+        subject = self._random.choice(SUBJECTS)
+        title = title or f"{matter_type.split(' /')[0].upper()} regarding {subject}."
+        is_restricted = self._random.random() < 0.03
+
+        self._ids.setdefault(("file", intro_date.year), 0)
+        self._ids[("file", intro_date.year)] += 1
+
+        modified = self._modified(date)
+
+        matter = {
+            "MatterId": matter_id,
+            "MatterGuid": self.guid(),
+            "MatterLastModifiedUtc": timestamp(modified),
+            "MatterRowVersion": row_version(matter_id * 10),
+            "MatterFile": f"{intro_date.year}-{self._ids[('file', intro_date.year)]:04d}",
+            "MatterName": None,
+            "MatterTitle": title,
+            "MatterTypeId": MATTER_TYPES.index(matter_type) + 1 if matter_type in MATTER_TYPES else 99,
+            "MatterTypeName": matter_type,
+            "MatterStatusId": 1,
+            "MatterStatusName": "Draft" if is_restricted else "Agenda Ready",
+            "MatterBodyId": event["EventBodyId"],
+            "MatterBodyName": event["EventBodyName"],
+            "MatterIntroDate": timestamp(intro_date),
+            "MatterAgendaDate": event["EventDate"],
+            "MatterPassedDate": None,
+            "MatterEnactmentDate": None,
+            "MatterEnactmentNumber": None,
+            "MatterRequester": None,
+            "MatterNotes": None,
+            "MatterVersion": "1",
+            "MatterCost": None,
+            "MatterText1": None,
+            "MatterText2": None,
+            "MatterText3": None,
+            "MatterText4": None,
+            "MatterText5": None,
+            "MatterDate1": None,
+            "MatterDate2": None,
+            "MatterEXText1": None,
+            "MatterEXText2": None,
+            "MatterEXDate1": None,
+            "MatterEXDate2": None,
+            "MatterAgiloftId": 0,
+            "MatterReference": None,
+            "MatterRestrictViewViaWeb": is_restricted,
+            "MatterReports": [],
+        }
+
+        self.matters.append(matter)
+        self.histories[matter_id] = []
+
+        self.sponsors[matter_id] = [
+            self._sponsor(matter, event["EventBodyName"], 1)
+        ]
+        if self._random.random() < 0.3:
+            self.sponsors[matter_id].append(
+                self._sponsor(matter, "Chief Executive Office", 2)
+            )
+
+        self.indexes[matter_id] = [
+            {
+                "MatterIndexId": self.next_id("matter_index", 40000),
+                "MatterIndexMatterId": matter_id,
+                "MatterIndexIndexId": TOPICS.index(topic) + 1,
+                "MatterIndexName": topic,
+            }
+            for topic in self._random.sample(TOPICS, self._random.randint(1, 3))
+        ]
+
+        self.relations[matter_id] = []
+        if len(self.matters) > 1 and self._random.random() < 0.1:
+            related = self._random.choice(self.matters[:-1])
+            self.relations[matter_id].append(
+                {
+                    "MatterRelationId": self.next_id("relation", 50000),
+                    "MatterRelationMatterId": related["MatterId"],
+                    "MatterRelationFlag": 0,
+                }
+            )
+
+        self.attachments[matter_id] = [
+            self._attachment(matter, f"Attachment {letter} - {subject}", ["Attachment", subject])
+            for letter in "ABC"[: self._random.randint(0, 3)]
+        ]
+
+        text_id = self.next_id("text", 60000)
+        self.versions[matter_id] = [{"Key": str(text_id), "Value": "1"}]
+        plain = f"{title}\n\nThe Board of Directors is asked to consider {subject}."
+        self.texts[(matter_id, text_id)] = {
+            "MatterTextId": text_id,
+            "MatterTextGuid": self.guid(),
+            "MatterTextLastModifiedUtc": matter["MatterLastModifiedUtc"],
+            "MatterTextRowVersion": row_version(text_id),
+            "MatterTextMatterId": matter_id,
+            "MatterTextVersion": "1",
+            "MatterTextPlain": plain,
+            "MatterTextRtf": "{\\rtf1\\ansi " + plain.replace("\n", "\\par ") + "}",
+        }
+
+        return matter
+
+    def _minutes_matter(self, board_event, date):
+        """
+        The minutes of a board meeting, to approve at the next one.
+        """
+        meeting_date = datetime.date.fromisoformat(board_event["EventDate"][:10])
+        formatted_date = meeting_date.strftime("%B %-d, %Y")
+
+        matter = self._matter(
+            board_event,
+            date,
+            matter_type="Minutes",
+            title=f"APPROVE Minutes of the Regular Board Meeting held {formatted_date}.",
+        )
+        matter["MatterRestrictViewViaWeb"] = False
+        matter["MatterStatusName"] = "Agenda Ready"
+
+        attachments = [
+            self._attachment(
+                matter,
+                f"Regular Board Meeting MINUTES - {formatted_date}",
+                ["Minutes", BOARD, formatted_date],
+            )
+        ]
+        if self._random.random() < 0.5:
+            attachments.insert(
+                0,
+                self._attachment(
+                    matter, "Presentation", ["Presentation", "Quarterly Update"]
+                ),
+            )
+
+        self.attachments[matter["MatterId"]] = attachments
+
+        return matter
+
+    def _sponsor(self, matter, name, sequence):
+        return {
+            "MatterSponsorId": self.next_id("sponsor", 70000),
+            "MatterSponsorGuid": self.guid(),
+            "MatterSponsorLastModifiedUtc": matter["MatterLastModifiedUtc"],
+            "MatterSponsorRowVersion": row_version(matter["MatterId"]),
+            "MatterSponsorMatterId": matter["MatterId"],
+            "MatterSponsorMatterVersion": "1",
+            "MatterSponsorNameId": self.body_ids.get(name, 0),
+            "MatterSponsorBodyId": self.body_ids.get(name, 0),
+            "MatterSponsorName": name,
+            "MatterSponsorSequence": sequence,
+            "MatterSponsorLinkFlag": 0,
+        }
+
+    def _attachment(self, matter, name, cover_page):
+        attachment_id = self.next_id("attachment", 80000)
+        path = f"/attachments/{attachment_id}.pdf"
+        self.documents[path] = cover_page
+
+        return {
+            "MatterAttachmentId": attachment_id,
+            "MatterAttachmentGuid": self.guid(),
+            "MatterAttachmentLastModifiedUtc": matter["MatterLastModifiedUtc"],
+            "MatterAttachmentRowVersion": row_version(attachment_id),
+            "MatterAttachmentName": name,
+            "MatterAttachmentHyperlink": self.web_url + path,
+            "MatterAttachmentFileName": f"{attachment_id}.pdf",
+            "MatterAttachmentMatterVersion": "1",
+            "MatterAttachmentIsHyperlink": False,
+            "MatterAttachmentBinary": None,
+            "MatterAttachmentIsSupportingDocument": False,
+            "MatterAttachmentShowOnInternetPage": True,
+            "MatterAttachmentIsMinuteOrder": False,
+            "MatterAttachmentIsBoardLetter": False,
+            "MatterAttachmentAgiloftId": 0,
+            "MatterAttachmentDescription": None,
+            "MatterAttachmentPrintWithReports": False,
+            "MatterAttachmentSort": 0,
+        }
+
+    def _history(self, matter, event, item, is_board):
+        action, passed = self._random.choice(BOARD_ACTIONS if is_board else COMMITTEE_ACTIONS)
+        is_roll_call = passed is not None
+
+        body_name = event["EventBodyName"]
+        if body_name.startswith("Board of Directors -"):
+            matter_status = "Passed" if passed else "Received and Filed"
+        else:
+            matter_status = "Agenda Ready"
+
+        # Legistar uses the event item ID as the history ID
+        history_id = item["EventItemId"]
+
+        self.histories[matter["MatterId"]].append(
+            {
+                "MatterHistoryId": history_id,
+                "MatterHistoryGuid": self.guid(),
+                "MatterHistoryLastModifiedUtc": event["EventLastModifiedUtc"],
+                "MatterHistoryRowVersion": row_version(history_id),
+                "MatterHistoryEventId": event["EventId"],
+                "MatterHistoryAgendaSequence": item["EventItemAgendaSequence"],
+                "MatterHistoryMinutesSequence": item["EventItemMinutesSequence"],
+                "MatterHistoryAgendaNumber": item["EventItemAgendaNumber"],
+                "MatterHistoryVideo": None,
+                "MatterHistoryRollCallFlag": 1 if is_roll_call else None,
+                "MatterHistoryFlagExtra": 0,
+                "MatterHistoryMatterStatus": matter_status,
+                "MatterHistoryActionId": 1,
+                "MatterHistoryActionName": action,
+                "MatterHistoryActionText": None,
+                "MatterHistoryActionBodyId": event["EventBodyId"],
+                "MatterHistoryActionBodyName": body_name,
+                "MatterHistoryActionDate": event["EventDate"],
+                "MatterHistoryPassedFlag": 1 if is_roll_call else None,
+                "MatterHistoryPassedFlagName": "Pass" if is_roll_call else None,
+                "MatterHistoryTally": None,
+                "MatterHistoryMoverId": None,
+                "MatterHistoryMoverName": None,
+                "MatterHistorySeconderId": None,
+                "MatterHistorySeconderName": None,
+                "MatterHistoryConsent": 0,
+            }
+        )
+
+        matter["MatterStatusName"] = matter_status
+        if passed and is_board:
+            matter["MatterPassedDate"] = event["EventDate"]
+
+        item.update(
+            {
+                "EventItemActionName": action,
+                "EventItemPassedFlag": 1 if is_roll_call else None,
+                "EventItemPassedFlagName": "Pass" if is_roll_call else None,
+                "EventItemRollCallFlag": 1 if is_roll_call else 0,
+                "EventItemMatterStatus": matter_status,
+            }
+        )
+
+        if is_roll_call:
+            members = [
+                self.persons[record["OfficeRecordPersonId"]]
+                for record in self.office_records.get(event["EventBodyId"], [])
+                if record["OfficeRecordTitle"]
+                not in {"Chief Executive Officer", "non-voting member"}
+            ]
+
+            self.votes[history_id] = [
+                {
+                    "VoteId": self.next_id("vote", 90000),
+                    "VoteGuid": self.guid(),
+                    "VoteLastModifiedUtc": event["EventLastModifiedUtc"],
+                    "VoteRowVersion": row_version(history_id),
+                    "VotePersonId": person["PersonId"],
+                    "VotePersonName": person["PersonFullName"],
+                    "VoteValueId": 1,
+                    "VoteValueName": self._random.choices(
+                        ["Aye", "Nay", "Absent", "Recused"], weights=[85, 5, 8, 2]
+                    )[0],
+                    "VoteSort": i,
+                    "VoteResult": 1,
+                    "VoteEventItemId": history_id,
+                }
+                for i, person in enumerate(members)
+            ]
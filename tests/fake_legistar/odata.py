@@ -0,0 +1,276 @@
+"""
+The subset of OData v3 query options the Legistar API supports, and we
+use: $filter, $orderby, $top and $skip.
+
+$filter supports comparisons (eq, ne, gt, ge, lt, le), and, or, not,
+parentheses, substringof, and string, datetime, number, boolean and null
+literals. Like Legistar's SQL Server backend, string comparisons ignore
+case, and comparisons with null are false, except eq and ne null.
+"""
+
+import datetime
+import re
+
+# Legistar returns at most this many records per request
+MAX_TOP = 1000
+
+TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<datetime>datetime'(?P<datetime_value>[^']*)')
+      | (?P<string>'(?P<string_value>(?:[^']|'')*)')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<punctuation>[(),])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+
+class ODataError(ValueError):
+    pass
+
+
+def parse_datetime(value):
+    return datetime.datetime.fromisoformat(value.rstrip("Z"))
+
+
+def tokenize(expression):
+    tokens = []
+    position = 0
+
+    while position < len(expression.rstrip()):
+        match = TOKEN.match(expression, position)
+        if not match:
+            raise ODataError(f"Syntax error at position {position} in '{expression}'")
+
+        if match.group("datetime"):
+            try:
+                tokens.append(("literal", parse_datetime(match.group("datetime_value"))))
+            except ValueError:
+                raise ODataError(f"Invalid datetime literal {match.group('datetime')}")
+        elif match.group("string"):
+            tokens.append(("literal", match.group("string_value").replace("''", "'")))
+        elif match.group("number"):
+            number = match.group("number")
+            tokens.append(("literal", float(number) if "." in number else int(number)))
+        elif match.group("punctuation"):
+            tokens.append((match.group("punctuation"), None))
+        else:
+            name = match.group("name")
+            keyword = name.lower()
+
+            if keyword == "null":
+                tokens.append(("literal", None))
+            elif keyword in {"true", "false"}:
+                tokens.append(("literal", keyword == "true"))
+            elif keyword in COMPARISONS or keyword in {"and", "or", "not"}:
+                tokens.append((keyword, None))
+            else:
+                tokens.append(("name", name))
+
+        position = match.end()
+
+    return tokens
+
+
+def _comparable(value, other):
+    """
+    Coerce a record value to compare against a literal, e.g., Legistar
+    serializes datetimes as ISO strings.
+    """
+    if isinstance(other, datetime.datetime) and isinstance(value, str):
+        return parse_datetime(value)
+
+    if isinstance(value, str):
+        return value.casefold()
+
+    return value
+
+
+def compare(operator, left, right):
+    if left is None or right is None:
+        if operator == "eq":
+            return left is right
+        if operator == "ne":
+            return left is not right
+        return False
+
+    left, right = _comparable(left, right), _comparable(right, left)
+
+    try:
+        return COMPARISONS[operator](left, right)
+    except TypeError:
+        raise ODataError(f"Can't compare {left!r} and {right!r}")
+
+
+class Parser:
+    """
+    Recursive descent parser that compiles a $filter expression into a
+    predicate on records.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+
+    def take(self, kind=None):
+        if self.position >= len(self.tokens):
+            raise ODataError(f"Unexpected end of '{self.expression}'")
+
+        token = self.tokens[self.position]
+        if kind and token[0] != kind:
+            raise ODataError(f"Expected {kind}, got {token[0]} in '{self.expression}'")
+
+        self.position += 1
+        return token
+
+    def parse(self):
+        predicate = self.or_expression()
+
+        if self.position != len(self.tokens):
+            raise ODataError(f"Unexpected {self.peek()} in '{self.expression}'")
+
+        return lambda record: bool(predicate(record))
+
+    def or_expression(self):
+        operands = [self.and_expression()]
+        while self.peek() == "or":
+            self.take()
+            operands.append(self.and_expression())
+
+        if len(operands) == 1:
+            return operands[0]
+        return lambda record: any(operand(record) for operand in operands)
+
+    def and_expression(self):
+        operands = [self.unary()]
+        while self.peek() == "and":
+            self.take()
+            operands.append(self.unary())
+
+        if len(operands) == 1:
+            return operands[0]
+        return lambda record: all(operand(record) for operand in operands)
+
+    def unary(self):
+        if self.peek() == "not":
+            self.take()
+            operand = self.unary()
+            return lambda record: not operand(record)
+
+        return self.comparison()
+
+    def comparison(self):
+        left = self.operand()
+
+        if self.peek() in COMPARISONS:
+            operator, _ = self.take()
+            right = self.operand()
+            return lambda record: compare(operator, left(record), right(record))
+
+        return left
+
+    def operand(self):
+        kind, value = self.take()
+
+        if kind == "(":
+            expression = self.or_expression()
+            self.take(")")
+            return expression
+
+        if kind == "literal":
+            return lambda record: value
+
+        if kind == "name" and self.peek() == "(":
+            return self.function(value)
+
+        if kind == "name":
+            return lambda record: record.get(value)
+
+        raise ODataError(f"Unexpected {kind} in '{self.expression}'")
+
+    def function(self, name):
+        self.take("(")
+        arguments = [self.operand()]
+        while self.peek() == ",":
+            self.take()
+            arguments.append(self.operand())
+        self.take(")")
+
+        if name.lower() == "substringof" and len(arguments) == 2:
+            needle, haystack = arguments
+
+            def substringof(record):
+                needle_value, haystack_value = needle(record), haystack(record)
+                if needle_value is None or haystack_value is None:
+                    return False
+                return str(needle_value).casefold() in str(haystack_value).casefold()
+
+            return substringof
+
+        raise ODataError(f"Unsupported function {name} in '{self.expression}'")
+
+
+def parse_filter(expression):
+    return Parser(expression).parse()
+
+
+def order(records, orderby):
+    """
+    Sort records by a $orderby clause, e.g., "EventDate desc,EventId".
+    Like SQL Server, nulls sort first.
+    """
+    # Sort by the last key first, relying on sort stability
+    for clause in reversed([clause.strip() for clause in orderby.split(",")]):
+        field, _, direction = clause.partition(" ")
+        direction = direction.strip().lower()
+
+        if direction not in {"", "asc", "desc"}:
+            raise ODataError(f"Invalid $orderby '{orderby}'")
+
+        records = sorted(
+            records,
+            key=lambda record: (
+                record.get(field) is not None,
+                _comparable(record.get(field), None),
+            ),
+            reverse=direction == "desc",
+        )
+
+    return records
+
+
+def query(records, params):
+    """
+    Apply the OData query options in params to a list of records.
+    """
+    if params.get("$filter"):
+        predicate = parse_filter(params["$filter"])
+        records = [record for record in records if predicate(record)]
+
+    if params.get("$orderby"):
+        records = order(records, params["$orderby"])
+
+    try:
+        skip = int(params.get("$skip") or 0)
+        top = min(int(params.get("$top") or MAX_TOP), MAX_TOP)
+    except ValueError:
+        raise ODataError("$skip and $top must be integers")
+
+    return list(records)[skip : skip + top]
@@ -0,0 +1,701 @@
+"""
+A local stand-in for the Legistar API and web interface, to load test
+the scrapers without a network connection.
+
+To serve ten times Metro's usual volume, with 50ms of latency, 20
+requests per second before throttling and 1% of requests failing:
+
+    python -m tests.fake_legistar.server --scale 10 --latency 0.05 \
+        --rate-limit 20 --error-rate 0.01
+
+To run a scrape against it and print metrics, as the benchmark harness
+does, name a scraper and its arguments:
+
+    python -m tests.fake_legistar.server --scale 10 bills window=0
+
+In tests, use FakeLegistar as a context manager, and point the scrapers
+at it with patch_scrapers.
+"""
+
+import argparse
+import contextlib
+import datetime
+import html
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from . import odata
+from .data import BOARD, Dataset
+from .pdf import pdf
+
+CLIENT = "metro"
+
+NOT_AVAILABLE = "Not\xa0available"
+
+# Sub-resources of matters, keyed on the route segment after the ID
+MATTER_RESOURCES = {
+    "histories": "histories",
+    "sponsors": "sponsors",
+    "attachments": "attachments",
+    "indexes": "indexes",
+    "relations": "relations",
+    "versions": "versions",
+}
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeLegistar:
+    """
+    An HTTP server that serves a synthetic Dataset the way Legistar does.
+
+    - latency: seconds to wait before responding to each request
+    - rate_limit: requests per second to serve before responding with 429
+      Too Many Requests, or None to serve every request
+    - error_rate: fraction of requests to fail with a 500
+    """
+
+    def __init__(
+        self,
+        scale=1,
+        seed=0,
+        years=2,
+        latency=0,
+        rate_limit=None,
+        error_rate=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.legistar = self
+
+        host, port = self.httpd.server_address[:2]
+        self.url = f"http://{host}:{port}"
+        self.api_url = f"{self.url}/v1/{CLIENT}"
+        self.web_url = self.url
+
+        self.data = Dataset(self.web_url, scale=scale, seed=seed, years=years)
+
+        self.stats = Counter()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit or 0
+        self._last_refill = time.monotonic()
+        self._thread = None
+        self._pdfs = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fault(self):
+        """
+        The status to fail the next request with, if any, per the rate
+        limit and error rate.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+
+            if self.rate_limit:
+                # Token bucket, holding up to a second's worth of requests
+                now = time.monotonic()
+                self._tokens = min(
+                    self.rate_limit,
+                    self._tokens + (now - self._last_refill) * self.rate_limit,
+                )
+                self._last_refill = now
+
+                if self._tokens < 1:
+                    self.stats[429] += 1
+                    return HTTPStatus.TOO_MANY_REQUESTS
+
+                self._tokens -= 1
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats[500] += 1
+                return HTTPStatus.INTERNAL_SERVER_ERROR
+
+    def pdf(self, path):
+        with self._lock:
+            if path not in self._pdfs:
+                self._pdfs[path] = pdf(self.data.documents[path])
+            return self._pdfs[path]
+
+    # API
+
+    def api(self, path, params):
+        """
+        The JSON response to an API request.
+        """
+        data = self.data
+        segments = [segment.lower() for segment in path.strip("/").split("/")]
+
+        match segments:
+            case ["bodytypes"]:
+                return odata.query(data.body_types, params)
+            case ["bodies"]:
+                return odata.query(data.bodies, params)
+            case ["bodies", body_id]:
+                return self._get(data.bodies_by_id, body_id)
+            case ["bodies", body_id, "officerecords"]:
+                return odata.query(self._get(data.office_records, body_id), params)
+            case ["events"]:
+                return odata.query(data.events, params)
+            case ["events", event_id]:
+                return self._get(data.events_by_id, event_id)
+            case ["events", event_id, "eventitems"]:
+                return odata.query(self._get(data.event_items, event_id), params)
+            case ["eventitems", item_id, "votes"]:
+                return odata.query(data.votes.get(int(item_id), []), params)
+            case ["eventitems", item_id, "rollcalls"]:
+                return []
+            case ["matters"]:
+                return odata.query(data.matters, params)
+            case ["matters", matter_id]:
+                return self._get(data.matters_by_id, matter_id)
+            case ["matters", matter_id, "texts", text_id]:
+                return self._get(data.texts, (int(matter_id), int(text_id)))
+            case ["matters", matter_id, resource] if resource in MATTER_RESOURCES:
+                records = getattr(data, MATTER_RESOURCES[resource])
+                return odata.query(self._get(records, matter_id), params)
+            case ["matters", matter_id, "codesections"]:
+                self._get(data.matters_by_id, matter_id)
+                return []
+            case ["persons", person_id]:
+                return self._get(data.persons, person_id)
+
+        raise NotFound(path)
+
+    def _get(self, records, key):
+        try:
+            return records[int(key) if isinstance(key, str) else key]
+        except (KeyError, ValueError):
+            raise NotFound(key)
+
+    # Web interface
+
+    def web(self, path, params):
+        """
+        The status, headers and body of a request to the web interface.
+        """
+        data = self.data
+        route = path.lower()
+
+        if route == "/gateway.aspx":
+            matter = self._get(data.matters_by_id, params.get("id", ""))
+
+            # Restricted matters don't redirect to a detail page
+            if matter["MatterRestrictViewViaWeb"]:
+                return HTTPStatus.OK, {}, page("Legislation", "")
+
+            location = (
+                f"LegislationDetail.aspx?ID={matter['MatterId']}"
+                f"&GUID={matter['MatterGuid']}"
+            )
+            return HTTPStatus.FOUND, {"Location": location}, ""
+
+        if route == "/legislationdetail.aspx":
+            matter = self._get(data.matters_by_id, params.get("id", ""))
+            return HTTPStatus.OK, {}, page(matter["MatterFile"], "")
+
+        if route == "/meetingdetail.aspx":
+            event = self._get(data.events_by_id, params.get("legid", ""))
+            return HTTPStatus.OK, {}, self.meeting_detail(event)
+
+        if route == "/calendar.aspx":
+            return HTTPStatus.OK, {}, self.calendar(params)
+
+        if route == "/view.ashx" and params.get("m", "").lower() == "ic":
+            event = self._get(data.events_by_id, params.get("id", ""))
+            return HTTPStatus.OK, {"Content-Type": "text/calendar"}, ical(event)
+
+        if route == "/meetings.js":
+            return HTTPStatus.OK, {"Content-Type": "text/javascript"}, self.ecomments()
+
+        if route == "/video.aspx":
+            # Only some audio links redirect to a file yet
+            event_id = int(params.get("id1", 0))
+            if event_id % 10 == 0:
+                return HTTPStatus.OK, {}, page("Video", "")
+
+            location = f"{self.url}/media/{event_id}.mp4"
+            return HTTPStatus.FOUND, {"Location": location}, ""
+
+        if route == "/people.aspx":
+            return HTTPStatus.OK, {}, self.people()
+
+        if route == "/persondetail.aspx":
+            person = self._get(data.persons, params.get("id", ""))
+            return HTTPStatus.OK, {}, self.person_detail(person)
+
+        if path in data.documents:
+            return HTTPStatus.OK, {"Content-Type": "application/pdf"}, self.pdf(path)
+
+        if route.startswith("/media/") or route.startswith("/departmentdetail.aspx"):
+            return HTTPStatus.OK, {}, page(path, "")
+
+        raise NotFound(path)
+
+    def meeting_detail(self, event):
+        web_event = self.data.web_events[event["EventId"]]
+
+        fields = [
+            ("Name", (event["EventBodyName"], f"DepartmentDetail.aspx?ID={event['EventBodyId']}")),
+            ("Date", event["EventDate"][:10]),
+            ("Time", event["EventTime"]),
+            ("Location", event["EventLocation"]),
+            ("Agenda status", event["EventAgendaStatusName"]),
+            ("Published agenda", ("Agenda", event["EventAgendaFile"])),
+            ("Published minutes", ("Minutes", event["EventMinutesFile"])),
+            ("Meeting video", ("Video", web_event["video"])),
+            ("eComment", ("eComment", web_event["ecomment"])),
+        ]
+
+        details = []
+        for name, value in fields:
+            details.append(
+                f'<span id="ctl00_ContentPlaceHolder1_lbl{key(name)}Prompt">{name}:</span>'
+            )
+
+            if isinstance(value, tuple):
+                label, url = value
+                if url:
+                    # Links are the field's element itself, so the detail
+                    # parser reads them as a label and URL.
+                    details.append(
+                        f'<a id="ctl00_ContentPlaceHolder1_hyp{key(name)}" '
+                        f'href="{html.escape(url)}">{html.escape(label)}</a>'
+                    )
+                    continue
+
+                value = NOT_AVAILABLE
+
+            # Legistar looks up eComment links by event ID, in meetings.js
+            attributes = (
+                f' data-event-id="{event["EventId"]}"' if name == "eComment" else ""
+            )
+
+            details.append(
+                f'<span id="ctl00_ContentPlaceHolder1_lbl{key(name)}"{attributes}>'
+                f"{html.escape(value)}</span>"
+            )
+
+        return page(
+            event["EventBodyName"],
+            f'<div id="ctl00_ContentPlaceHolder1_pageTop1">{"".join(details)}</div>',
+        )
+
+    def ecomments(self):
+        """
+        Granicus' script that adds eComment links to the web interface.
+        """
+        return "\n".join(
+            f"activateEcomment('{event['EventId']}', '{event['EventGuid']}', "
+            f"'{self.data.web_events[event['EventId']]['ecomment']}');"
+            for event in self.data.events
+            if self.data.web_events[event["EventId"]]["ecomment"]
+        )
+
+    def calendar(self, params):
+        """
+        The web calendar, showing a year of events on one page.
+        """
+        client_state = params.get("ctl00_ContentPlaceHolder1_lstYears_ClientState")
+        year = json.loads(client_state)["value"] if client_state else str(
+            datetime.date.today().year
+        )
+
+        events = [
+            event
+            for event in self.data.events
+            if year == "All" or event["EventDate"].startswith(year)
+        ]
+        events.sort(key=lambda event: event["EventDate"], reverse=True)
+
+        headers = [
+            "Name",
+            "Meeting Date",
+            '<img alt="" />',
+            "Meeting Time",
+            "Meeting Location",
+            "Meeting Details",
+            "Agenda",
+            "Minutes",
+            "Audio",
+            "eComment",
+        ]
+
+        rows = []
+        for i, event in enumerate(events):
+            web_event = self.data.web_events[event["EventId"]]
+            date = datetime.date.fromisoformat(event["EventDate"][:10])
+
+            cells = [
+                link(event["EventBodyName"], f"DepartmentDetail.aspx?ID={event['EventBodyId']}"),
+                f"{date.month}/{date.day}/{date.year}",
+                link("iCalendar", f"View.ashx?M=IC&ID={event['EventId']}&GUID={event['EventGuid']}"),
+                event["EventTime"],
+                html.escape(event["EventLocation"]),
+                link("Meeting\xa0details", event["EventInSiteURL"])
+                if event["EventAgendaStatusName"] != "Draft"
+                else NOT_AVAILABLE,
+                link("Agenda", event["EventAgendaFile"]),
+                link("Minutes", event["EventMinutesFile"])
+                if event["EventMinutesFile"]
+                else NOT_AVAILABLE,
+                link("Audio", web_event["video"]) if web_event["video"] else NOT_AVAILABLE,
+                link("eComment", web_event["ecomment"])
+                if web_event["ecomment"]
+                else NOT_AVAILABLE,
+            ]
+
+            row_class = "rgRow" if i % 2 == 0 else "rgAltRow"
+            rows.append(
+                f'<tr class="{row_class}">'
+                + "".join(f"<td>{cell}</td>" for cell in cells)
+                + "</tr>"
+            )
+
+        return page(
+            "Calendar",
+            f'<input id="ctl00_ContentPlaceHolder1_lstYears_Input" value="{"All Years" if year == "All" else year}" />'
+            '<div id="ctl00_ContentPlaceHolder1_MultiPageCalendar">'
+            + table("rgMasterTable", headers, rows)
+            + "</div>",
+        )
+
+    def people(self):
+        board_id = self.data.body_ids[BOARD]
+        rows = []
+
+        for i, record in enumerate(self.data.office_records[board_id]):
+            person = self.data.persons[record["OfficeRecordPersonId"]]
+            row_class = "rgRow" if i % 2 == 0 else "rgAltRow"
+            detail_url = (
+                f"PersonDetail.aspx?ID={person['PersonId']}&GUID={person['PersonGuid']}"
+            )
+            rows.append(
+                f'<tr class="{row_class}">'
+                f"<td>{link(person['PersonFullName'], detail_url)}</td>"
+                f"<td>{html.escape(self.data.posts[person['PersonId']] or '')}</td>"
+                "</tr>"
+            )
+
+        return page(
+            "People",
+            table(
+                "rgMasterTable",
+                ["Person Name", "Notes"],
+                rows,
+                id="ctl00_ContentPlaceHolder1_gridPeople_ctl00",
+            ),
+        )
+
+    def person_detail(self, person):
+        rows = []
+
+        for body_id, records in self.data.office_records.items():
+            for record in records:
+                if record["OfficeRecordPersonId"] == person["PersonId"]:
+                    body_url = f"DepartmentDetail.aspx?ID={body_id}"
+                    rows.append(
+                        '<tr class="rgRow">'
+                        f"<td>{link(record['OfficeRecordBodyName'], body_url)}</td>"
+                        f"<td>{html.escape(record['OfficeRecordTitle'])}</td>"
+                        "</tr>"
+                    )
+
+        return page(
+            person["PersonFullName"],
+            '<div id="ctl00_ContentPlaceHolder1_pageDetails">'
+            '<span id="ctl00_ContentPlaceHolder1_lblNamePrompt">Name:</span>'
+            f'<span id="ctl00_ContentPlaceHolder1_lblName">{html.escape(person["PersonFullName"])}</span>'
+            "</div>"
+            + table(
+                "rgMasterTable",
+                ["Department Name", "Title"],
+                rows,
+                id="ctl00_ContentPlaceHolder1_gridDepartments_ctl00",
+            ),
+        )
+
+
+def key(name):
+    return re.sub(r"\W", "", name.title())
+
+
+def link(label, url):
+    return f'<a href="{html.escape(url)}">{html.escape(label)}</a>'
+
+
+def table(css_class, headers, rows, id=None):
+    id_attribute = f' id="{id}"' if id else ""
+    header_cells = "".join(f'<th class="rgHeader">{header}</th>' for header in headers)
+    return (
+        f'<table class="{css_class}"{id_attribute}>'
+        f"<thead><tr>{header_cells}</tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody>"
+        "</table>"
+    )
+
+
+def page(title, body):
+    return (
+        "<!DOCTYPE html><html>"
+        f"<head><title>{html.escape(title)}</title></head>"
+        '<body><form method="post">'
+        '<input type="hidden" name="__VIEWSTATE" value="fake-viewstate" />'
+        '<input type="hidden" name="__EVENTVALIDATION" value="fake-validation" />'
+        f"{body}"
+        "</form></body></html>"
+    )
+
+
+def ical(event):
+    start = datetime.datetime.strptime(
+        f"{event['EventDate'][:10]} {event['EventTime']}", "%Y-%m-%d %I:%M %p"
+    )
+    return (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nBEGIN:VEVENT\r\n"
+        f"DTSTART:{start:%Y%m%dT%H%M%S}\r\n"
+        f"SUMMARY:{event['EventBodyName']}\r\n"
+        "END:VEVENT\r\nEND:VCALENDAR\r\n"
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        self.handle_request(form={key: values[-1] for key, values in form.items()})
+
+    def handle_request(self, send_body=True, form=None):
+        legistar = self.server.legistar
+        parts = urlsplit(self.path)
+        params = {
+            name: values[-1] for name, values in parse_qs(parts.query).items()
+        }
+
+        if legistar.latency:
+            time.sleep(legistar.latency)
+
+        status = legistar.fault()
+        is_api = parts.path.lower().startswith(f"/v1/{CLIENT}")
+
+        if status:
+            headers = {"Retry-After": "1"} if status == HTTPStatus.TOO_MANY_REQUESTS else {}
+            self.respond(status, headers, {"Message": status.phrase}, send_body)
+            return
+
+        try:
+            if is_api:
+                api_path = parts.path[len(f"/v1/{CLIENT}") :]
+                self.respond(HTTPStatus.OK, {}, legistar.api(api_path, params), send_body)
+            else:
+                # The web interface's query parameters are case insensitive
+                params = {name.lower(): value for name, value in params.items()}
+                params.update(form or {})
+                status, headers, body = legistar.web(parts.path, params)
+                self.respond(status, headers, body, send_body)
+
+        except odata.ODataError as e:
+            self.respond(HTTPStatus.BAD_REQUEST, {}, {"Message": str(e)}, send_body)
+
+        except (NotFound, ValueError):
+            if is_api:
+                self.respond(
+                    HTTPStatus.NOT_FOUND, {}, {"Message": "Not found"}, send_body
+                )
+            else:
+                self.respond(
+                    HTTPStatus.OK,
+                    {},
+                    page("Error", "This record no longer exists. It might have been deleted."),
+                    send_body,
+                )
+
+    def respond(self, status, headers, body, send_body=True):
+        if isinstance(body, (dict, list)):
+            content = json.dumps(body).encode("utf-8")
+            headers = {"Content-Type": "application/json; charset=utf-8", **headers}
+        elif isinstance(body, str):
+            content = body.encode("utf-8")
+            headers = {"Content-Type": "text/html; charset=utf-8", **headers}
+        else:
+            content = body
+
+        # Serve byte ranges, e.g., of attachments
+        range_match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if status == HTTPStatus.OK and range_match and content:
+            first = int(range_match.group(1))
+            last = min(int(range_match.group(2) or len(content) - 1), len(content) - 1)
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(content)}"
+            content = content[first : last + 1]
+            status = HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(content)
+
+
+@contextlib.contextmanager
+def patch_scrapers(legistar):
+    """
+    Point the Metro scrapers at a FakeLegistar, rather than Legistar.
+    """
+    from legistar.events import LegistarEventsScraper
+
+    from lametro.base import LAMetroAPIWebEventScraper
+    from lametro.bills import LametroBillScraper
+    from lametro.people import LametroPersonScraper
+
+    overrides = [
+        (
+            LegistarEventsScraper,
+            {
+                "ECOMMENT_JS_URLS": (
+                    legistar.web_url + "/meetings.js",
+                    legistar.web_url + "/meetings.js?scope=past",
+                ),
+            },
+        ),
+        (
+            LAMetroAPIWebEventScraper,
+            {
+                "BASE_URL": legistar.api_url,
+                "WEB_URL": legistar.web_url,
+                "EVENTSPAGE": legistar.web_url + "/Calendar.aspx",
+            },
+        ),
+        (
+            LametroBillScraper,
+            {"BASE_URL": legistar.api_url, "BASE_WEB_URL": legistar.web_url},
+        ),
+        (
+            LametroPersonScraper,
+            {"BASE_URL": legistar.api_url, "WEB_URL": legistar.web_url},
+        ),
+    ]
+
+    with contextlib.ExitStack() as stack:
+        for scraper, attributes in overrides:
+            for name, value in attributes.items():
+                stack.enter_context(mock.patch.object(scraper, name, value))
+
+        yield
+
+
+def main(argv):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--scale", type=float, default=1)
+    arg_parser.add_argument("--years", type=int, default=2)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--latency", type=float, default=0)
+    arg_parser.add_argument("--rate-limit", type=float, default=None)
+    arg_parser.add_argument("--error-rate", type=float, default=0)
+    arg_parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the scraper's requests in flight, rather than use --rpm",
+    )
+    arg_parser.add_argument("scraper", nargs="?")
+    arg_parser.add_argument("kwargs", nargs="*")
+    args = arg_parser.parse_args(argv)
+
+    legistar = FakeLegistar(
+        scale=args.scale,
+        seed=args.seed,
+        years=args.years,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        port=0 if args.scraper else args.port,
+    )
+
+    print(
+        f"Serving {len(legistar.data.events)} events and "
+        f"{len(legistar.data.matters)} matters at {legistar.api_url}",
+        file=sys.stderr,
+    )
+
+    if not args.scraper:
+        try:
+            legistar.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    from lametro.base import SharedTransport
+    from lametro.instrumentation import InstrumentedAdapter
+    from lametro.ratelimit import HostLimits, RateLimitedAdapter
+
+    from ..benchmarks.harness import isolated_transport, run
+
+    kwargs = dict(arg.split("=", 1) for arg in args.kwargs)
+
+    if args.adaptive:
+        adapter = RateLimitedAdapter(
+            HostLimits(maximum=SharedTransport.POOL_SIZE),
+            pool_maxsize=SharedTransport.POOL_SIZE,
+        )
+    else:
+        adapter = InstrumentedAdapter(pool_maxsize=SharedTransport.POOL_SIZE)
+
+    with legistar, patch_scrapers(legistar), isolated_transport(adapter):
+        metrics = run(args.scraper, kwargs)
+
+    metrics["server"] = {str(key): value for key, value in legistar.stats.items()}
+
+    if args.adaptive:
+        metrics["limits"] = adapter.limits.summary()
+
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
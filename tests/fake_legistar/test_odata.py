@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+
+from .odata import ODataError, parse_filter, query
+
+MATTERS = [
+    {'MatterId': 1, 'MatterBodyId': 138, 'MatterTypeName': 'Minutes',
+     'MatterTitle': "APPROVE Minutes of the Regular Board Meeting held May 23, 2024.",
+     'MatterLastModifiedUtc': '2024-05-30T10:00:00.123', 'MatterPassedDate': None},
+    {'MatterId': 2, 'MatterBodyId': 138, 'MatterTypeName': 'Informational Report',
+     'MatterTitle': "RECEIVE AND FILE Minutes of the O'Neill Committee",
+     'MatterLastModifiedUtc': '2024-06-02T10:00:00.000', 'MatterPassedDate': '2024-06-01T00:00:00'},
+    {'MatterId': 3, 'MatterBodyId': 140, 'MatterTypeName': 'Contract',
+     'MatterTitle': 'AWARD contract for rail cars',
+     'MatterLastModifiedUtc': '2024-06-03T10:00:00.000', 'MatterPassedDate': None},
+]
+
+
+@pytest.mark.parametrize('expression,matter_ids', [
+    ('MatterBodyId eq 138', [1, 2]),
+    ('MatterBodyId ne 138', [3]),
+    ("MatterTypeName eq 'minutes'", [1]),
+    ("MatterLastModifiedUtc gt datetime'2024-06-01T00:00:00'", [2, 3]),
+    ("MatterLastModifiedUtc le datetime'2024-05-30T10:00:00.123'", [1]),
+    ('MatterPassedDate eq null', [1, 3]),
+    ("MatterPassedDate gt datetime'2020-01-01'", [2]),
+    ("substringof('Minutes', MatterTitle)", [1, 2]),
+    ("substringof('O''Neill', MatterTitle)", [2]),
+    ("not substringof('Minutes', MatterTitle)", [3]),
+    # The filter find_approved_minutes searches with
+    ("MatterBodyId eq 138 and substringof('May 23, 2024', MatterTitle) and "
+     "((MatterTypeName eq 'Minutes') or "
+     "(substringof('Minutes', MatterTitle) and MatterTypeName eq 'Informational Report'))", [1]),
+    ('MatterBodyId eq 140 or MatterId eq 1 and MatterBodyId eq 138', [1, 3]),
+])
+def test_filter(expression, matter_ids):
+    predicate = parse_filter(expression)
+    assert [matter['MatterId'] for matter in MATTERS if predicate(matter)] == matter_ids
+
+
+@pytest.mark.parametrize('expression', [
+    'MatterBodyId eq',
+    "MatterTitle eq 'unterminated",
+    '(MatterBodyId eq 138',
+    "endswith(MatterTitle, 'cars')",
+    "MatterLastModifiedUtc gt datetime'yesterday'",
+])
+def test_invalid_filter(expression):
+    with pytest.raises(ODataError):
+        parse_filter(expression)
+
+
+def test_query_options():
+    assert [matter['MatterId'] for matter in query(MATTERS, {
+        '$orderby': 'MatterBodyId desc,MatterLastModifiedUtc',
+    })] == [3, 1, 2]
+
+    # Nulls sort first
+    assert [matter['MatterId'] for matter in query(MATTERS, {
+        '$orderby': 'MatterPassedDate,MatterId desc',
+    })] == [3, 1, 2]
+
+    assert [matter['MatterId'] for matter in query(MATTERS, {
+        '$orderby': 'MatterId', '$skip': '1', '$top': '1',
+    })] == [2]
+
+    records = [{'Id': i} for i in range(2500)]
+    assert len(query(records, {})) == 1000
+    assert query(records, {'$skip': '2000', '$top': '5000'})[-1] == {'Id': 2499}
@@ -0,0 +1,46 @@
+from pupa.scrape import Organization, Person
+from pupa.scrape.bill import Bill
+
+from lametro import Lametro, LametroBillScraper, LametroPersonScraper
+
+from .server import FakeLegistar, patch_scrapers
+
+
+def test_bill_scraper(tmp_path):
+    '''
+    Test that the bill scraper can scrape matters from the stand-in.
+    '''
+    with FakeLegistar(years=1) as legistar, patch_scrapers(legistar):
+        public_matters = [
+            matter for matter in legistar.data.matters
+            if not matter['MatterRestrictViewViaWeb']
+        ][:20]
+
+        scraper = LametroBillScraper(Lametro(), str(tmp_path))
+        scraper.requests_per_minute = 0
+
+        matter_ids = ','.join(str(matter['MatterId']) for matter in public_matters)
+        bills = [
+            bill for bill in scraper.scrape(matter_ids=matter_ids)
+            if type(bill) == Bill
+        ]
+
+    assert [bill.identifier for bill in bills] == [
+        matter['MatterFile'] for matter in public_matters
+    ]
+
+
+def test_person_scraper(tmp_path):
+    with FakeLegistar(years=1) as legistar, patch_scrapers(legistar):
+        scraper = LametroPersonScraper(Lametro(), str(tmp_path))
+        scraper.requests_per_minute = 0
+
+        scraped = list(scraper.scrape())
+
+    people = [obj for obj in scraped if isinstance(obj, Person)]
+    committees = [obj for obj in scraped if isinstance(obj, Organization)]
+
+    # Board members, the CEO and the non-voting member. Service council
+    # members aren't scraped.
+    assert len(people) == 15
+    assert len(committees) == 7
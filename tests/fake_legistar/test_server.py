@@ -0,0 +1,133 @@
+import pytest
+import requests
+
+from .server import FakeLegistar
+
+
+@pytest.fixture(scope='module')
+def legistar():
+    with FakeLegistar() as legistar:
+        yield legistar
+
+
+def pages(url, params=None):
+    '''
+    Page through a collection as the legistar scrapers do.
+    '''
+    params = dict(params or {})
+    skip = 0
+
+    while True:
+        params['$skip'] = skip
+        response = requests.get(url, params=params)
+        response.raise_for_status()
+
+        yield from response.json()
+
+        if len(response.json()) < 1000:
+            break
+
+        skip += 1000
+
+
+def test_paging_and_filtering(legistar):
+    matters = list(pages(legistar.api_url + '/matters/', {'$orderby': 'MatterLastModifiedUtc'}))
+    assert len(matters) == len(legistar.data.matters) > 1000
+    assert len({matter['MatterId'] for matter in matters}) == len(matters)
+
+    last_modified = [matter['MatterLastModifiedUtc'] for matter in matters]
+    assert last_modified == sorted(last_modified)
+
+    since = last_modified[len(last_modified) // 2]
+    recent = list(pages(
+        legistar.api_url + '/matters/',
+        {'$filter': f"MatterLastModifiedUtc gt datetime'{since}'"},
+    ))
+    assert recent and all(matter['MatterLastModifiedUtc'] > since for matter in recent)
+
+    response = requests.get(legistar.api_url + '/matters/', params={'$filter': 'MatterId eq'})
+    assert response.status_code == 400
+    assert response.json()['Message']
+
+
+def test_events_have_partners(legistar):
+    '''
+    Test that English events can find their Spanish partners with the
+    search the event scraper makes.
+    '''
+    board = legistar.data.events[0]
+    assert not board['EventBodyName'].endswith(' (SAP)')
+
+    escaped_name = (board['EventBodyName'] + ' (SAP)').replace("'", "''")
+    partners = requests.get(legistar.api_url + '/events/', params={
+        '$filter': (
+            f"EventBodyName eq '{escaped_name}'"
+            f" and EventDate eq datetime'{board['EventDate']}'"
+        ),
+    }).json()
+
+    assert len(partners) == 1
+
+    items = requests.get(
+        legistar.api_url + '/events/{}/eventitems'.format(board['EventId'])
+    ).json()
+    assert any(item['EventItemMatterId'] for item in items)
+
+    detail = requests.get(board['EventInSiteURL'])
+    assert 'ctl00_ContentPlaceHolder1_pageTop1' in detail.text
+
+
+def test_matter_resources(legistar):
+    matter = next(
+        matter for matter in legistar.data.matters
+        if legistar.data.histories[matter['MatterId']]
+        and legistar.data.attachments[matter['MatterId']]
+        and not matter['MatterRestrictViewViaWeb']
+    )
+    matter_url = legistar.api_url + '/matters/{}'.format(matter['MatterId'])
+
+    for resource in ('histories', 'sponsors', 'attachments', 'indexes', 'relations', 'versions'):
+        assert requests.get(f'{matter_url}/{resource}').status_code == 200
+
+    version, = requests.get(matter_url + '/versions').json()
+    text = requests.get(matter_url + '/texts/' + version['Key'])
+    assert text.json()['MatterTextPlain']
+
+    gateway = requests.head(
+        legistar.web_url + '/gateway.aspx',
+        params={'m': 'l', 'id': matter['MatterId']},
+    )
+    assert gateway.status_code == 302
+
+    attachment_url = requests.get(matter_url + '/attachments').json()[0]['MatterAttachmentHyperlink']
+    attachment = requests.get(attachment_url)
+    assert attachment.content.startswith(b'%PDF')
+
+    prefix = requests.get(attachment_url, headers={'Range': 'bytes=0-99'})
+    assert prefix.status_code == 206
+    assert prefix.content == attachment.content[:100]
+
+    assert requests.get(legistar.api_url + '/matters/1').status_code == 404
+
+
+def test_throttling_and_errors():
+    with FakeLegistar(years=1, rate_limit=5) as legistar:
+        statuses = [
+            requests.get(legistar.api_url + '/bodytypes/').status_code
+            for _ in range(10)
+        ]
+
+        assert statuses.count(429) >= 4
+        assert legistar.stats[429] == statuses.count(429)
+
+        response = requests.get(legistar.api_url + '/bodytypes/')
+        if response.status_code == 429:
+            assert response.headers['Retry-After'] == '1'
+
+    with FakeLegistar(years=1, error_rate=0.5) as legistar:
+        statuses = [
+            requests.get(legistar.api_url + '/bodytypes/').status_code
+            for _ in range(20)
+        ]
+
+        assert 0 < statuses.count(500) < 20
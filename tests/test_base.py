@@ -0,0 +1,63 @@
+import time
+
+import requests_mock
+import scrapelib
+
+from lametro.base import LAMetroAPIWebEventScraper, SharedTransport
+
+
+def test_shared_transport_shares_rate_budget():
+    '''
+    Test that sessions on the same transport share one rate budget and one
+    set of connection pools.
+    '''
+    transport = SharedTransport()
+
+    sessions = [scrapelib.Scraper(requests_per_minute=600) for _ in range(2)]
+    for session in sessions:
+        transport.mount(session)
+
+    assert sessions[0].get_adapter('https://webapi.legistar.com') is transport.adapter
+    assert sessions[1].get_adapter('https://metro.legistar.com') is transport.adapter
+
+    with requests_mock.Mocker() as m:
+        m.get('https://webapi.legistar.com/v1/metro/events', json=[])
+
+        start = time.time()
+        for session in sessions * 2:
+            session.get('https://webapi.legistar.com/v1/metro/events')
+
+    # Four requests at 10 per second, across both sessions
+    assert time.time() - start >= 0.3
+
+
+def test_adaptive_transport_ignores_rpm():
+    transport = SharedTransport(adaptive=True)
+
+    session = scrapelib.Scraper(requests_per_minute=60)
+    transport.mount(session)
+
+    with requests_mock.Mocker() as m:
+        m.get('https://webapi.legistar.com/v1/metro/events', json=[])
+
+        start = time.time()
+        for _ in range(3):
+            session.get('https://webapi.legistar.com/v1/metro/events')
+
+    assert time.time() - start < 1
+
+
+def test_download_leaves_out_api_token():
+    scraper = LAMetroAPIWebEventScraper()
+    scraper.params = {'token': 'secret'}
+
+    with requests_mock.Mocker() as m:
+        m.get('https://webapi.legistar.com/v1/metro/events', json=[])
+        m.get('https://metro.legistar1.com/metro/attachments/minutes.pdf', content=b'%PDF')
+
+        scraper.get('https://webapi.legistar.com/v1/metro/events')
+        response = scraper.download('https://metro.legistar1.com/metro/attachments/minutes.pdf')
+
+    assert response.content == b'%PDF'
+    assert m.request_history[0].qs == {'token': ['secret']}
+    assert m.request_history[1].qs == {}
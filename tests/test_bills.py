@@ -1,12 +1,18 @@
 import datetime
+import json
 import re
 
 import pytest
 import requests_mock
 import requests
+import pytz
 
 from pupa.scrape.bill import Bill
 
+from lametro import Lametro
+from lametro.bills import InvalidActionDateException, parse_shard
+from lametro.state import commit_pending_state
+
 
 def test_unnamed_board_correspondences(bill_scraper, matter, mocker):
     '''
@@ -103,3 +109,368 @@ def test_private_scrape_dates(bill_scraper, matter, intro_date, num_bills_scrape
                 scrape_results.append(bill)
 
         assert len(scrape_results) == num_bills_scraped
+
+
+def test_scrape_order_is_deterministic(bill_scraper, matter, mocker):
+    '''
+    Test that bills come out in the order their matters were requested,
+    even though their sub-resources are fetched concurrently.
+    '''
+    matters = []
+    for i, matter_file in enumerate(('2017-0643', '2017-0644', '2017-0645')):
+        numbered_matter = matter.copy()
+        numbered_matter['MatterId'] = matter['MatterId'] + i
+        numbered_matter['MatterFile'] = matter_file
+        matters.append(numbered_matter)
+
+    with requests_mock.Mocker() as m:
+        matcher = re.compile('webapi.legistar.com')
+        m.get(matcher, json={}, status_code=200)
+
+        mocker.patch('lametro.LametroBillScraper.matter', side_effect=matters)
+        mocker.patch('lametro.LametroBillScraper.text', return_value='')
+
+        matter_ids = ','.join(str(m['MatterId']) for m in matters)
+        bills = [
+            bill for bill in bill_scraper.scrape(matter_ids=matter_ids)
+            if type(bill) == Bill
+        ]
+
+    assert [bill.identifier for bill in bills] == [
+        '2017-0643', '2017-0644', '2017-0645'
+    ]
+
+
+def test_full_scrape_resumes_after_failure(bill_scraper, matter, mocker):
+    '''
+    Test that resuming a full scrape that failed partway skips the matters
+    it finished, and scrapes the rest.
+    '''
+    matters = []
+    for i in range(6):
+        numbered_matter = matter.copy()
+        numbered_matter['MatterId'] = 66660 + i
+        numbered_matter['MatterFile'] = f'2017-066{i}'
+        matters.append(numbered_matter)
+
+    def legistar_goes_down():
+        yield from (record.copy() for record in matters)
+        raise requests.ConnectionError('Legistar is down')
+
+    def bill_identifiers(scrape):
+        for bill in scrape:
+            if type(bill) == Bill:
+                identifiers.append(bill.identifier)
+
+    with requests_mock.Mocker() as m:
+        matcher = re.compile('webapi.legistar.com')
+        m.get(matcher, json={}, status_code=200)
+
+        mocker.patch(
+            'lametro.LametroBillScraper.matters',
+            side_effect=[legistar_goes_down(), (record.copy() for record in matters)],
+        )
+        mocker.patch('lametro.LametroBillScraper.text', return_value='')
+
+        identifiers = []
+        with pytest.raises(requests.ConnectionError):
+            bill_identifiers(bill_scraper.scrape(window=0))
+
+        n_scraped = len(identifiers)
+        assert n_scraped
+
+        bill_identifiers(bill_scraper.scrape(window='0', resume='true'))
+
+    assert sorted(identifiers) == [record['MatterFile'] for record in matters]
+    assert len(identifiers) > n_scraped
+
+
+def test_shards_are_disjoint(bill_scraper, matter, mocker):
+    '''
+    Test that shards of a full scrape emit every bill exactly once between
+    them, that sessions are filtered in the query, and that matters in
+    other shards are left out before their detail pages are looked up.
+    '''
+    matters = []
+    for i in range(7):
+        numbered_matter = matter.copy()
+        numbered_matter['MatterId'] = 55550 + i
+        numbered_matter['MatterFile'] = f'2017-055{i}'
+        matters.append(numbered_matter)
+
+    identifiers = []
+
+    with requests_mock.Mocker() as m:
+        matcher = re.compile('webapi.legistar.com')
+        m.get(matcher, json={}, status_code=200)
+
+        pages = mocker.patch(
+            'legistar.base.LegistarAPIScraper.pages',
+            side_effect=lambda *args, **kwargs: (record.copy() for record in matters),
+        )
+        detail_url = mocker.patch(
+            'lametro.LametroBillScraper.legislation_detail_url',
+            return_value='https://metro.legistar.com/LegislationDetail.aspx?ID=1',
+        )
+        mocker.patch('lametro.LametroBillScraper.text', return_value='')
+
+        for k in range(1, 4):
+            shard_identifiers = [
+                bill.identifier
+                for bill in bill_scraper.scrape(session='2017', shard=f'{k}/3')
+                if type(bill) == Bill
+            ]
+            assert shard_identifiers
+            identifiers += shard_identifiers
+
+    assert sorted(identifiers) == [record['MatterFile'] for record in matters]
+
+    # Detail pages are only looked up for matters in the shard
+    assert detail_url.call_count == len(matters)
+
+    assert pages.call_args.kwargs['params']['$filter'] == (
+        "(MatterIntroDate ge datetime'2017-07-01T00:00:00' and "
+        "MatterIntroDate le datetime'2018-06-30T00:00:00')"
+    )
+
+
+@pytest.mark.parametrize('value', ['0/4', '5/4', '2', 'a/b'])
+def test_invalid_shards(value):
+    with pytest.raises(ValueError):
+        parse_shard(value)
+
+
+def test_windowed_matters_put_upcoming_agendas_first(bill_scraper, mocker):
+    '''
+    Test that windowed scrapes yield matters on upcoming agendas first, then
+    matters updated in the window, then matters on past agendas, once each.
+    '''
+    upcoming_event = {'EventId': 1}
+    past_event = {'EventId': 2}
+
+    mocker.patch(
+        'lametro.events.LametroEventScraper.agendas',
+        return_value=iter([(upcoming_event, [30, 10]), (past_event, [40, 20])]),
+    )
+    mocker.patch(
+        'lametro.events.LametroEventScraper.is_upcoming',
+        side_effect=lambda event: event is upcoming_event,
+    )
+    mocker.patch(
+        'legistar.bills.LegistarAPIBillScraper.matters',
+        return_value=iter([{'MatterId': 10}, {'MatterId': 20}]),
+    )
+    mocker.patch(
+        'lametro.LametroBillScraper.matter',
+        side_effect=lambda matter_id: {'MatterId': matter_id},
+    )
+
+    since = datetime.datetime(2024, 9, 1)
+    matter_ids = [matter['MatterId'] for matter in bill_scraper.matters(since)]
+
+    assert matter_ids == [30, 10, 20, 40]
+
+
+def test_windowed_scrapes_share_event_scraper(bill_scraper, mocker):
+    '''
+    Test that windowed scrapes read agendas with one event scraper, and
+    release its resources when each scrape ends.
+    '''
+    event_scrapers = []
+
+    def agendas(event_scraper, since_datetime):
+        event_scrapers.append(event_scraper)
+        return iter([])
+
+    mocker.patch(
+        'lametro.events.LametroEventScraper.agendas', autospec=True, side_effect=agendas
+    )
+    close = mocker.patch('lametro.events.LametroEventScraper.close')
+    mocker.patch(
+        'legistar.bills.LegistarAPIBillScraper.matters',
+        side_effect=lambda since_datetime: iter([]),
+    )
+
+    for _ in range(2):
+        list(bill_scraper.scrape(window=1))
+
+    assert len(event_scrapers) == 2
+    assert event_scrapers[0] is event_scrapers[1]
+    assert close.call_count == 2
+
+
+def test_actions_fetch_roll_call_votes(bill_scraper, mocker):
+    '''
+    Test that votes are fetched for every roll call on a matter, and only
+    for roll calls, and are matched back up with the right action.
+    '''
+    def history_row(history_id, action_name, roll_call):
+        return {
+            'MatterHistoryId': history_id,
+            'MatterHistoryActionName': action_name,
+            'MatterHistoryActionDate': '2017-11-30T00:00:00',
+            'MatterHistoryActionBodyName': 'Board of Directors - Regular Board Meeting',
+            'MatterHistoryEventId': 1473 if roll_call else None,
+            'MatterHistoryRollCallFlag': 1 if roll_call else None,
+            'MatterHistoryPassedFlag': 1 if roll_call else None,
+        }
+
+    history = [
+        history_row(1, 'APPROVED', True),
+        history_row(2, 'RECEIVED AND FILED', True),
+        history_row(3, 'REFERRED', False),
+    ]
+
+    mocker.patch('lametro.LametroBillScraper.history', return_value=history)
+    votes = mocker.patch(
+        'lametro.LametroBillScraper.votes',
+        side_effect=lambda history_id: [
+            {'VoteValueName': 'Aye', 'VotePersonName': f'Member {history_id}'}
+        ],
+    )
+
+    actions = list(bill_scraper.actions(4450))
+
+    assert votes.call_count == 2
+    assert [vote for _, vote in actions] == [
+        ('pass', [{'VoteValueName': 'Aye', 'VotePersonName': 'Member 1'}]),
+        ('pass', [{'VoteValueName': 'Aye', 'VotePersonName': 'Member 2'}]),
+        (None, []),
+    ]
+
+
+def test_session_lookup(bill_scraper):
+    '''
+    Test that the indexed session lookup agrees with a linear scan of the
+    legislative sessions, on every day of a 10-year matter set.
+    '''
+    localize = pytz.timezone(bill_scraper.TIMEZONE).localize
+
+    def linear_session(matter_id, action_date):
+        for session in Lametro().legislative_sessions:
+            start = localize(datetime.datetime.strptime(session['start_date'], '%Y-%m-%d'))
+            end = localize(datetime.datetime.strptime(session['end_date'], '%Y-%m-%d'))
+
+            if start <= action_date <= end:
+                return session['identifier']
+
+        raise InvalidActionDateException(matter_id, action_date)
+
+    first_day = localize(datetime.datetime(2013, 6, 1))
+    action_dates = []
+    for day in range(365 * 10):
+        action_date = first_day + datetime.timedelta(days=day)
+        action_dates += [action_date, action_date + datetime.timedelta(hours=12)]
+
+    def lookup_all(session):
+        results = []
+
+        for matter_id, action_date in enumerate(action_dates):
+            try:
+                results.append(session(matter_id, action_date))
+            except InvalidActionDateException:
+                results.append(None)
+
+        return results
+
+    expected = lookup_all(linear_session)
+    actual = lookup_all(bill_scraper.session)
+
+    assert actual == expected
+    assert None in actual  # Dates before 2014 and in the gap on June 30
+
+
+def test_skip_unchanged(bill_scraper, matter, mocker):
+    '''
+    Test that skip_unchanged scrapes only emit bills for matters that changed
+    since the last scrape.
+    '''
+    matter = matter.copy()
+    matter['MatterId'] = 77777
+
+    def scrape():
+        with requests_mock.Mocker() as m:
+            matcher = re.compile('webapi.legistar.com')
+            m.get(matcher, json={}, status_code=200)
+
+            mocker.patch('lametro.LametroBillScraper.matter', return_value=matter.copy())
+            mocker.patch('lametro.LametroBillScraper.text', return_value='')
+
+            return [
+                bill for bill in bill_scraper.scrape(matter_ids='77777', skip_unchanged='true')
+                if type(bill) == Bill
+            ]
+
+    assert len(scrape()) == 1
+
+    # Nothing is skipped until the last scrape has been imported
+    assert len(scrape()) == 1
+
+    commit_pending_state(bill_scraper.datadir)
+    assert len(scrape()) == 0
+
+    commit_pending_state(bill_scraper.datadir)
+    matter['MatterRowVersion'] = 'AAAAAAB9QKo='
+    assert len(scrape()) == 1
+
+
+def test_text_is_stored_per_version(bill_scraper):
+    '''
+    Test that the text of each matter version is fetched at most once.
+    '''
+    matter_url = 'https://webapi.legistar.com/v1/metro/matters/88888'
+    text = {'MatterTextPlain': 'Plain text', 'MatterTextRtf': '{\\rtf1 Rich text}'}
+    text_body = json.dumps(text)
+
+    with requests_mock.Mocker() as m:
+        m.get(matter_url + '/versions', json=[
+            {'Key': '1', 'Value': '1'}, {'Key': '2', 'Value': '2'},
+        ])
+        texts = m.get(
+            re.compile(re.escape(matter_url) + '/texts/'),
+            text=text_body,
+            headers={'Content-Length': str(len(text_body))},
+        )
+
+        assert bill_scraper.text(88888, '1') == text
+        assert bill_scraper.text(88888, '1') == text
+        assert texts.call_count == 1
+
+        assert bill_scraper.text(88888, '2') == text
+        assert texts.call_count == 2
+
+
+def test_texts_are_not_cached_on_row_version(bill_scraper):
+    '''
+    Test that matter texts, which are stored per version, aren't also kept
+    in the row version response cache.
+    '''
+    matter_url = 'https://webapi.legistar.com/v1/metro/matters/88888'
+    bill_scraper.remember_row_version(
+        'matters', {'MatterId': 88888, 'MatterRowVersion': 'AAAAAAB9QKo='}
+    )
+
+    assert bill_scraper._row_version_key('get', matter_url + '/versions', None)
+    assert bill_scraper._row_version_key('get', matter_url + '/texts/1', None) is None
+
+
+def test_failed_scrape_releases_resources(bill_scraper, matter, mocker):
+    '''
+    Test that a scrape stops the vote threads and closes the matter text
+    store, even if it fails.
+    '''
+    bill_scraper.vote_pool
+    bill_scraper._texts.get('key')
+
+    mocker.patch('lametro.LametroBillScraper.matter', return_value=matter.copy())
+    mocker.patch('lametro.LametroBillScraper.matter_resources', return_value={})
+    mocker.patch('lametro.LametroBillScraper.fingerprint', return_value='')
+    mocker.patch(
+        'lametro.LametroBillScraper.bill', side_effect=ValueError('Bad matter')
+    )
+
+    with pytest.raises(ValueError, match='Bad matter'):
+        list(bill_scraper.scrape(matter_ids='77777'))
+
+    assert bill_scraper._vote_pool is None
+    assert bill_scraper._texts._connection is None
@@ -0,0 +1,62 @@
+from lametro.bodies import BodyRegistry
+
+
+class FakeScraper:
+    BASE_URL = 'https://webapi.legistar.com/v1/metro'
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, url):
+        self.requests += 1
+
+        class Response:
+            def json(self):
+                return [{'BodyTypeName': 'Committee', 'BodyTypeId': 42}]
+
+        return Response()
+
+    def pages(self, url, item_key):
+        self.requests += 1
+
+        return iter([
+            {'BodyId': 138, 'BodyName': 'Board of Directors - Regular Board Meeting', 'BodyTypeId': 41},
+            {'BodyId': 201, 'BodyName': 'San Fernando Valley Service Council', 'BodyTypeId': 70},
+        ])
+
+
+def test_body_registry_persists_until_expired(tmp_path):
+    scraper = FakeScraper()
+    path = str(tmp_path / 'bodies.json')
+
+    registry = BodyRegistry(path, ttl=60)
+    assert registry.body_types(scraper) == {'Committee': 42}
+    assert registry.service_council_ids(scraper) == {201}
+    assert scraper.requests == 2
+
+    # A later run reads the bodies from disk
+    assert len(BodyRegistry(path, ttl=60).bodies(scraper)) == 2
+    assert scraper.requests == 2
+
+    # Until they expire
+    assert len(BodyRegistry(path, ttl=-1).bodies(scraper)) == 2
+    assert scraper.requests == 4
+
+
+def test_body_registry_returns_copies(tmp_path):
+    registry = BodyRegistry(str(tmp_path / 'bodies.json'), ttl=60)
+
+    (board, _) = registry.bodies(FakeScraper())
+    board['BodyName'] = 'Board of Directors'
+
+    assert registry.bodies(FakeScraper())[0]['BodyName'] == 'Board of Directors - Regular Board Meeting'
+
+
+def test_canonical_name(tmp_path):
+    registry = BodyRegistry(str(tmp_path / 'bodies.json'), ttl=60)
+    scraper = FakeScraper()
+
+    assert registry.canonical_name(scraper, 'Board of Directors - Regular Board Meeting') == 'Board of Directors'
+    assert registry.canonical_name(scraper, 'Board of Directors - Special Board Meeting ') == 'Board of Directors'
+    assert registry.canonical_name(scraper, 'san fernando valley  service council') == 'San Fernando Valley Service Council'
+    assert registry.canonical_name(scraper, ' Unknown Body ') == 'Unknown Body'
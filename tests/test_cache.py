@@ -0,0 +1,90 @@
+import os
+
+import requests_mock
+import requests
+
+from lametro.cache import KeyValueStore, ResponseCache
+
+
+def get_response(url, body):
+    with requests_mock.Mocker() as m:
+        m.get(url, content=body, headers={'Content-Length': str(len(body))})
+        return requests.get(url)
+
+
+def test_response_cache_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024)
+    url = 'https://webapi.legistar.com/v1/metro/matters/4450/histories'
+
+    assert cache.get('key') is None
+
+    cache.set('key', get_response(url, b'[{"MatterHistoryId": 1}]'))
+    response = cache.get('key')
+
+    assert response.status_code == 200
+    assert response.json() == [{'MatterHistoryId': 1}]
+    assert response.headers['content-length'] == '24'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_cache_expires_entries(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age=60)
+    url = 'https://webapi.legistar.com/v1/metro/matters/4450/sponsors'
+
+    cache.set('key', get_response(url, b'[]'))
+
+    (entry,) = os.listdir(tmp_path)
+    with open(tmp_path / entry, 'rb') as f:
+        meta, content = f.read().split(b'\n', 1)
+
+    with open(tmp_path / entry, 'wb') as f:
+        f.write(meta.replace(b'"cached_at": ', b'"cached_at": -') + b'\n' + content)
+
+    assert cache.get('key') is None
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    body = b'x' * 1000
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024)
+    url = 'https://webapi.legistar.com/v1/metro/matters/4450/attachments'
+
+    for key in ('a', 'b', 'c'):
+        cache.set(key, get_response(url, body))
+
+    # Leave room for three entries, but not four
+    cache.max_bytes = cache._size / 3 * 3.5
+
+    # Make 'a' the oldest entry, then read it, so 'b' is least recently used
+    for i, key in enumerate(('a', 'b', 'c')):
+        os.utime(cache._path(key), (i, i))
+    cache.get('a')
+
+    cache.set('d', get_response(url, body))
+
+    assert cache.get('b') is None
+    assert all(cache.get(key) for key in ('a', 'c', 'd'))
+
+
+def test_key_value_store_persists():
+    store = KeyValueStore('test_persists')
+    store.set_many({'1': 'a', '2': 'b'})
+    store.set('2', 'c')
+    store.close()
+
+    store = KeyValueStore('test_persists')
+    assert store.get('1') == 'a'
+    assert store.get('2') == 'c'
+    assert store.get('3', 'default') == 'default'
+
+
+def test_key_value_store_reopens_after_close():
+    store = KeyValueStore('test_reopens')
+    store.set('1', 'a')
+    store.close()
+    store.close()
+
+    assert store.get('1') == 'a'
+    store.set('2', 'b')
+    store.close()
+
+    assert KeyValueStore('test_reopens').get('2') == 'b'
@@ -1,11 +1,16 @@
 import json
 import re
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 from pathlib import Path
 
 import pytest
 import requests_mock
 
+from legistar.events import WebCalendarFallbackMixin
+
 from lametro.base import LAMetroAPIWebEventScraper
 from lametro.events import DuplicateAgendaItemException, LametroEventScraper
 from lametro.paired_event_stream import (
@@ -258,3 +263,407 @@ def test_multiple_minutes_candidates_handling(event_scraper, api_event, test_cas
     assert len(minutes) == 1
     assert minutes[0]["MatterAttachmentName"] == expected_minutes_title
     assert minutes[0]["MatterAttachmentHyperlink"] == expected_minutes_url
+
+
+def test_parallel_merge_preserves_order(api_event, web_event, mocker):
+    mock_scraper = mocker.MagicMock(spec=LAMetroAPIWebEventScraper)
+    mock_scraper.event = lambda x: (x, web_event)
+
+    mocker.patch(
+        "lametro.paired_event_stream.LAMetroAPIWebEventScraper", return_value=mock_scraper
+    )
+
+    events = []
+    for i, body_name in enumerate(
+        ["Executive Management Committee", "Finance, Budget and Audit Committee"]
+        + ["Planning and Programming Committee", "Construction Committee"]
+    ):
+        event = api_event.copy()
+        event["EventId"] = api_event["EventId"] + i
+        event["EventBodyName"] = body_name
+        events.append(event)
+
+    sequential = [
+        event["EventId"]
+        for event, _ in PairedEventStream(events, find_missing_partner=False)
+    ]
+    parallel = [
+        event["EventId"]
+        for event, _ in PairedEventStream(
+            events, find_missing_partner=False, workers=3
+        )
+    ]
+
+    assert len(parallel) == len(events)
+    assert parallel == sequential
+
+
+def test_parallel_merge_with_web_calendar_fallback(api_event, web_event, mocker):
+    '''
+    Test that events found by paging through the web calendar, which
+    shares one generator between lookups, aren't lost when events are
+    merged in parallel.
+    '''
+    events = []
+    for i in range(8):
+        event = api_event.copy()
+        event['EventId'] = api_event['EventId'] + i
+        event['EventDate'] = '2019-03-{:02d}T00:00:00'.format(i + 1)
+        event['EventAgendaStatusName'] = 'Draft'
+        events.append(event)
+
+    def calendar():
+        for event in events:
+            # Give other threads a chance to advance the generator
+            time.sleep(0.01)
+            yield event['EventId'], web_event
+
+    pages = calendar()
+    scraped = {}
+
+    def web_results(self, api_event):
+        if api_event['EventId'] in scraped:
+            return scraped[api_event['EventId']]
+
+        for event_id, event in pages:
+            scraped[event_id] = event
+            if event_id == api_event['EventId']:
+                return event
+
+    mocker.patch.object(
+        WebCalendarFallbackMixin, '_get_web_event', web_results, create=True
+    )
+
+    merged = [
+        event['EventId']
+        for event, _ in PairedEventStream(
+            events,
+            find_missing_partner=False,
+            workers=4,
+            scraper=LAMetroAPIWebEventScraper(),
+        )
+    ]
+
+    assert merged == [event['EventId'] for event in events]
+
+
+def test_agendas_skip_spanish_events(event_scraper, api_event, mocker):
+    '''
+    Test that agendas are read straight from the items of English events,
+    without pairing events with the web calendar.
+    '''
+    spanish_event = api_event.copy()
+    spanish_event['EventId'] = 1535
+    spanish_event['EventBodyName'] = '{} (SAP)'.format(api_event['EventBodyName'])
+
+    mocker.patch(
+        'lametro.LametroEventScraper.api_events',
+        return_value=[api_event, spanish_event],
+    )
+    mocker.patch(
+        'lametro.LametroEventScraper.filter', side_effect=lambda events: events
+    )
+    agenda = mocker.patch(
+        'lametro.LametroEventScraper.agenda',
+        return_value=[{'EventItemMatterId': 4450}, {'EventItemMatterId': None}],
+    )
+    pairing = mocker.patch('lametro.events.PairedEventStream')
+
+    agendas = list(event_scraper.agendas(None))
+
+    assert agendas == [(api_event, [4450])]
+    agenda.assert_called_once_with(api_event)
+    pairing.assert_not_called()
+
+
+def test_agendas_put_upcoming_events_first(event_scraper, api_event, mocker):
+    '''
+    Test that agendas of upcoming events come first, soonest first, then
+    the agendas of past events.
+    '''
+    events = []
+    for event_id, event_date in (
+        (1, '2019-02-28T00:00:00'),
+        (2, '2099-03-15T00:00:00'),
+        (3, '2099-03-01T00:00:00'),
+    ):
+        event = api_event.copy()
+        event['EventId'] = event_id
+        event['EventDate'] = event_date
+        events.append(event)
+
+    mocker.patch('lametro.LametroEventScraper.api_events', return_value=events)
+    mocker.patch(
+        'lametro.LametroEventScraper.filter', side_effect=lambda events: events
+    )
+    mocker.patch(
+        'lametro.LametroEventScraper.agenda',
+        side_effect=lambda event: [{'EventItemMatterId': event['EventId'] * 10}],
+    )
+
+    agendas = [
+        (event['EventId'], matter_ids)
+        for event, matter_ids in event_scraper.agendas(None)
+    ]
+
+    assert agendas == [(3, [30]), (2, [20]), (1, [10])]
+
+
+def test_slow_cover_pages_dont_hold_up_audio(event_scraper, mocker):
+    '''
+    Test that audio links resolve while every cover page worker is busy.
+    '''
+    ocr_done = threading.Event()
+    for _ in range(event_scraper.MINUTES_WORKERS):
+        event_scraper.cover_page_pool.submit(ocr_done.wait)
+
+    mocker.patch.object(
+        event_scraper, 'audio_redirect', return_value='https://metro.granicus.com/audio.mp3'
+    )
+
+    event = {
+        'EventMinutesFile': 'minutes.pdf',
+        'audio': [{'url': 'https://metro.legistar.com/Video.aspx', 'label': 'Audio'}],
+    }
+
+    enrichments = []
+    thread = threading.Thread(
+        target=lambda: enrichments.append(event_scraper.enrich((event, None)))
+    )
+    thread.start()
+    thread.join(5)
+    ocr_done.set()
+
+    assert enrichments[0]['audio'] == [
+        (event['audio'][0], 'https://metro.granicus.com/audio.mp3')
+    ]
+
+
+def test_failed_scrape_stops_pools(event_scraper, mocker):
+    pools = {
+        name: mocker.Mock()
+        for name in ('_cover_page_pool', '_audio_pool', '_minutes_pool')
+    }
+    for name, pool in pools.items():
+        setattr(event_scraper, name, pool)
+
+    mocker.patch.object(event_scraper, 'events', return_value=[({}, None)])
+    mocker.patch.object(event_scraper, 'enrich', return_value={})
+    mocker.patch.object(
+        event_scraper, 'event_from_api', side_effect=ValueError('Bad event')
+    )
+
+    with pytest.raises(ValueError):
+        list(event_scraper.scrape(event_ids='1'))
+
+    for name, pool in pools.items():
+        pool.shutdown.assert_called_once()
+        assert getattr(event_scraper, name) is None
+
+
+def test_cover_page_text_is_cached(event_scraper):
+    '''
+    Test that each version of a minutes attachment is downloaded and read
+    at most once.
+    '''
+    url = 'https://metro.legistar1.com/metro/attachments/cover-page-cache-test.pdf'
+    attachment = {
+        'MatterAttachmentHyperlink': url,
+        'MatterAttachmentLastModifiedUtc': '2024-09-27T09:02:10',
+    }
+
+    with requests_mock.Mocker() as m, open(
+        Path('tests/fixtures/right_minutes_file_a.pdf'), 'rb'
+    ) as right_file:
+        m.get(url, content=right_file.read(), status_code=200)
+
+        text = event_scraper.cover_page_text(attachment)
+        assert 'minutes' in text.lower()
+
+        assert event_scraper.cover_page_text(attachment) == text
+        assert m.call_count == 1
+
+        updated_attachment = attachment.copy()
+        updated_attachment['MatterAttachmentLastModifiedUtc'] = '2024-10-01T12:00:00'
+
+        assert event_scraper.cover_page_text(updated_attachment) == text
+        assert m.call_count == 2
+
+
+def test_unreadable_cover_page_is_cached(event_scraper):
+    '''
+    Test that attachments that aren't readable PDFs are only downloaded once.
+    '''
+    url = 'https://metro.legistar1.com/metro/attachments/unreadable-cover-page-test.pdf'
+    attachment = {
+        'MatterAttachmentHyperlink': url,
+        'MatterAttachmentLastModifiedUtc': '2024-09-27T09:02:10',
+    }
+
+    with requests_mock.Mocker() as m:
+        m.get(url, content=b'Not a PDF', status_code=200)
+
+        assert event_scraper.cover_page_text(attachment) is None
+        assert event_scraper.cover_page_text(attachment) is None
+        assert m.call_count == 1
+
+
+def test_broken_minutes_pool_is_replaced(event_scraper, mocker):
+    '''
+    Test that if a minutes worker process dies, the pool is replaced and the
+    cover page is read again.
+    '''
+    broken_pool = mocker.Mock()
+    broken_pool.submit.return_value.result.side_effect = BrokenProcessPool()
+    event_scraper._minutes_pool = broken_pool
+
+    new_pool = mocker.Mock()
+    new_pool.submit.return_value.result.return_value = 'Minutes'
+    mocker.patch('lametro.events.ProcessPoolExecutor', return_value=new_pool)
+
+    assert event_scraper.read_cover_page(b'%PDF') == 'Minutes'
+
+    broken_pool.shutdown.assert_called_once_with(wait=False)
+    assert event_scraper._minutes_pool is new_pool
+
+    event_scraper._minutes_pool = None
+
+
+@pytest.mark.parametrize('cover_page_bytes,n_requests', [(1024, 2), (1024 * 1024, 1)])
+def test_cover_page_partial_download(event_scraper, cover_page_bytes, n_requests, mocker):
+    '''
+    Test that we read the cover page from the start of a minutes attachment
+    if we can, and fall back to downloading all of it if we can't.
+    '''
+    url = f'https://metro.legistar1.com/metro/attachments/partial-download-test-{cover_page_bytes}.pdf'
+    attachment = {
+        'MatterAttachmentHyperlink': url,
+        'MatterAttachmentLastModifiedUtc': '2024-09-27T09:02:10',
+    }
+
+    mocker.patch.object(event_scraper, 'COVER_PAGE_BYTES', cover_page_bytes)
+
+    with requests_mock.Mocker() as m, open(
+        Path('tests/fixtures/right_minutes_file_a.pdf'), 'rb'
+    ) as right_file:
+        m.get(url, content=right_file.read(), status_code=200)
+
+        text = event_scraper.cover_page_text(attachment)
+
+        assert 'minutes' in text.lower()
+        assert m.call_count == n_requests
+        assert m.request_history[0].headers['Range'] == f'bytes=0-{cover_page_bytes - 1}'
+
+
+def test_partners_found_in_batches(api_event, mocker):
+    '''
+    Test that partners of unpaired events are looked up a batch at a time,
+    and that Spanish events still must have an English partner.
+    '''
+    english_events, spanish_events = [], []
+    for i in range(PairedEventStream.PARTNER_BATCH_SIZE + 5):
+        english_event = api_event.copy()
+        english_event['EventId'] = 2000 + i
+        english_event['EventDate'] = f'2019-03-{i + 1:02}T00:00:00'
+        english_events.append(english_event)
+
+        spanish_event = english_event.copy()
+        spanish_event['EventId'] = 3000 + i
+        spanish_event['EventBodyName'] = '{} (SAP)'.format(api_event['EventBodyName'])
+        spanish_events.append(spanish_event)
+
+    mock_scraper = mocker.MagicMock(spec=LAMetroAPIWebEventScraper)
+    mock_scraper.search.side_effect = [
+        spanish_events[:PairedEventStream.PARTNER_BATCH_SIZE],
+        spanish_events[PairedEventStream.PARTNER_BATCH_SIZE:],
+    ]
+
+    stream = PairedEventStream(english_events, scraper=mock_scraper)
+    pairs = list(stream.paired_events)
+
+    assert mock_scraper.search.call_count == 2
+    assert [(english['EventId'], spanish['EventId']) for english, spanish in pairs] == [
+        (english['EventId'], spanish['EventId'])
+        for english, spanish in zip(english_events, spanish_events)
+    ]
+
+    mock_scraper.search.side_effect = [[]]
+
+    with pytest.raises(ValueError, match='Could not find English partner'):
+        list(PairedEventStream(spanish_events[:1], scraper=mock_scraper).paired_events)
+
+
+def test_streaming_pairs_one_date_at_a_time(api_event, mocker):
+    '''
+    Test that streaming pairs the same events as reading them all, without
+    reading past the date being paired, and that it insists on date order.
+    '''
+    events = []
+    for day in (1, 2, 3):
+        english_event = api_event.copy()
+        english_event['EventId'] = 2000 + day
+        english_event['EventDate'] = f'2019-03-{day:02}T00:00:00'
+
+        spanish_event = english_event.copy()
+        spanish_event['EventId'] = 3000 + day
+        spanish_event['EventBodyName'] = '{} (SAP)'.format(api_event['EventBodyName'])
+
+        events += [spanish_event, english_event]
+
+    read = []
+
+    def event_stream():
+        for event in events:
+            read.append(event['EventId'])
+            yield event
+
+    mock_scraper = mocker.MagicMock(spec=LAMetroAPIWebEventScraper)
+
+    pairs = PairedEventStream(
+        event_stream(), find_missing_partner=False, scraper=mock_scraper, streaming=True
+    ).paired_events
+
+    english, spanish = next(pairs)
+    assert (english['EventId'], spanish['EventId']) == (2001, 3001)
+    # The first event of the next date, which ends the first date
+    assert read == [3001, 2001, 3002]
+
+    streamed_pairs = [(english, spanish), *pairs]
+    batch_pairs = PairedEventStream(
+        events, find_missing_partner=False, scraper=mock_scraper
+    ).paired_events
+
+    def ids(pairs):
+        return sorted((english['EventId'], spanish['EventId']) for english, spanish in pairs)
+
+    assert ids(streamed_pairs) == ids(batch_pairs)
+
+    with pytest.raises(ValueError, match='ordered by EventDate'):
+        list(
+            PairedEventStream(
+                reversed(events), find_missing_partner=False, scraper=mock_scraper, streaming=True
+            ).paired_events
+        )
+
+
+def test_audio_redirects_are_remembered(event_scraper):
+    '''
+    Test that we stop asking where an audio link redirects once it
+    redirects somewhere, but keep asking until it does.
+    '''
+    resolved_url = 'https://metro.granicus.com/MediaPlayer.php?view_id=2&clip_id=100'
+    pending_url = 'https://metro.granicus.com/MediaPlayer.php?view_id=2&clip_id=101'
+
+    with requests_mock.Mocker() as m:
+        m.head(resolved_url, status_code=302, headers={'Location': 'https://archive.org/100.mp3'})
+        m.head(pending_url, status_code=200)
+
+        for _ in range(2):
+            assert event_scraper.audio_redirect(resolved_url) == 'https://archive.org/100.mp3'
+            assert event_scraper.audio_redirect(pending_url) is None
+
+        assert [request.url for request in m.request_history] == [
+            resolved_url,
+            pending_url,
+            pending_url,
+        ]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+import requests
+
+from lametro.instrumentation import (
+    InstrumentedAdapter,
+    RequestStats,
+    endpoint_family,
+    to_markdown,
+)
+
+
+@pytest.mark.parametrize('url,family', [
+    ('https://webapi.legistar.com/v1/metro/matters/4450/histories', 'api /matters/{id}/histories'),
+    ('https://webapi.legistar.com/v1/metro/matters/?$skip=1000', 'api /matters'),
+    ('https://webapi.legistar.com/v1/metro/events/1473/eventitems?AgendaNote=1', 'api /events/{id}/eventitems'),
+    ('https://webapi.legistar.com/v1/metro/eventitems/9/votes', 'api /eventitems/{id}/votes'),
+    ('https://metro.legistar.com/Calendar.aspx', 'web /Calendar.aspx'),
+    ('https://metro.legistar1.com/metro/attachments/73425e96.pdf', 'attachments'),
+    ('https://metro.granicus.com/MediaPlayer.php?clip_id=1', 'metro.granicus.com'),
+    ('http://127.0.0.1:8000/v1/metro/matters/4450/histories', 'api /matters/{id}/histories'),
+    ('http://127.0.0.1:8000/Calendar.aspx', 'web /Calendar.aspx'),
+])
+def test_endpoint_family(url, family):
+    assert endpoint_family(url) == family
+
+
+def test_request_stats(tmp_path, mocker):
+    stats = RequestStats()
+    mocker.patch('lametro.instrumentation.request_stats', return_value=stats)
+
+    url = 'https://webapi.legistar.com/v1/metro/matters/{}/histories'
+
+    def send(request, **kwargs):
+        response = requests.Response()
+        response.status_code = 500 if request.url.endswith('3/histories') else 200
+        response._content = b'[]'
+        return response
+
+    mocker.patch('requests.adapters.HTTPAdapter.send', side_effect=send)
+
+    adapter = InstrumentedAdapter()
+    for matter_id in (1, 2, 3):
+        adapter.send(requests.Request('GET', url.format(matter_id)).prepare())
+
+    stats.record_cache_hit(url.format(4))
+
+    path = tmp_path / 'request_stats.json'
+    stats.write(str(path))
+
+    with open(path) as f:
+        summary = json.load(f)
+
+    histories = summary['endpoints']['api /matters/{id}/histories']
+    assert histories['requests'] == 3
+    assert histories['errors'] == 1
+    assert histories['cache_hits'] == 1
+    assert histories['bytes'] == 6
+    assert histories['histogram']['0.1'] == 3
+
+    markdown = to_markdown(summary)
+    assert '| `api /matters/{id}/histories` | 3 | 1 | 1 (25%) |' in markdown
+    assert '≤ 0.1s' in markdown
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from pupa.scrape import Organization, Person
+
+
+BOARD = {'BodyId': 138, 'BodyName': 'Board of Directors - Regular Board Meeting', 'BodyTypeId': 41}
+FINANCE = {'BodyId': 201, 'BodyName': 'Finance, Budget and Audit Committee', 'BodyTypeId': 42}
+PLANNING = {'BodyId': 202, 'BodyName': 'Planning and Programming Committee', 'BodyTypeId': 42}
+
+
+def office(person_id, name, title='Board Member'):
+    first_name, last_name = name.split(' ')
+
+    return {
+        'OfficeRecordPersonId': person_id,
+        'OfficeRecordFullName': name,
+        'OfficeRecordFirstName': first_name,
+        'OfficeRecordLastName': last_name,
+        'OfficeRecordTitle': title,
+        'OfficeRecordStartDate': '2020-01-01T00:00:00',
+        'OfficeRecordEndDate': '2030-01-01T00:00:00',
+    }
+
+
+OFFICES = {
+    BOARD['BodyId']: [office(1, 'Ann Able'), office(2, 'Bob Baker')],
+    FINANCE['BodyId']: [office(2, 'Bob Baker', 'Member'), office(3, 'Cal Cole', 'Member')],
+    PLANNING['BodyId']: [office(1, 'Ann Able', 'Chair')],
+}
+
+
+@pytest.fixture
+def legistar(person_scraper, mocker):
+    '''
+    Stand in for the fetches the person scraper makes at once. The first
+    fetches take longest, so results come back out of order.
+    '''
+    mocker.patch.object(
+        person_scraper,
+        'body_types',
+        return_value={'Committee': 42, 'Independent Taxpayer Oversight Committee': 43},
+    )
+    mocker.patch.object(
+        person_scraper, 'bodies', side_effect=lambda: iter([BOARD, FINANCE, PLANNING])
+    )
+
+    def body_offices(body):
+        time.sleep(0.03 if body is BOARD else 0)
+        return list(OFFICES[body['BodyId']])
+
+    def person_sources_from_office(office):
+        person_id = office['OfficeRecordPersonId']
+        time.sleep(0.01 * (3 - person_id))
+        return (
+            f'https://webapi.legistar.com/v1/metro/persons/{person_id}',
+            f'https://metro.legistar.com/PersonDetail.aspx?ID={person_id}',
+        )
+
+    def web_members():
+        time.sleep(0.02)
+        return {}, {'Ann Able': 'District 1', 'Bob Baker': 'District 2'}
+
+    return {
+        'body_offices': mocker.patch.object(
+            person_scraper, 'body_offices', side_effect=body_offices
+        ),
+        'person_sources_from_office': mocker.patch.object(
+            person_scraper,
+            'person_sources_from_office',
+            side_effect=person_sources_from_office,
+        ),
+        'web_members': mocker.patch.object(
+            person_scraper, 'web_members', side_effect=web_members
+        ),
+    }
+
+
+def test_fetches_line_up_with_people_and_bodies(person_scraper, legistar):
+    '''
+    Test that office records, person sources and web member posts fetched
+    at once end up with the right people and committees.
+    '''
+    scraped = list(person_scraper.scrape())
+
+    people = {p.name: p for p in scraped if isinstance(p, Person)}
+    committees = [o.name for o in scraped if isinstance(o, Organization)]
+
+    assert committees == [FINANCE['BodyName'], PLANNING['BodyName']]
+    assert set(people) == {'Ann Able', 'Bob Baker', 'Cal Cole'}
+
+    for person_id, name in enumerate(['Ann Able', 'Bob Baker', 'Cal Cole'], start=1):
+        assert [source['url'] for source in people[name].sources] == [
+            f'https://webapi.legistar.com/v1/metro/persons/{person_id}',
+            f'https://metro.legistar.com/PersonDetail.aspx?ID={person_id}',
+        ]
+
+    def memberships(name):
+        return {
+            (m.organization_id, m.role, m.post_id)
+            for m in people[name]._related
+        }
+
+    assert ('~{"name": "Planning and Programming Committee"}', 'Chair', None) in memberships('Ann Able')
+    assert ('~{"name": "Finance, Budget and Audit Committee"}', 'Member', None) in memberships('Bob Baker')
+    assert memberships('Cal Cole') == {
+        ('~{"name": "Finance, Budget and Audit Committee"}', 'Member', None)
+    }
+
+    assert any('District 1' in str(m.post_id) for m in people['Ann Able']._related)
+    assert any('District 2' in str(m.post_id) for m in people['Bob Baker']._related)
+
+
+@pytest.mark.parametrize(
+    'fetch', ['body_offices', 'person_sources_from_office', 'web_members']
+)
+def test_fetch_errors_reach_the_caller(person_scraper, legistar, fetch):
+    '''
+    Test that an error in any of the fetches made at once stops the scrape.
+    '''
+    legistar[fetch].side_effect = ValueError(f'{fetch} failed')
+
+    with pytest.raises(ValueError, match=f'{fetch} failed'):
+        list(person_scraper.scrape())
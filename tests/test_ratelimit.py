@@ -0,0 +1,204 @@
+import threading
+import time
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from lametro.ratelimit import HostLimit, HostLimits, RateLimitedAdapter, SharedTokenBucket
+
+
+def test_limit_grows_on_success():
+    limit = HostLimit(initial=2, maximum=4)
+
+    for _ in range(20):
+        limit.acquire()
+        limit.release(0.1, 200)
+
+    assert limit.limit == 4
+    assert limit.in_flight == 0
+
+
+@pytest.mark.parametrize('status', [429, 500, 503, None])
+def test_limit_halves_on_overload(status):
+    limit = HostLimit(initial=8)
+
+    limit.acquire()
+    limit.release(0.1, status)
+
+    assert limit.limit == 4
+
+
+def test_limit_halves_once_per_round_trip():
+    '''
+    Test that a burst of errors from requests sent under the old limit
+    cuts the limit once, not once per error.
+    '''
+    limit = HostLimit(initial=8)
+    limit.latency = limit.baseline = 10
+
+    for _ in range(4):
+        limit.acquire()
+
+    for _ in range(4):
+        limit.release(10, 503)
+
+    assert limit.limit == 4
+
+
+def test_limit_shrinks_when_host_slows_down():
+    limit = HostLimit(initial=8)
+
+    for _ in range(5):
+        limit.acquire()
+        limit.release(0.1, 200)
+
+    grown = limit.limit
+
+    for _ in range(10):
+        limit.acquire()
+        limit.release(1, 200)
+
+    assert limit.limit < grown
+
+
+def test_limit_never_falls_below_minimum():
+    limit = HostLimit(initial=2, minimum=1)
+
+    for _ in range(5):
+        limit.acquire()
+        limit.release(0, 503)
+        limit._last_decrease = 0
+
+    assert limit.limit == 1
+
+
+def test_acquire_waits_for_room():
+    limit = HostLimit(initial=1)
+    limit.acquire()
+
+    acquired = threading.Event()
+
+    def acquire():
+        limit.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+
+    assert not acquired.wait(0.1)
+
+    limit.release(0.1, 200)
+
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_retry_after_pauses_host():
+    limit = HostLimit()
+
+    limit.acquire()
+    limit.release(0, 429, retry_after=0.2)
+
+    start = time.monotonic()
+    limit.acquire()
+
+    assert time.monotonic() - start >= 0.2
+
+
+def test_hosts_get_separate_limits():
+    limits = HostLimits()
+
+    api = limits['https://webapi.legistar.com/v1/metro/matters']
+    web = limits['https://metro.legistar.com/Calendar.aspx']
+
+    assert api is limits['https://webapi.legistar.com/v1/metro/events']
+    assert api is not web
+    assert set(limits.hosts) == {'webapi.legistar.com', 'metro.legistar.com'}
+
+
+def test_adapter_adjusts_limit_per_response(mocker):
+    def respond(request, **kwargs):
+        response = requests.Response()
+        response.url = request.url
+
+        if 'webapi' in request.url:
+            response.status_code = 429
+            response.headers['Retry-After'] = '0'
+        else:
+            response.status_code = 200
+
+        return response
+
+    mocker.patch.object(HTTPAdapter, 'send', side_effect=respond)
+
+    adapter = RateLimitedAdapter(HostLimits(initial=4))
+
+    for url in (
+        'https://webapi.legistar.com/v1/metro/matters',
+        'https://metro.legistar.com/Calendar.aspx',
+    ):
+        adapter.send(requests.Request('GET', url).prepare(), stream=True)
+
+    assert adapter.limits.summary() == {
+        'webapi.legistar.com': 2,
+        'metro.legistar.com': 4.2,
+    }
+
+
+def test_shared_bucket_spans_connections(tmp_path):
+    '''
+    Test that buckets opened on the same database, e.g., by different
+    processes, draw on one budget.
+    '''
+    path = str(tmp_path / 'rate_limit.sqlite3')
+    buckets = [SharedTokenBucket(path, rate=20, burst=2) for _ in range(2)]
+
+    start = time.monotonic()
+    for bucket in buckets * 3:
+        bucket.acquire('https://webapi.legistar.com/v1/metro/matters')
+
+    # Two requests in the burst, then four at 20 per second
+    assert time.monotonic() - start >= 0.2
+
+
+def test_shared_bucket_is_per_host(tmp_path):
+    bucket = SharedTokenBucket(str(tmp_path / 'rate_limit.sqlite3'), rate=1)
+
+    start = time.monotonic()
+    bucket.acquire('https://webapi.legistar.com/v1/metro/matters')
+    bucket.acquire('https://metro.legistar.com/Calendar.aspx')
+
+    assert time.monotonic() - start < 0.5
+
+
+def test_waiting_for_token_is_not_latency(mocker):
+    '''
+    Test that time spent waiting on the shared bucket isn't taken for the
+    host slowing down.
+    '''
+    def respond(request, **kwargs):
+        # Respond in a steady 10ms, so jitter doesn't look like the host
+        # slowing down
+        time.sleep(0.01)
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    mocker.patch.object(HTTPAdapter, 'send', side_effect=respond)
+
+    bucket = mocker.Mock()
+    adapter = RateLimitedAdapter(HostLimits(initial=4), bucket=bucket)
+    url = 'https://webapi.legistar.com/v1/metro/matters'
+
+    for _ in range(3):
+        adapter.send(requests.Request('GET', url).prepare(), stream=True)
+
+    bucket.acquire.side_effect = lambda url: time.sleep(0.2)
+
+    for _ in range(3):
+        adapter.send(requests.Request('GET', url).prepare(), stream=True)
+
+    limit = adapter.limits[url]
+    assert limit.latency < 0.05
+    assert limit.limit > 4
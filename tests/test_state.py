@@ -0,0 +1,121 @@
+import json
+import os
+from types import SimpleNamespace
+
+from pupa import settings
+
+from lametro.cache import KeyValueStore
+from lametro.state import (
+    Checkpoint, PendingState, Watermark, commit_after_import, commit_pending_state
+)
+
+
+def test_watermark_advances_on_save():
+    watermark = Watermark('test_advances')
+    assert watermark.load() is None
+
+    records = [
+        {'MatterLastModifiedUtc': '2024-09-26T18:45:31.48'},
+        {'MatterLastModifiedUtc': '2024-09-27T09:02:10'},
+        {'MatterLastModifiedUtc': None},
+        {'MatterLastModifiedUtc': '2024-09-26T23:59:59.123'},
+    ]
+    assert list(watermark.track(records, 'MatterLastModifiedUtc')) == records
+
+    # Nothing is persisted until the scrape finishes
+    assert Watermark('test_advances').load() is None
+
+    watermark.save()
+    assert Watermark('test_advances').load().isoformat() == '2024-09-27T09:02:10'
+
+
+def test_watermark_never_moves_backward():
+    watermark = Watermark('test_backward')
+    watermark.observe('2024-09-27T09:02:10')
+    watermark.save()
+
+    earlier = Watermark('test_backward')
+    earlier.observe('2024-01-01T00:00:00')
+    earlier.save()
+
+    assert Watermark('test_backward').load().isoformat() == '2024-09-27T09:02:10'
+
+
+def test_watermark_queries_with_overlap():
+    watermark = Watermark('test_overlap')
+    assert watermark.since() is None
+
+    watermark.observe('2024-09-27T09:02:10')
+    watermark.save()
+
+    assert watermark.since().isoformat() == '2024-09-27T08:57:10'
+
+
+def test_pending_state_committed_after_import(tmp_path):
+    watermark = Watermark('test_pending')
+    watermark.observe('2024-09-27T09:02:10')
+
+    pending = PendingState(str(tmp_path), 'bills')
+    pending.stores['test_pending'] = {'10340': 'abc'}
+    watermark.stage(pending)
+    pending.save()
+
+    # Nothing is recorded until the scrape's output has been imported
+    assert Watermark('test_pending').load() is None
+    assert KeyValueStore('test_pending').get('10340') is None
+
+    commit_pending_state(str(tmp_path))
+
+    assert Watermark('test_pending').load().isoformat() == '2024-09-27T09:02:10'
+    assert KeyValueStore('test_pending').get('10340') == 'abc'
+    assert os.listdir(tmp_path) == []
+
+
+def test_pending_state_needs_successful_import(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'SCRAPED_DATA_DIR', str(tmp_path), raising=False)
+    datadir = tmp_path / 'lametro'
+    datadir.mkdir()
+
+    pending = PendingState(str(datadir), 'bills')
+    pending.stores['test_import'] = {'10340': 'abc'}
+    pending.save()
+
+    commit_after_import(None, SimpleNamespace(success=False), created=True)
+    assert KeyValueStore('test_import').get('10340') is None
+
+    commit_after_import(None, SimpleNamespace(success=True), created=True)
+    assert KeyValueStore('test_import').get('10340') == 'abc'
+
+
+def test_checkpoint_resumes_until_cleared():
+    checkpoint = Checkpoint('test_resume')
+    assert not checkpoint.load()
+
+    records = [{'MatterId': 1}, {'MatterId': 2}, {'MatterId': 3}]
+    for record in checkpoint.track(records, 'MatterId'):
+        if record['MatterId'] == 3:
+            break
+        checkpoint.finish(record['MatterId'])
+
+    checkpoint.save()
+
+    resumed = Checkpoint('test_resume')
+    assert resumed.load()
+    assert resumed.done == {1, 2}
+    assert resumed.last == 2
+
+    with open(resumed.path) as f:
+        assert json.load(f)['pending'] == [3]
+
+    resumed.clear()
+    assert not Checkpoint('test_resume').load()
+
+
+def test_checkpoint_expires():
+    checkpoint = Checkpoint('test_expires')
+    checkpoint.started_at -= 60
+    checkpoint.finish(1)
+    checkpoint.save()
+
+    assert Checkpoint('test_expires', max_age=3600).load()
+    assert not Checkpoint('test_expires', max_age=30).load()